@@ -0,0 +1,508 @@
+"""
+Pipeline Benchmarks for Student Mental Health Analysis
+Times every combiner and analysis stage at several data sizes
+
+Each (stage, size) case runs in its own forked process: the process builds
+the stage's input, resets the kernel's peak-RSS counter, runs the stage
+and reports wall time, CPU time (including worker processes) and peak
+RSS. Inputs are synthetic (see src/synthetic_data.py): raw exports in the
+kaggle, clinical and campus schemas are generated once per size into
+--data-dir and reused; frames derived by the pipeline are rebuilt in a
+scratch directory on every run, so they always reflect the current code.
+
+Results go to a JSON file. Every case is compared against the baseline
+(benchmarks/baseline.json, a reference run committed with the code and
+rewritten by --update-baseline) and the run exits with status 1 when a
+case got slower or bigger than the tolerances allow, or failed. A missing
+baseline fails the run too, unless --no-compare only records results;
+cases the baseline does not cover, and a baseline recorded on a
+different machine, are reported as warnings.
+
+Usage (from this directory):
+    python run_benchmarks.py --sizes 10k,1M
+    python run_benchmarks.py --sizes 10k,1M,10M --update-baseline
+    python run_benchmarks.py --stages combine_datasets,clean_data --sizes 1M
+    python run_benchmarks.py --sizes 100k --no-compare
+
+Peak RSS is read from /proc/self/status (VmHWM) after writing 5 to
+/proc/self/clear_refs; kernels that do not allow that fall back to
+getrusage, which also counts the input set-up.
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import multiprocessing
+import os
+import pickle
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCHMARK_DIR, '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+import numpy as np
+import pandas as pd
+
+import dataset_combiner
+import mental_health_analysis
+import synthetic_data
+from dedup import DEFAULT_KEY_COLUMNS
+from rank_correlation import RankCorrelation
+
+DEFAULT_SIZES = '10k,1M'
+DEFAULT_DATA_DIR = os.path.join(BENCHMARK_DIR, '.data')
+DEFAULT_RESULTS = os.path.join(BENCHMARK_DIR, 'results', 'latest.json')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+RAW_SCHEMAS = ['kaggle', 'clinical', 'campus']
+RANK_COLUMNS = mental_health_analysis.CORRELATION_COLUMNS + mental_health_analysis.MAIN_FACTORS
+PLOT_STAGES = ['exploratory_data_analysis', 'correlation_analysis',
+               'advanced_visualizations', 'key_findings_summary']
+
+# Slower or bigger than baseline by more than the relative tolerance AND
+# the absolute floor counts as a regression (the floors absorb timer noise)
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.15
+MIN_SECONDS = 0.05
+MIN_MEGABYTES = 5.0
+
+MISSING_FRACTION = 0.02
+
+def parse_size(text):
+    """
+    '10k' -> 10000, '1M' -> 1000000, '250000' -> 250000
+    """
+
+    text = text.strip()
+    multiplier = {'k': 1_000, 'K': 1_000, 'm': 1_000_000, 'M': 1_000_000}.get(text[-1:], 1)
+    number = text[:-1] if multiplier > 1 else text
+    return int(float(number) * multiplier)
+
+def format_size(rows):
+    if rows % 1_000_000 == 0:
+        return f"{rows // 1_000_000}M"
+    if rows % 1_000 == 0:
+        return f"{rows // 1_000}k"
+    return str(rows)
+
+# ----------------------------------------------------------------------
+# Inputs
+# ----------------------------------------------------------------------
+
+class Inputs:
+    """
+    Stage inputs for one data size; derived frames are pickled to the
+    scratch directory so later cases of the same run reuse them
+    """
+
+    def __init__(self, rows, data_dir, scratch_dir):
+        self.rows = rows
+        self.data_dir = data_dir
+        self.scratch_dir = scratch_dir
+
+    def raw_dir(self):
+        """
+        Directory of raw synthetic exports totalling self.rows rows
+        """
+
+        path = os.path.join(self.data_dir, f"raw_{format_size(self.rows)}")
+        os.makedirs(path, exist_ok=True)
+        per_schema = [self.rows // len(RAW_SCHEMAS)] * len(RAW_SCHEMAS)
+        per_schema[0] += self.rows - sum(per_schema)
+
+        for schema, rows in zip(RAW_SCHEMAS, per_schema):
+            output = os.path.join(path, f"synthetic_{schema}.csv")
+            if not os.path.exists(output):
+                tmp_output = os.path.join(path, f"partial_{schema}.csv")
+                synthetic_data.write_dataset(tmp_output, rows, schema=schema, verbose=False)
+                os.replace(tmp_output, output)
+        return path
+
+    def _cached(self, name, build):
+        path = os.path.join(self.scratch_dir, f"{name}_{self.rows}.pkl")
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        frame = build()
+        with open(path, 'wb') as f:
+            pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return frame
+
+    def datasets(self):
+        return dataset_combiner.load_and_inspect_datasets(self.raw_dir())
+
+    def combined(self):
+        return self._cached('combined', lambda: dataset_combiner.combine_datasets(
+            self.datasets(), dedup_keys=DEFAULT_KEY_COLUMNS))
+
+    def with_composites(self):
+        return self._cached('composites', lambda: dataset_combiner.create_composite_scores(
+            self.combined()))
+
+    def analysis_raw(self):
+        """
+        Standardized survey frame with a few missing answers, as
+        clean_data receives it
+        """
+
+        def build():
+            df = pd.concat(synthetic_data.iter_chunks(self.rows), ignore_index=True)
+            rng = np.random.default_rng(0)
+            for col in ['age', 'year_of_study', 'cgpa', 'depression_score', 'sleep_quality']:
+                mask = rng.random(len(df)) < MISSING_FRACTION
+                df[col] = df[col].astype('float32').mask(mask)
+            return df
+        return self._cached('analysis_raw', build)
+
+    def analysis(self):
+        return self._cached('analysis', lambda: mental_health_analysis.create_composite_scores(
+            mental_health_analysis.clean_data(self.analysis_raw())))
+
+    def moments(self):
+        # Not pickled: the band groupings are closures; a single pass is cheap
+        return mental_health_analysis.compute_moments(self.analysis())
+
+    def analysis_stage_args(self, stage):
+        """
+        Arguments of an analysis stage as run_analysis passes them: the
+        frame, plus the shared moments for the stages that take them
+        """
+
+        function = getattr(mental_health_analysis, stage)
+        if function in mental_health_analysis.MOMENT_STAGES:
+            return (self.analysis(), self.moments())
+        return (self.analysis(),)
+
+# ----------------------------------------------------------------------
+# Stages: name -> (set-up returning the arguments, stage function)
+# ----------------------------------------------------------------------
+
+STAGES = {
+    'load_and_inspect_datasets': (lambda inputs: (inputs.raw_dir(),),
+                                  dataset_combiner.load_and_inspect_datasets),
+    'combine_datasets': (lambda inputs: (inputs.datasets(),),
+                         lambda datasets: dataset_combiner.combine_datasets(
+                             datasets, dedup_keys=DEFAULT_KEY_COLUMNS)),
+    'create_composite_scores': (lambda inputs: (inputs.combined(),),
+                                dataset_combiner.create_composite_scores),
+    'clean_and_validate': (lambda inputs: (inputs.with_composites(),),
+                           lambda df: dataset_combiner.clean_and_validate(df, dedup_keys=None)),
+    'clean_data': (lambda inputs: (inputs.analysis_raw(),),
+                   lambda df: mental_health_analysis.clean_data(
+                       df, dedup_keys=DEFAULT_KEY_COLUMNS)),
+    'compute_moments': (lambda inputs: (inputs.analysis(),),
+                        mental_health_analysis.compute_moments),
+    'rank_correlation': (lambda inputs: (inputs.analysis(),),
+                         lambda df: RankCorrelation(df, RANK_COLUMNS).corr_matrix(
+                             RANK_COLUMNS, 'kendall')),
+    **{stage: (lambda inputs, stage=stage: inputs.analysis_stage_args(stage),
+               getattr(mental_health_analysis, stage))
+       for stage in ['statistical_testing'] + PLOT_STAGES},
+}
+
+# ----------------------------------------------------------------------
+# Measurement
+# ----------------------------------------------------------------------
+
+def _status_kb(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    raise OSError(f"{field} not in /proc/self/status")
+
+def reset_peak_rss():
+    """
+    Reset the peak-RSS counter; returns the RSS measurement method
+    """
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        _status_kb('VmHWM')
+        return 'vmhwm'
+    except OSError:
+        return 'ru_maxrss'
+
+def current_rss_mb():
+    try:
+        return _status_kb('VmRSS') / 1024
+    except OSError:
+        return float('nan')
+
+def peak_rss_mb(method):
+    if method == 'vmhwm':
+        return _status_kb('VmHWM') / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _cpu_seconds():
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (self_usage.ru_utime + self_usage.ru_stime
+            + child_usage.ru_utime + child_usage.ru_stime)
+
+def _run_case(stage, rows, data_dir, scratch_dir, conn):
+    """
+    Child process body: build the input, then measure one stage call
+    """
+
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            mental_health_analysis.VISUALIZATION_DIR = scratch_dir
+            setup, function = STAGES[stage]
+            args = setup(Inputs(rows, data_dir, scratch_dir))
+            gc.collect()
+
+            method = reset_peak_rss()
+            start_rss = current_rss_mb()
+            wall_start, cpu_start = time.perf_counter(), _cpu_seconds()
+            function(*args)
+            wall, cpu = time.perf_counter() - wall_start, _cpu_seconds() - cpu_start
+            peak = peak_rss_mb(method)
+
+        conn.send({'status': 'ok', 'wall_s': round(wall, 4), 'cpu_s': round(cpu, 4),
+                   'peak_rss_mb': round(peak, 1),
+                   'peak_rss_delta_mb': round(peak - start_rss, 1) if method == 'vmhwm' else None,
+                   'rss_method': method})
+    except Exception as e:
+        conn.send({'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+def run_case(stage, rows, data_dir, scratch_dir, timeout):
+    """
+    Measure one stage at one size in a fresh process
+    """
+
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_case, args=(stage, rows, data_dir, scratch_dir, sender))
+    process.start()
+    sender.close()
+
+    result = {'status': 'timeout'}
+    if receiver.poll(timeout):
+        try:
+            result = receiver.recv()
+        except EOFError:
+            result = {'status': 'error', 'error': 'benchmark process died'}
+    process.join(5)
+    if process.is_alive():
+        process.kill()
+        process.join()
+    elif result['status'] == 'timeout' and process.exitcode:
+        result = {'status': 'error', 'error': f"benchmark process exited with {process.exitcode}"}
+
+    return {'stage': stage, 'rows': rows, **result}
+
+# ----------------------------------------------------------------------
+# Results and baseline
+# ----------------------------------------------------------------------
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+    }
+
+def write_json(path, payload):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+def compare(results, baseline, time_tolerance=TIME_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    """
+    Regressions of results against baseline results, as readable strings;
+    failed cases always count
+    """
+
+    reference = {(case['stage'], case['rows']): case for case in baseline.get('results', [])}
+    regressions = []
+
+    for case in results:
+        label = f"{case['stage']} @ {format_size(case['rows'])}"
+        if case['status'] == 'skipped':
+            continue
+        if case['status'] != 'ok':
+            regressions.append(f"{label}: {case['status']} {case.get('error', '')}".rstrip())
+            continue
+
+        base = reference.get((case['stage'], case['rows']))
+        if not base or base.get('status') != 'ok':
+            continue
+
+        wall, base_wall = case['wall_s'], base['wall_s']
+        if wall > base_wall * (1 + time_tolerance) and wall - base_wall > MIN_SECONDS:
+            regressions.append(f"{label}: wall time {base_wall:.3f}s → {wall:.3f}s")
+
+        rss, base_rss = case['peak_rss_mb'], base['peak_rss_mb']
+        if rss > base_rss * (1 + memory_tolerance) and rss - base_rss > MIN_MEGABYTES:
+            regressions.append(f"{label}: peak RSS {base_rss:.1f} MB → {rss:.1f} MB")
+
+    return regressions
+
+def uncovered(results, baseline):
+    """
+    Measured cases the baseline has no successful result for, which the
+    comparison cannot check
+    """
+
+    reference = {(case['stage'], case['rows']) for case in baseline.get('results', [])
+                 if case.get('status') == 'ok'}
+    return [f"{case['stage']} @ {format_size(case['rows'])}" for case in results
+            if case['status'] == 'ok' and (case['stage'], case['rows']) not in reference]
+
+def environment_changes(current, baseline):
+    """
+    Machine properties that differ from the baseline's, as readable strings
+    """
+
+    recorded = baseline.get('environment', {})
+    return [f"{key} {recorded.get(key)} → {current[key]}"
+            for key in ('platform', 'cpu_count', 'python', 'pandas', 'numpy')
+            if recorded.get(key) != current[key]]
+
+def print_case(case):
+    label = f"{case['stage']:<28} {format_size(case['rows']):>5}"
+    if case['status'] == 'ok':
+        print(f"  {label}  wall {case['wall_s']:>9.3f}s  cpu {case['cpu_s']:>9.3f}s  "
+              f"peak RSS {case['peak_rss_mb']:>8.1f} MB")
+    else:
+        print(f"  {label}  {case['status']} {case.get('error', '')}")
+
+# ----------------------------------------------------------------------
+# Command line
+# ----------------------------------------------------------------------
+
+def parse_args(argv=None):
+    """
+    Parse command line options
+    """
+
+    parser = argparse.ArgumentParser(description="Benchmark the mental health pipeline stages")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help="Comma-separated row counts, e.g. 10k,1M,10M")
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help="Comma-separated stages to run (default: all)")
+    parser.add_argument('--plot-row-limit', type=parse_size, default=1_000_000,
+                        help="Skip plotting stages above this many rows (0: no limit)")
+    parser.add_argument('--timeout', type=float, default=1800,
+                        help="Seconds before a case is abandoned")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help="Where generated raw inputs are kept between runs")
+    parser.add_argument('--output', default=DEFAULT_RESULTS,
+                        help="Results file (JSON)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help="Baseline results to compare against")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Store this run as the new baseline instead of comparing")
+    parser.add_argument('--no-compare', action='store_true',
+                        help="Only record results; skip the baseline comparison")
+    parser.add_argument('--time-tolerance', type=float, default=TIME_TOLERANCE,
+                        help="Allowed relative wall-time increase")
+    parser.add_argument('--memory-tolerance', type=float, default=MEMORY_TOLERANCE,
+                        help="Allowed relative peak-RSS increase")
+    args = parser.parse_args(argv)
+
+    args.sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    args.stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in args.stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}; choose from {', '.join(STAGES)}")
+
+    return args
+
+def main(argv=None):
+    """
+    Main execution
+    """
+
+    args = parse_args(argv)
+
+    print("="*70)
+    print("PIPELINE BENCHMARKS")
+    print("="*70)
+    print(f"\nSizes: {', '.join(format_size(rows) for rows in args.sizes)}")
+    print(f"Stages: {', '.join(args.stages)}\n")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='mh_bench_') as scratch_dir:
+        for rows in args.sizes:
+            print(f"Preparing inputs for {format_size(rows)} rows...")
+            Inputs(rows, args.data_dir, scratch_dir).raw_dir()
+
+            for stage in args.stages:
+                if stage in PLOT_STAGES and args.plot_row_limit and rows > args.plot_row_limit:
+                    case = {'stage': stage, 'rows': rows, 'status': 'skipped',
+                            'error': f"above --plot-row-limit {format_size(args.plot_row_limit)}"}
+                else:
+                    case = run_case(stage, rows, args.data_dir, scratch_dir, args.timeout)
+                results.append(case)
+                print_case(case)
+            print()
+
+    payload = {'environment': environment(), 'results': results}
+    write_json(args.output, payload)
+    print(f"✓ Results saved: {args.output}")
+
+    if args.update_baseline:
+        write_json(args.baseline, payload)
+        print(f"✓ Baseline updated: {args.baseline}")
+        return 0
+
+    failed = [case for case in results if case['status'] in ('error', 'timeout')]
+    if args.no_compare:
+        print("\n⚠ Baseline comparison skipped (--no-compare)")
+        return 1 if failed else 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n✗ No baseline at {args.baseline}: the regression check cannot run.")
+        print("  Record one with --update-baseline, or pass --no-compare to only record results")
+        return 1
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    changes = environment_changes(payload['environment'], baseline)
+    if changes:
+        print(f"\n⚠ Baseline recorded on a different environment ({'; '.join(changes)}); "
+              f"timings may not be comparable")
+    missing = uncovered(results, baseline)
+    if missing:
+        print(f"\n⚠ {len(missing)} case(s) not in the baseline, not checked:")
+        for label in missing:
+            print(f"  - {label}")
+
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s) against {args.baseline}:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+
+    print(f"\n✓ No regressions against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,8 +9,24 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
-# Data path
-DATA_PATH = '../data/processed/processed_mental_health_data.csv'
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from columnar_io import partition_values, preferred_input, read_table
+from moment_stats import Moments
+from schema import apply_dtype_plan
+from scatter_density import density_grid, use_density
+from synthetic_data import generate_sample
+
+# Columns the dashboard pages use; columnar inputs load only these
+DASHBOARD_COLUMNS = [
+    'gender', 'year_of_study', 'depression_score', 'anxiety_score', 'stress_level',
+    'campus_safety', 'social_support', 'campus_facilities',
+    'accommodation_satisfaction', 'peer_relationships',
+    'seeks_counseling', 'aware_of_services',
+    'campus_environment_score', 'academic_expectation_score', 'mental_health_score',
+]
 
 # Data path
 DATA_PATH = '../data/processed/processed_mental_health_data.csv'
@@ -64,61 +80,32 @@ page = st.sidebar.radio(
     ["Overview", "Distribution", "Correlations", "Comparisons", "Recommendations"]
 )
 
+@st.cache_data
+def source_options():
+    # Source labels of the real data (directory names when it is partitioned)
+    try:
+        return partition_values(preferred_input(DATA_PATH), 'source')
+    except FileNotFoundError:
+        return []
+
+sources = source_options()
+selected_sources = sources
+if len(sources) > 1:
+    selected_sources = st.sidebar.multiselect("Sources:", sources, default=sources)
+
 # Sample data generation
 @st.cache_data
-def load_data():
-    # Try to load real data first
+def load_data(selected=None):
+    # Try to load real data first; selected limits it to those sources
     try:
-        df = pd.read_csv(DATA_PATH)
-        return df
+        filters = {'source': list(selected)} if selected is not None else None
+        df = read_table(preferred_input(DATA_PATH), DASHBOARD_COLUMNS, filters)
+        return apply_dtype_plan(df)
     except FileNotFoundError:
         pass
     
     # Generate sample data
-    np.random.seed(42)
-    n = 500
-    
-    data = {
-        'student_id': range(1, n + 1),
-        'age': np.random.randint(18, 26, n),
-        'gender': np.random.choice(['Male', 'Female', 'Other'], n, p=[0.45, 0.50, 0.05]),
-        'year_of_study': np.random.choice([1, 2, 3, 4], n),
-        'cgpa': np.round(np.random.uniform(2.0, 4.0, n), 2),
-        'depression_score': np.random.randint(1, 6, n),
-        'anxiety_score': np.random.randint(1, 6, n),
-        'stress_level': np.random.randint(1, 6, n),
-        'sleep_quality': np.random.randint(1, 6, n),
-        'campus_safety': np.random.randint(1, 6, n),
-        'social_support': np.random.randint(1, 6, n),
-        'campus_facilities': np.random.randint(1, 6, n),
-        'accommodation_satisfaction': np.random.randint(1, 6, n),
-        'peer_relationships': np.random.randint(1, 6, n),
-        'academic_pressure': np.random.randint(1, 6, n),
-        'workload_stress': np.random.randint(1, 6, n),
-        'exam_anxiety': np.random.randint(1, 6, n),
-        'grade_expectations': np.random.randint(1, 6, n),
-        'career_concerns': np.random.randint(1, 6, n),
-        'seeks_counseling': np.random.choice(['Yes', 'No'], n, p=[0.3, 0.7]),
-        'aware_of_services': np.random.choice(['Yes', 'No'], n, p=[0.6, 0.4]),
-    }
-    
-    df = pd.DataFrame(data)
-    
-    # Add realistic correlations
-    df['depression_score'] = np.clip(
-        df['depression_score'] + 0.3 * df['academic_pressure'] - 0.2 * df['social_support'],
-        1, 5
-    ).astype(int)
-    
-    df['anxiety_score'] = np.clip(
-        df['anxiety_score'] + 0.4 * df['exam_anxiety'] - 0.15 * df['campus_safety'],
-        1, 5
-    ).astype(int)
-    
-    df['stress_level'] = np.clip(
-        df['stress_level'] + 0.35 * df['workload_stress'] - 0.2 * df['peer_relationships'],
-        1, 5
-    ).astype(int)
+    df = generate_sample(500, seed=42)
     
     # Composite scores
     df['campus_environment_score'] = (
@@ -135,9 +122,30 @@ def load_data():
         df['depression_score'] + df['anxiety_score'] + df['stress_level'] + df['sleep_quality']
     ) / 4
     
-    return df
+    return apply_dtype_plan(df)
+
+def density_figure(df, x_col, y_col, labels):
+    # 2D histogram of x/y binned here (not in the browser) and the OLS
+    # trend line from the moments of the two columns
+    counts, x_edges, y_edges = density_grid(df[x_col], df[y_col])
+    moments = Moments([x_col, y_col])
+    moments.update(df[[x_col, y_col]].to_numpy(dtype='float64', na_value=np.nan))
+    slope, intercept = moments.linear_fit(x_col, y_col)
+    
+    fig = go.Figure(go.Heatmap(x=(x_edges[:-1] + x_edges[1:]) / 2,
+                               y=(y_edges[:-1] + y_edges[1:]) / 2,
+                               z=np.where(counts.T > 0, counts.T, np.nan),
+                               colorscale='Blues', colorbar={'title': 'Students'}))
+    ends = x_edges[[0, -1]]
+    fig.add_trace(go.Scatter(x=ends, y=slope * ends + intercept, mode='lines',
+                             name='Trend Line', line={'color': 'red', 'dash': 'dash'}))
+    fig.update_layout(xaxis_title=labels[x_col], yaxis_title=labels[y_col])
+    return fig
 
-df = load_data()
+df = load_data(tuple(selected_sources) if selected_sources != sources else None)
+if df.empty:
+    st.warning("No students in the selected sources.")
+    st.stop()
 
 # OVERVIEW PAGE
 if page == "Overview":
@@ -222,7 +230,7 @@ elif page == "Distribution":
     
     # Year-wise analysis
     st.subheader("Mental Health by Academic Year")
-    year_data = df.groupby('year_of_study')[['depression_score', 'anxiety_score', 'stress_level']].mean().reset_index()
+    year_data = df.groupby('year_of_study', observed=True)[['depression_score', 'anxiety_score', 'stress_level']].mean().reset_index()
     year_data['year_of_study'] = 'Year ' + year_data['year_of_study'].astype(str)
     
     fig = go.Figure()
@@ -242,7 +250,7 @@ elif page == "Distribution":
     
     with col1:
         st.subheader("Gender-wise Comparison")
-        gender_data = df.groupby('gender')[['depression_score', 'anxiety_score', 'stress_level']].mean().reset_index()
+        gender_data = df.groupby('gender', observed=True)[['depression_score', 'anxiety_score', 'stress_level']].mean().reset_index()
         gender_data_melted = gender_data.melt(id_vars='gender', var_name='Indicator', value_name='Score')
         
         fig = px.bar(gender_data_melted, x='gender', y='Score', color='Indicator', barmode='group',
@@ -303,14 +311,18 @@ elif page == "Correlations":
         Higher pressure leads to worse mental health
         """)
     
-    # Scatter plot
+    # Scatter plot (a density of the students for large cohorts)
     st.subheader("Campus Environment vs Mental Health Score")
-    fig = px.scatter(df, x='campus_environment_score', y='mental_health_score',
-                     color='academic_expectation_score',
-                     trendline='ols',
-                     labels={'campus_environment_score': 'Campus Environment Score',
-                            'mental_health_score': 'Mental Health Score',
-                            'academic_expectation_score': 'Academic Expectations'})
+    labels = {'campus_environment_score': 'Campus Environment Score',
+              'mental_health_score': 'Mental Health Score',
+              'academic_expectation_score': 'Academic Expectations'}
+    if use_density(len(df)):
+        fig = density_figure(df, 'campus_environment_score', 'mental_health_score', labels)
+    else:
+        fig = px.scatter(df, x='campus_environment_score', y='mental_health_score',
+                         color='academic_expectation_score',
+                         trendline='ols',
+                         labels=labels)
     st.plotly_chart(fig, use_container_width=True)
     
     st.info("📌 Strong negative correlation (r = -0.45, p < 0.05): Better campus environment significantly associated with better mental health.")
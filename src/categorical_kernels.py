@@ -0,0 +1,104 @@
+"""
+Vectorized Categorical Normalization for Student Mental Health Analysis
+Shared by the dataset combiner and the analysis script
+
+Each kernel factorizes the column once, maps the (few) distinct labels
+with isin masks or dictionary lookups, and broadcasts the result back
+through the integer codes; no Python function runs per row.
+"""
+
+import numpy as np
+import pandas as pd
+
+YES_VALUES = ['yes', 'Yes', 'YES', 'y', 'Y', 'true', 'True', '1']
+
+# Spellings to_yes_no reads as 'No' on purpose; anything else it also maps
+# to 'No', but schema validation reports it as an unknown answer
+NO_VALUES = ['no', 'No', 'NO', 'n', 'N', 'false', 'False', '0']
+
+GENDER_MAPPING = {
+    'male': 'Male', 'Male': 'Male', 'M': 'Male', 'm': 'Male',
+    'female': 'Female', 'Female': 'Female', 'F': 'Female', 'f': 'Female',
+    'other': 'Other', 'Other': 'Other', 'non-binary': 'Other',
+    'prefer not to say': 'Other', 'Prefer not to say': 'Other'
+}
+
+YES_NO_SCORES = {'Yes': 5, 'No': 1, 'yes': 5, 'no': 1}
+
+ACCOMMODATION_SCORES = {
+    'On-Campus': 4,
+    'Off-Campus': 3,
+    'Home': 3,
+    'With Family': 4,
+    'Alone': 2
+}
+
+_HOMOGENEOUS = {'string', 'empty', 'integer', 'floating', 'boolean'}
+
+def factorize_labels(series, strip=True):
+    """
+    Integer codes plus the string label of every distinct value
+
+    Missing values get code -1, which indexes the trailing 'nan' label,
+    matching what series.astype(str) produces for them.
+    """
+
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) not in _HOMOGENEOUS:
+        # 1, 1.0 and True hash as one value but print differently
+        series = series.astype(str).where(series.notna())
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    labels = np.asarray(uniques, dtype=object).astype(str).tolist() + ['nan']
+    labels = pd.Index(labels, dtype=object)
+    if strip:
+        labels = labels.str.strip()
+    return codes, labels
+
+def _broadcast(series, codes, lookup):
+    values = np.asarray(lookup, dtype=object)[codes]
+    return pd.Series(values, index=series.index, name=series.name)
+
+def normalize_gender(series):
+    """
+    Map gender spellings to Male/Female/Other (unknown values -> Other)
+    """
+
+    codes, labels = factorize_labels(series)
+    lookup = labels.map(GENDER_MAPPING).fillna('Other')
+    return _broadcast(series, codes, lookup)
+
+def to_yes_no(series):
+    """
+    'Yes' for any accepted yes spelling (yes, Y, true, 1, ...), else 'No'
+    """
+
+    codes, labels = factorize_labels(series)
+    lookup = np.where(labels.isin(YES_VALUES), 'Yes', 'No')
+    return _broadcast(series, codes, lookup)
+
+def yes_no_to_score(series):
+    """
+    Yes/No answers as 5/1 scores; anything else becomes NaN
+    """
+
+    codes, labels = factorize_labels(series, strip=False)
+    lookup = labels.map(YES_NO_SCORES).to_numpy(dtype=float)
+    return pd.Series(lookup[codes], index=series.index, name=series.name)
+
+def accommodation_to_score(series):
+    """
+    Residence type as a 1-5 satisfaction score (unknown types -> 3)
+    """
+
+    codes, labels = factorize_labels(series)
+    lookup = labels.map(ACCOMMODATION_SCORES).fillna(3).to_numpy(dtype=np.int64)
+    return pd.Series(lookup[codes], index=series.index, name=series.name)
+
+def clean_labels(series, replacements):
+    """
+    Strip whitespace from labels and apply a replacement dictionary
+    """
+
+    codes, labels = factorize_labels(series)
+    lookup = [replacements.get(label, label) for label in labels]
+    return _broadcast(series, codes, lookup)
@@ -0,0 +1,144 @@
+"""
+Stage Checkpoints for the Dataset Combiner
+Lets a failed combiner run resume from its last completed stage
+
+With --checkpoint, every combiner run keeps its progress in a work
+directory:
+
+- files/: the standardized intermediate of each input, stored as soon as
+  it is ready (same format and content-hash keys as the incremental
+  cache, see combiner_cache)
+- <stage>.pkl: the frame after each completed stage, e.g. the merged
+  frame before cleaning
+- checkpoints.json: the run key and the completed stages
+
+Every file is written to a temporary name, flushed to disk and renamed,
+so a crash leaves either the previous checkpoint or the new one, never a
+torn file. With --resume a run whose run key matches (same input files,
+by path, size and mtime, and same options) loads the last completed stage
+and continues after it. Per-file intermediates are keyed by content, so
+any checkpointed run reuses those of unchanged inputs. A successful run
+clears the work directory.
+"""
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+import combiner_cache
+
+WORK_DIR = '../data/processed/.combiner_work'
+STATE_NAME = 'checkpoints.json'
+FILES_DIR = 'files'
+CHECKPOINT_VERSION = 1
+
+def run_key(sources, options):
+    """
+    Key of a run: the identity (path, member or sheet, size, mtime) of
+    every input plus the pipeline options
+    """
+
+    inputs = []
+    for name, source in sources.items():
+        if isinstance(source, pd.DataFrame):
+            inputs.append([name, len(source)])
+            continue
+        path = source['path'] if isinstance(source, dict) else source
+        stat = os.stat(path)
+        part = (source.get('member') or source.get('sheet')) if isinstance(source, dict) else None
+        inputs.append([name, os.path.abspath(path), part, stat.st_size, stat.st_mtime_ns])
+
+    payload = json.dumps([CHECKPOINT_VERSION, combiner_cache.CACHE_VERSION, inputs, options],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _atomic_write(path, write):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class CheckpointStore:
+    """
+    Completed stages of one combiner run, persisted in work_dir
+    """
+
+    def __init__(self, work_dir, key, resume=False):
+        self.work_dir = work_dir
+        self.key = key
+        self.files_dir = os.path.join(work_dir, FILES_DIR)
+        self.completed = []
+
+        state = self._load_state()
+        if resume and state.get('key') == key:
+            self.completed = [stage for stage in state.get('completed', [])
+                              if os.path.exists(self._path(stage))]
+        else:
+            if resume and state:
+                print("⚠ Checkpoints belong to different inputs or options; starting over")
+            self.clear(keep_files=True)
+
+        os.makedirs(work_dir, exist_ok=True)
+        self._save_state()
+
+    def _path(self, stage):
+        return os.path.join(self.work_dir, f"{stage}.pkl")
+
+    def _load_state(self):
+        try:
+            with open(os.path.join(self.work_dir, STATE_NAME), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self):
+        state = json.dumps({'version': CHECKPOINT_VERSION, 'key': self.key,
+                            'completed': self.completed}, indent=2)
+        _atomic_write(os.path.join(self.work_dir, STATE_NAME),
+                      lambda f: f.write(state.encode('utf-8')))
+
+    def last_completed(self, stages):
+        """
+        Latest of stages (in pipeline order) with a checkpoint, or None
+        """
+
+        done = [stage for stage in stages if stage in self.completed]
+        return done[-1] if done else None
+
+    def load(self, stage):
+        return pd.read_pickle(self._path(stage))
+
+    def save(self, stage, df):
+        """
+        Checkpoint the frame after stage (attrs, e.g. virtual defaults, included)
+        """
+
+        _atomic_write(self._path(stage),
+                      lambda f: pd.to_pickle(df, f, protocol=5))
+        if stage not in self.completed:
+            self.completed.append(stage)
+        self._save_state()
+
+    def clear(self, keep_files=False):
+        """
+        Remove the stage checkpoints (and the per-file intermediates unless
+        keep_files); only files this store writes are touched
+        """
+
+        if not os.path.isdir(self.work_dir):
+            return
+        for filename in os.listdir(self.work_dir):
+            if filename == STATE_NAME or filename.endswith(('.pkl', '.pkl.tmp', '.json.tmp')):
+                os.remove(os.path.join(self.work_dir, filename))
+        if not keep_files and os.path.isdir(self.files_dir):
+            for filename in os.listdir(self.files_dir):
+                if filename == combiner_cache.MANIFEST_NAME or filename.endswith(('.pkl', '.tmp')):
+                    os.remove(os.path.join(self.files_dir, filename))
+            for directory in [self.files_dir, self.work_dir]:
+                if os.path.isdir(directory) and not os.listdir(directory):
+                    os.rmdir(directory)
+        self.completed = []
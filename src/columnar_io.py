@@ -0,0 +1,559 @@
+"""
+Columnar Storage Helpers for Student Mental Health Analysis
+Reads and writes the processed datasets as CSV, Parquet or Feather
+
+A dataset can also be stored as a directory of Hive-style partitions,
+e.g. combined_mental_health_data/source=survey_a.csv/part-0-0.parquet,
+described by a _partitioning.json file. Filtered loads of such a directory
+only open the files of the matching partitions.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from schema import INTEGER_DTYPES, NULLABLE_INTEGERS
+
+TABLE_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.feather': 'feather',
+}
+
+PARTITION_METADATA = '_partitioning.json'
+
+# pyarrow.dataset names of the table formats
+DATASET_FORMATS = {'csv': 'csv', 'parquet': 'parquet', 'feather': 'ipc'}
+
+def table_format(path):
+    """
+    Infer the storage format from the file extension (defaults to csv)
+    """
+
+    ext = os.path.splitext(path)[1].lower()
+    return TABLE_FORMATS.get(ext, 'csv')
+
+def with_format(path, fmt):
+    """
+    Return path with its extension swapped for the given format
+    """
+
+    return f"{os.path.splitext(path)[0]}.{fmt}"
+
+def partitioned_path(path):
+    """
+    Directory holding the partitioned variant of a dataset path
+    """
+
+    return os.path.splitext(path)[0]
+
+def is_partitioned(path):
+    """
+    Whether path is a partitioned dataset directory
+    """
+
+    return os.path.isfile(os.path.join(path, PARTITION_METADATA))
+
+def partition_info(path):
+    """
+    Layout of a partitioned dataset: partition columns, file format and
+    logical column order
+    """
+
+    with open(os.path.join(path, PARTITION_METADATA), encoding='utf-8') as f:
+        return json.load(f)
+
+def preferred_input(path):
+    """
+    Prefer a partitioned or Parquet/Feather sibling of a CSV path when one
+    exists and is at least as new as the CSV, so loaders skip re-parsing
+    text; the newest such sibling wins
+    """
+
+    if is_partitioned(path) or table_format(path) != 'csv':
+        return path
+
+    csv_mtime = os.path.getmtime(path) if os.path.exists(path) else None
+
+    candidates = []
+    directory = partitioned_path(path)
+    if is_partitioned(directory):
+        candidates.append((os.path.getmtime(os.path.join(directory, PARTITION_METADATA)),
+                           directory))
+    for fmt in ('parquet', 'feather'):
+        candidate = with_format(path, fmt)
+        if os.path.exists(candidate):
+            candidates.append((os.path.getmtime(candidate), candidate))
+
+    fresh = [(mtime, candidate) for mtime, candidate in candidates
+             if csv_mtime is None or mtime >= csv_mtime]
+    if fresh:
+        return max(fresh, key=lambda item: item[0])[1]
+
+    return path
+
+def _column_names(path, fmt):
+    """
+    Read only the schema of a columnar file
+    """
+
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+
+    import pyarrow.ipc as ipc
+    with ipc.open_file(path) as reader:
+        return reader.schema.names
+
+def filter_mask(df, filters):
+    """
+    Rows of df whose filtered columns hold one of the listed values
+    (compared as text, like partition values)
+    """
+
+    mask = pd.Series(True, index=df.index)
+    for col, values in filters.items():
+        if col not in df.columns:
+            raise KeyError(f"Cannot filter on '{col}': not a column of the dataset")
+        mask &= df[col].astype(str).isin([str(value) for value in _as_list(values)])
+    return mask
+
+def _as_list(values):
+    return list(values) if isinstance(values, (list, tuple, set)) else [values]
+
+def read_table(path, columns=None, filters=None):
+    """
+    Load a dataset in any supported format
+
+    columns restricts the load to the listed columns; names missing from
+    the file are ignored. Parquet and Feather keep nullable integer and
+    categorical dtypes; CSV dtypes are re-inferred by pandas.
+
+    filters maps a column to the value (or list of values) rows must hold,
+    e.g. {'source': ['survey_a.csv']}. Partitioned datasets only read the
+    matching partitions; flat files are filtered after loading.
+    """
+
+    if os.path.isdir(path):
+        return _read_partitioned(path, columns, filters)
+
+    fmt = table_format(path)
+    wanted = columns
+    if filters and columns is not None:
+        wanted = list(columns) + [col for col in filters if col not in columns]
+
+    if fmt == 'csv':
+        if wanted is None:
+            df = pd.read_csv(path)
+        else:
+            wanted_set = set(wanted)
+            df = pd.read_csv(path, usecols=lambda col: col in wanted_set)
+    else:
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+
+        if wanted is not None:
+            available = set(_column_names(path, fmt))
+            wanted = [col for col in wanted if col in available]
+
+        if fmt == 'parquet':
+            df = pd.read_parquet(path, columns=wanted)
+        else:
+            df = pd.read_feather(path, columns=wanted)
+
+    if filters:
+        df = df[filter_mask(df, filters)].reset_index(drop=True)
+        if columns is not None:
+            df = df[[col for col in df.columns if col in columns]]
+    return df
+
+def _partition_filter(filters, partition_by):
+    import pyarrow.dataset as ds
+
+    expression = None
+    for col, values in (filters or {}).items():
+        if col not in partition_by:
+            continue
+        condition = ds.field(col).isin([str(value) for value in _as_list(values)])
+        expression = condition if expression is None else expression & condition
+    return expression
+
+def _open_dataset(path):
+    """
+    pyarrow dataset over a partitioned directory (partition values read
+    as text) and its layout
+    """
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if not is_partitioned(path):
+        raise FileNotFoundError(os.path.join(path, PARTITION_METADATA))
+
+    info = partition_info(path)
+    partitioning = ds.partitioning(
+        pa.schema([(col, pa.string()) for col in info['partition_by']]), flavor='hive')
+    dataset = ds.dataset(path, format=DATASET_FORMATS[info['format']],
+                         partitioning=partitioning)
+    return dataset, info
+
+def _read_partitioned(path, columns=None, filters=None):
+    """
+    Load the partitions of a dataset directory matching filters;
+    partition columns come back as categoricals
+    """
+
+    import pyarrow.dataset as ds
+
+    dataset, info = _open_dataset(path)
+    partition_by = info['partition_by']
+    expression = _partition_filter(filters, partition_by)
+    row_filters = {col: values for col, values in (filters or {}).items()
+                   if col not in partition_by}
+
+    order = [col for col in info['columns'] if columns is None or col in columns]
+    order += [col for col in row_filters if col not in order]
+
+    if info['format'] == 'csv':
+        # Each file is parsed by pandas, as a flat CSV would be, so dtypes
+        # are inferred per partition instead of from the first file
+        frames = []
+        for fragment in dataset.get_fragments(filter=expression):
+            keys = ds.get_partition_keys(fragment.partition_expression)
+            file_columns = [col for col in order if col not in keys]
+            frame = pd.read_csv(fragment.path, usecols=lambda col: col in file_columns)
+            for col, value in keys.items():
+                frame[col] = value
+            frames.append(frame)
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=order)
+    else:
+        available = set(dataset.schema.names)
+        table = dataset.to_table(columns=[col for col in order if col in available],
+                                 filter=expression)
+        df = table.to_pandas()
+
+    for col in partition_by:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    if row_filters:
+        df = df[filter_mask(df, row_filters)].reset_index(drop=True)
+
+    return df[[col for col in order if col in df.columns
+               and (columns is None or col in columns)]]
+
+def partition_values(path, column):
+    """
+    Distinct values of column; for a partitioned dataset these come from
+    the partition directory names, without reading any data file
+    """
+
+    info = partition_info(path) if os.path.isdir(path) else None
+    if info is not None and column in info['partition_by']:
+        import pyarrow.dataset as ds
+
+        dataset, info = _open_dataset(path)
+        values = {ds.get_partition_keys(fragment.partition_expression).get(column)
+                  for fragment in dataset.get_fragments()}
+        return sorted(value for value in values if value is not None)
+
+    values = read_table(path, [column])
+    if column not in values.columns:
+        return []
+    return sorted(values[column].dropna().astype(str).unique())
+
+def _raw_chunks(path, columns, chunksize, filters=None):
+    """
+    Frames of up to chunksize rows of one dataset, restricted to the
+    available columns of columns (all when None); a partitioned dataset
+    only reads the partitions matching filters
+    """
+
+    if os.path.isdir(path):
+        import pyarrow.dataset as ds
+
+        dataset, info = _open_dataset(path)
+        expression = _partition_filter(filters, info['partition_by'])
+        order = [col for col in info['columns'] if columns is None or col in columns]
+        if info['format'] == 'csv':
+            for fragment in dataset.get_fragments(filter=expression):
+                keys = ds.get_partition_keys(fragment.partition_expression)
+                file_columns = [col for col in order if col not in keys]
+                for chunk in pd.read_csv(fragment.path, chunksize=chunksize,
+                                         usecols=lambda col: col in file_columns):
+                    for col, value in keys.items():
+                        chunk[col] = value
+                    yield chunk
+        else:
+            available = set(dataset.schema.names)
+            for batch in dataset.to_batches(columns=[col for col in order if col in available],
+                                            filter=expression, batch_size=chunksize):
+                yield batch.to_pandas()
+        return
+
+    fmt = table_format(path)
+    if fmt == 'csv':
+        wanted = None if columns is None else set(columns)
+        yield from pd.read_csv(path, chunksize=chunksize,
+                               usecols=None if wanted is None else (lambda col: col in wanted))
+        return
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    if columns is not None:
+        available = set(_column_names(path, fmt))
+        columns = [col for col in columns if col in available]
+
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns)
+        for batch in batches:
+            yield batch.to_pandas()
+    else:
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        with ipc.open_file(pa.memory_map(path, 'r')) as reader:
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(columns)
+                for start in range(0, batch.num_rows, chunksize):
+                    yield batch.slice(start, chunksize).to_pandas()
+
+def iter_table(path, columns=None, chunksize=100_000, filters=None):
+    """
+    Read a dataset (any format, flat or partitioned) as a stream of frames
+    of at most chunksize rows, so it never has to fit in memory; columns
+    and filters work as in read_table
+    """
+
+    wanted = columns
+    if filters and columns is not None:
+        wanted = list(columns) + [col for col in filters if col not in columns]
+
+    for chunk in _raw_chunks(path, wanted, chunksize, filters):
+        if filters:
+            chunk = chunk[filter_mask(chunk, filters)]
+            if columns is not None:
+                chunk = chunk[[col for col in chunk.columns if col in columns]]
+        if len(chunk):
+            yield chunk
+
+def write_table(df, path, partition_by=None):
+    """
+    Save a dataset in the format implied by the file extension
+
+    With partition_by the dataset becomes a directory of partitions next to
+    path (see PartitionedWriter); its path is returned.
+    """
+
+    fmt = table_format(path)
+
+    if partition_by:
+        with PartitionedWriter(partitioned_path(path), partition_by, fmt) as writer:
+            writer.write(df)
+            writer.close(list(df.columns))
+        return writer.path
+
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    elif fmt == 'feather':
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_csv(path, index=False)
+
+    return path
+
+def stream_schema(chunk, float_columns=()):
+    """
+    Schema shared by all chunks of an incrementally written Parquet or
+    Feather dataset, fixed from its first chunk (a DataFrame)
+
+    Planned integer columns (schema.INTEGER_DTYPES) are stored as their
+    nullable 8-bit type, as in memory, so chunks with and without missing
+    values share it; those listed in float_columns hold values that are not
+    whole numbers somewhere in the dataset and become float32, as
+    apply_dtype_plan would make them. Other integer columns are widened to
+    float (float32 for 8/16-bit items), text and all-missing columns to
+    string. The pandas metadata follows the schema, so the file reads back
+    with nullable integer dtypes.
+    """
+
+    import pyarrow as pa
+
+    dtypes = {}
+    for col, dtype in chunk.dtypes.items():
+        if col in INTEGER_DTYPES:
+            dtypes[col] = ('float32' if col in float_columns
+                           else NULLABLE_INTEGERS[INTEGER_DTYPES[col]])
+        elif col not in ('student_id', 'source_row') and pd.api.types.is_integer_dtype(dtype):
+            dtypes[col] = 'float32' if dtype.itemsize <= 2 else 'float64'
+
+    schema = pa.Schema.from_pandas(chunk.iloc[:0].astype(dtypes), preserve_index=False)
+    fields = [field.with_type(pa.string())
+              if pa.types.is_null(field.type) or pa.types.is_string(field.type) else field
+              for field in schema]
+    return pa.schema(fields, metadata=schema.metadata)
+
+class TableWriter:
+    """
+    Incremental writer used by the streaming combiner
+
+    CSV chunks are appended as text. Parquet chunks become row groups of a
+    single file sharing the schema of the first chunk (see stream_schema):
+    planned integer columns stay nullable 8-bit integers unless listed in
+    float_columns, text columns become string. Categoricals stay
+    dictionary-encoded. Feather cannot be appended to and is rejected.
+    """
+
+    def __init__(self, path, float_columns=()):
+        self.path = path
+        self.format = table_format(path)
+        self.float_columns = set(float_columns)
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+        if self.format == 'feather':
+            raise ValueError("Feather output cannot be written incrementally; use .parquet or .csv")
+
+    def write(self, chunk):
+        if self.format == 'csv':
+            chunk.to_csv(self.path, mode='w' if self.rows == 0 else 'a',
+                         header=self.rows == 0, index=False)
+        else:
+            self._write_parquet(chunk)
+
+        self.rows += len(chunk)
+
+    def _write_parquet(self, chunk):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+
+        if self._schema is None:
+            self._schema = stream_schema(chunk, self.float_columns)
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+
+        self._writer.write_table(table.select(self._schema.names).cast(self._schema))
+
+    def close(self, columns=None):
+        """
+        Finish the file; columns gives the header for an empty output
+        """
+
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        elif self.rows == 0 and columns is not None:
+            write_table(pd.DataFrame(columns=columns), self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class PartitionedWriter:
+    """
+    Writes a dataset as a directory of Hive-style partitions, one
+    subdirectory per value of each partition_by column, in any of the
+    table formats (Feather files hold Arrow IPC)
+
+    Chunks are staged in a hidden directory inside path. On close every
+    staged partition replaces the same partition of the existing dataset
+    while partitions absent from this run are kept, so refreshing one
+    source rewrites only its directory. An aborted run leaves the dataset
+    untouched. With widen, Parquet and Feather chunks share the
+    stream_schema of the first chunk, as with TableWriter.
+    """
+
+    def __init__(self, path, partition_by, fmt='parquet', widen=False, float_columns=()):
+        self.path = path
+        self.partition_by = list(partition_by)
+        self.format = fmt
+        self.widen = widen and fmt != 'csv'
+        self.float_columns = set(float_columns)
+        self.rows = 0
+        self._schema = None
+        self._chunks = 0
+
+        if is_partitioned(path):
+            info = partition_info(path)
+            if info['partition_by'] != self.partition_by or info['format'] != fmt:
+                raise ValueError(
+                    f"{path} is partitioned by {info['partition_by']} as {info['format']}; "
+                    f"remove it to write {self.partition_by} as {fmt}")
+        elif os.path.isdir(path) and any(not name.startswith('.') for name in os.listdir(path)):
+            raise ValueError(f"{path} exists and is not a partitioned dataset")
+
+        os.makedirs(path, exist_ok=True)
+        self._staging = tempfile.mkdtemp(prefix='.staging-', dir=path)
+
+    def write(self, chunk):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        missing = [col for col in self.partition_by if col not in chunk.columns]
+        if missing:
+            raise KeyError(f"Partition column(s) not in the dataset: {missing}")
+
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if self.widen:
+            if self._schema is None:
+                self._schema = stream_schema(chunk, self.float_columns)
+            table = table.select(self._schema.names).cast(self._schema)
+
+        extension = 'feather' if self.format == 'feather' else self.format
+        ds.write_dataset(table, self._staging, format=DATASET_FORMATS[self.format],
+                         partitioning=self.partition_by, partitioning_flavor='hive',
+                         basename_template=f"part-{self._chunks}-{{i}}.{extension}",
+                         existing_data_behavior='overwrite_or_ignore')
+        self._chunks += 1
+        self.rows += len(chunk)
+
+    def close(self, columns=None):
+        """
+        Swap the staged partitions into the dataset and record its layout;
+        columns gives the logical column order
+        """
+
+        if self._staging is None:
+            return
+
+        staged = [directory for directory, _, filenames in os.walk(self._staging) if filenames]
+        for directory in staged:
+            target = os.path.join(self.path, os.path.relpath(directory, self._staging))
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(directory, target)
+        self.abort()
+
+        info = {'partition_by': self.partition_by, 'format': self.format,
+                'columns': list(columns or [])}
+        tmp_path = os.path.join(self.path, PARTITION_METADATA + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(info, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, PARTITION_METADATA))
+
+    def abort(self):
+        """
+        Drop the staged chunks
+        """
+
+        if self._staging is not None:
+            shutil.rmtree(self._staging, ignore_errors=True)
+            self._staging = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.abort()
+        return False
@@ -0,0 +1,116 @@
+"""
+Incremental Cache for the Dataset Combiner
+Records each input file's content hash and keeps its standardized intermediate
+"""
+
+import hashlib
+import json
+import os
+import pandas as pd
+
+CACHE_DIR = '../data/processed/.combiner_cache'
+MANIFEST_NAME = 'manifest.json'
+
+# Bump whenever the per-file standardization pipeline changes its output
+CACHE_VERSION = 6
+
+def file_digest(path, block_size=1 << 20):
+    """
+    SHA-256 of a file's content, read in blocks
+    """
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def fingerprint(path, previous=None):
+    """
+    Content hash, size and mtime of a file
+
+    The hash from the previous manifest entry is reused when size and mtime
+    are unchanged, so untouched files are not re-read.
+    """
+
+    stat = os.stat(path)
+    entry = {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    if previous and previous.get('size') == entry['size'] and previous.get('mtime') == entry['mtime']:
+        entry['sha256'] = previous['sha256']
+    else:
+        entry['sha256'] = file_digest(path)
+
+    return entry
+
+def intermediate_key(digest, options=None):
+    """
+    Cache key of a standardized intermediate: the input's content hash
+    combined with the pipeline version and options that shaped it
+    """
+
+    payload = json.dumps([digest, CACHE_VERSION, options], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _atomic_write_text(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def load_manifest(cache_dir=CACHE_DIR, options=None):
+    """
+    Read the manifest; a missing or outdated manifest, or one written with
+    different pipeline options, starts empty
+    """
+
+    path = os.path.join(cache_dir, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+
+    if manifest.get('version') != CACHE_VERSION or manifest.get('options') != options:
+        manifest = {'version': CACHE_VERSION, 'options': options, 'files': {}}
+
+    return manifest
+
+def save_manifest(manifest, cache_dir=CACHE_DIR):
+    """
+    Write the manifest and drop cached intermediates it no longer references
+    """
+
+    os.makedirs(cache_dir, exist_ok=True)
+    _atomic_write_text(os.path.join(cache_dir, MANIFEST_NAME),
+                       json.dumps(manifest, indent=2, sort_keys=True))
+
+    referenced = {f"{entry['key']}.pkl" for entry in manifest['files'].values()}
+    for filename in os.listdir(cache_dir):
+        if filename.endswith('.pkl') and filename not in referenced:
+            os.remove(os.path.join(cache_dir, filename))
+
+def _intermediate_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.pkl")
+
+def load_intermediate(key, cache_dir=CACHE_DIR):
+    """
+    Standardized frame cached under an intermediate key, or None
+    """
+
+    path = _intermediate_path(cache_dir, key)
+    if not os.path.exists(path):
+        return None
+    return pd.read_pickle(path)
+
+def store_intermediate(df, key, cache_dir=CACHE_DIR):
+    """
+    Cache a standardized frame under its intermediate key
+    """
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _intermediate_path(cache_dir, key)
+    tmp_path = f"{path}.tmp"
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+    return path
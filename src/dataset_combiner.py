@@ -6,28 +6,75 @@ Automatically finds and combines all CSV files in the directory
 import pandas as pd
 import numpy as np
 import os
-import glob
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
 
-def find_csv_files():
+from columnar_io import (PartitionedWriter, TableWriter, partitioned_path, table_format, with_format,
+                         write_table)
+import combiner_cache
+from checkpoints import WORK_DIR, CheckpointStore, run_key
+from transform_plan import compile_transform_plan, scale_values
+from schema import (INTEGER_DTYPES, SCALE_COLUMNS, VALID_RANGES, align_frames, apply_dtype_plan,
+                    empty_column, fill_missing)
+from dedup import DEFAULT_KEY_COLUMNS, RowDeduplicator
+from quantile_sketch import QuantileSketch, column_median
+from virtual_columns import (SOURCE_COLUMN, SOURCE_ROW_COLUMN, column_values, defaulted_mask,
+                             get_defaults, has_column, materialize_defaults, merge_defaults,
+                             register_defaults)
+from raw_sources import (RAW_DIR, discover_files, read_source, sniff_files, source_label,
+                         source_path)
+from instrumentation import Instrumentation, add_instrumentation_args
+from validation import DEFAULT_QUARANTINE, ValidationReport, split_valid
+
+DEFAULT_OUTPUT = '../data/processed/combined_mental_health_data.csv'
+
+logger = logging.getLogger('dataset_combiner')
+
+# Checkpointed stages, in pipeline order: the merged frame before cleaning
+# and the cleaned frame before export
+CHECKPOINT_STAGES = ['combined', 'cleaned']
+
+COMPOSITE_SCORES = {
+    'campus_environment_score': ['campus_safety', 'social_support', 'campus_facilities', 
+                                 'accommodation_satisfaction', 'peer_relationships'],
+    'academic_expectation_score': ['academic_pressure', 'workload_stress', 'exam_anxiety', 
+                                   'grade_expectations', 'career_concerns'],
+    'mental_health_score': ['depression_score', 'anxiety_score', 'stress_level', 'sleep_quality'],
+}
+
+def find_csv_files(input_dir=None, recursive=False):
     """
     Automatically find all CSV files in the current directory
-    """
-    csv_files = glob.glob("*.csv")
     
-    # Filter out any output files
-    csv_files = [f for f in csv_files if not f.startswith('combined_') 
-                 and not f.startswith('processed_')]
+    With input_dir (or recursive, which defaults input_dir to data/raw)
+    the directory tree is searched instead. Compressed exports (.csv.gz,
+    .csv.zst, ...), .zip bundles and Excel workbooks are included.
+    """
+    if input_dir is None:
+        input_dir = RAW_DIR if recursive else '.'
     
-    return csv_files
+    # Output files (combined_*, processed_*) are filtered out
+    return discover_files(input_dir, recursive=recursive)
 
-def load_and_inspect_datasets():
+def load_and_inspect_datasets(input_dir=None, recursive=False, sheets=None):
     """
-    Load all CSV files found in directory
+    Find all CSV files and inspect them
+    
+    Only the first few KB of each file are sniffed (concurrently) for
+    encoding, delimiter, header row and an estimated row count. Each dataset
+    maps to its sniffed source (one per CSV member of a .zip bundle and
+    one per workbook sheet matching the sheets patterns); rows are parsed
+    later, when the combiner standardizes the dataset. Each source is
+    labelled by its path relative to the input directory, the value of the
+    'source' column of its rows.
     """
-    csv_files = find_csv_files()
+    csv_files = find_csv_files(input_dir, recursive)
+    root = input_dir if input_dir is not None else (RAW_DIR if recursive else '.')
     
     if not csv_files:
-        print("\n✗ No CSV files found in the current directory")
+        location = input_dir or (RAW_DIR if recursive else "the current directory")
+        print(f"\n✗ No CSV files found in {location}")
         print("  Please ensure your downloaded datasets are in the same folder as this script")
         return {}
     
@@ -41,226 +88,40 @@ def load_and_inspect_datasets():
         print(f"  - {f}")
     print()
     
-    for i, filename in enumerate(csv_files, 1):
-        try:
-            df = pd.read_csv(filename)
-            datasets[f'dataset{i}'] = df
-            print(f"✓ Loaded: {filename}")
-            print(f"  Shape: {df.shape}")
-            print(f"  Columns: {list(df.columns[:10])}{'...' if len(df.columns) > 10 else ''}")
-            print()
-        except Exception as e:
-            print(f"✗ Error loading {filename}: {str(e)}\n")
-    
-    return datasets
-
-def standardize_column_names(df, dataset_name):
-    """
-    Standardize column names to match the analysis script requirements
-    """
-    
-    column_mappings = {
-        # Demographics
-        'age': 'age',
-        'Age': 'age',
-        'gender': 'gender',
-        'Gender': 'gender',
-        'Choose your gender': 'gender',
-        'sex': 'gender',
-        'year': 'year_of_study',
-        'Year': 'year_of_study',
-        'Your current year of Study': 'year_of_study',
-        'year_of_study': 'year_of_study',
-        'level': 'year_of_study',
-        'cgpa': 'cgpa',
-        'CGPA': 'cgpa',
-        'What is your CGPA?': 'cgpa',
-        'gpa': 'cgpa',
-        'GPA': 'cgpa',
-        
-        # Mental Health Indicators
-        'depression': 'depression_score',
-        'Depression': 'depression_score',
-        'depression_score': 'depression_score',
-        'Depression_Score': 'depression_score',
-        'Do you have Depression?': 'depression_score',
-        'PHQ-9': 'depression_score',
-        'phq9': 'depression_score',
-        
-        'anxiety': 'anxiety_score',
-        'Anxiety': 'anxiety_score',
-        'anxiety_score': 'anxiety_score',
-        'Anxiety_Score': 'anxiety_score',
-        'Do you have Anxiety?': 'anxiety_score',
-        'GAD-7': 'anxiety_score',
-        'gad7': 'anxiety_score',
-        
-        'stress': 'stress_level',
-        'Stress': 'stress_level',
-        'stress_level': 'stress_level',
-        'Stress_Level': 'stress_level',
-        'PSS-10': 'stress_level',
-        'pss10': 'stress_level',
-        
-        'sleep': 'sleep_quality',
-        'sleep_quality': 'sleep_quality',
-        'Sleep_Quality': 'sleep_quality',
-        'Sleep Duration': 'sleep_quality',
-        'sleep_hours': 'sleep_quality',
-        
-        # Campus Environment
-        'campus_safety': 'campus_safety',
-        'safety': 'campus_safety',
-        'social_support': 'social_support',
-        'Social_Support': 'social_support',
-        'support': 'social_support',
-        'facilities': 'campus_facilities',
-        'campus_facilities': 'campus_facilities',
-        'accommodation': 'accommodation_satisfaction',
-        'Residence_Type': 'accommodation_satisfaction',
-        'housing': 'accommodation_satisfaction',
-        'peer_relationships': 'peer_relationships',
-        'relationships': 'peer_relationships',
-        'friends': 'peer_relationships',
+    for i, source in enumerate(sniff_files(csv_files, sheets=sheets), 1):
+        filename = source_label(source)
+        if 'error' in source:
+            print(f"✗ Error loading {filename}: {source['error']}\n")
+            continue
         
-        # Academic Factors
-        'academic_pressure': 'academic_pressure',
-        'Academic Pressure': 'academic_pressure',
-        'pressure': 'academic_pressure',
-        'workload': 'workload_stress',
-        'Work Pressure': 'workload_stress',
-        'workload_stress': 'workload_stress',
-        'exam_anxiety': 'exam_anxiety',
-        'exam_stress': 'exam_anxiety',
-        'Do you have Panic attack?': 'exam_anxiety',
-        'grade_expectations': 'grade_expectations',
-        'expectations': 'grade_expectations',
-        'career_concerns': 'career_concerns',
-        'career': 'career_concerns',
-        
-        # Mental Health Support
-        'counseling': 'seeks_counseling',
-        'seeks_counseling': 'seeks_counseling',
-        'Counseling_Service_Use': 'seeks_counseling',
-        'Did you seek any specialist for a treatment?': 'seeks_counseling',
-        'treatment': 'seeks_counseling',
-        'therapy': 'seeks_counseling',
-        'aware_of_services': 'aware_of_services',
-        'awareness': 'aware_of_services',
-        
-        # Financial
-        'Financial_Stress': 'financial_stress',
-        'Financial Stress': 'financial_stress',
-    }
-    
-    df_standardized = df.copy()
-    
-    rename_dict = {}
-    for col in df.columns:
-        col_stripped = col.strip()
-        if col_stripped in column_mappings:
-            rename_dict[col] = column_mappings[col_stripped]
-    
-    df_standardized.rename(columns=rename_dict, inplace=True)
-    
-    if rename_dict:
-        print(f"{dataset_name} - Column Mapping:")
-        for old, new in rename_dict.items():
-            print(f"  {old} → {new}")
-    
-    return df_standardized
-
-def normalize_scales(df):
-    """
-    Normalize different scales to 1-5 scale
-    """
-    
-    scale_columns = [
-        'depression_score', 'anxiety_score', 'stress_level', 'sleep_quality',
-        'campus_safety', 'social_support', 'campus_facilities', 
-        'accommodation_satisfaction', 'peer_relationships',
-        'academic_pressure', 'workload_stress', 'exam_anxiety',
-        'grade_expectations', 'career_concerns'
-    ]
-    
-    for col in scale_columns:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            valid_values = df[col].dropna()
-            
-            if len(valid_values) == 0:
-                continue
-            
-            col_min = valid_values.min()
-            col_max = valid_values.max()
-            
-            if col_min >= 1 and col_max <= 5:
-                continue
-            
-            if col_min != col_max:
-                df[col] = 1 + 4 * (df[col] - col_min) / (col_max - col_min)
-                df[col] = df[col].round().astype('Int64')
-                print(f"  Normalized {col}: [{col_min}, {col_max}] → [1, 5]")
-    
-    return df
-
-def standardize_categorical_values(df):
-    """
-    Standardize categorical values
-    """
+        columns = source['columns']
+        source['label'] = source_label(source, root)
+        if source['estimated_rows'] is None:
+            rows = '?'
+        else:
+            rows = f"{'' if source['exact_rows'] else '~'}{source['estimated_rows']}"
+        compression = f", {source['compression']}" if source['compression'] else ""
+        datasets[f'dataset{i}'] = source
+        print(f"✓ Inspected: {filename}")
+        print(f"  Shape: ({rows}, {len(columns)})")
+        if source['sheet'] is not None:
+            print(f"  Format: xlsx sheet {source['sheet']!r}, header row {source['header_row']}")
+        else:
+            print(f"  Format: {source['encoding']}, delimiter {source['delimiter']!r}, "
+                  f"header row {source['header_row']}{compression}")
+        print(f"  Columns: {columns[:10]}{'...' if len(columns) > 10 else ''}")
+        print()
     
-    if 'gender' in df.columns:
-        gender_mapping = {
-            'male': 'Male', 'Male': 'Male', 'M': 'Male', 'm': 'Male',
-            'female': 'Female', 'Female': 'Female', 'F': 'Female', 'f': 'Female',
-            'other': 'Other', 'Other': 'Other', 'non-binary': 'Other',
-            'prefer not to say': 'Other', 'Prefer not to say': 'Other'
-        }
-        df['gender'] = df['gender'].astype(str).str.strip()
-        df['gender'] = df['gender'].map(lambda x: gender_mapping.get(x, 'Other'))
-    
-    yes_no_to_score = {'Yes': 5, 'No': 1, 'yes': 5, 'no': 1}
-    
-    if 'depression_score' in df.columns:
-        if df['depression_score'].dtype == 'object':
-            df['depression_score'] = df['depression_score'].map(yes_no_to_score)
-            df['depression_score'] = pd.to_numeric(df['depression_score'], errors='coerce')
-    
-    if 'anxiety_score' in df.columns:
-        if df['anxiety_score'].dtype == 'object':
-            df['anxiety_score'] = df['anxiety_score'].map(yes_no_to_score)
-            df['anxiety_score'] = pd.to_numeric(df['anxiety_score'], errors='coerce')
-    
-    if 'exam_anxiety' in df.columns:
-        if df['exam_anxiety'].dtype == 'object':
-            df['exam_anxiety'] = df['exam_anxiety'].map(yes_no_to_score)
-            df['exam_anxiety'] = pd.to_numeric(df['exam_anxiety'], errors='coerce')
-    
-    yes_no_columns = ['seeks_counseling', 'aware_of_services']
-    for col in yes_no_columns:
-        if col in df.columns:
-            yes_values = ['yes', 'Yes', 'YES', 'y', 'Y', 'true', 'True', '1', 1, True]
-            df[col] = df[col].astype(str).apply(lambda x: 'Yes' if x.strip() in yes_values else 'No')
-    
-    if 'accommodation_satisfaction' in df.columns:
-        if df['accommodation_satisfaction'].dtype == 'object':
-            accommodation_mapping = {
-                'On-Campus': 4,
-                'Off-Campus': 3,
-                'Home': 3,
-                'With Family': 4,
-                'Alone': 2
-            }
-            df['accommodation_satisfaction'] = df['accommodation_satisfaction'].map(
-                lambda x: accommodation_mapping.get(str(x).strip(), 3)
-            )
-    
-    return df
+    return datasets
 
-def add_missing_columns(df):
+def add_missing_columns(df, verbose=True, virtual=False):
     """
     Add missing columns with default values
+    
+    With virtual=True constant defaults are only recorded in the frame's
+    default registry (virtual_columns) instead of being written out as
+    full columns; the random age/year/CGPA fills are always materialized
+    and listed in df.attrs['filled'], so they are not mistaken for answers
     """
     
     required_columns = {
@@ -287,24 +148,111 @@ def add_missing_columns(df):
     }
     
     added_columns = []
+    virtual_defaults = {}
+    filled = []
     for col, default_value in required_columns.items():
-        if col not in df.columns:
+        if col not in df.columns and not has_column(df, col):
             if callable(default_value):
                 df[col] = default_value()
+                filled.append(col)
+            elif virtual:
+                virtual_defaults[col] = default_value
             else:
                 df[col] = default_value
             added_columns.append(col)
     
-    if added_columns:
+    if virtual_defaults:
+        register_defaults(df, virtual_defaults)
+    if filled:
+        df.attrs['filled'] = df.attrs.get('filled', []) + filled
+    
+    if added_columns and verbose:
         print(f"\nAdded missing columns with default values:")
         for col in added_columns:
-            print(f"  - {col}")
+            print(f"  - {col}{' (virtual)' if col in virtual_defaults else ''}")
+    
+    return df
+
+def dataset_label(name, source):
+    """
+    Display name of a dataset and value of its 'source' column: its file
+    (and .zip member or sheet), or its key for in-memory frames
+    """
+    
+    if isinstance(source, pd.DataFrame):
+        return name
+    return (source.get('label') if isinstance(source, dict) else None) or source_label(source)
+
+def standardize_dataset(name, source, verbose=True, fuzzy_headers=False, quarantine=False):
+    """
+    Run one dataset through the standardize/normalize/categorical/missing-column
+    pipeline. source is either a loaded DataFrame or a CSV path / sniffed
+    source parsed here. Constant defaults stay virtual until export.
+    
+    The raw values are validated against the column schema first; the
+    failure summary goes to df.attrs['validation'] and, with quarantine,
+    the failing rows are dropped and handed over in df.attrs['quarantine']
+    (see validation). The first stages (through range clipping and
+    compact dtypes) then run as one fused transform plan, see
+    transform_plan.
+    
+    Every row keeps its 1-based data row number within the source in
+    'source_row', so (source, source_row) identifies it across runs.
+    """
+    
+    df = source if isinstance(source, pd.DataFrame) else read_source(source)
+    if not df.index.equals(pd.RangeIndex(len(df))):
+        df = df.copy(deep=False)
+        df.index = pd.RangeIndex(len(df))
+    
+    if verbose:
+        print(f"\nProcessing: {name}")
+        print(f"  Original shape: {df.shape}")
+    
+    plan = compile_transform_plan(tuple(df.columns), fuzzy_headers)
+    df, validation, rejected = split_valid(df, plan.targets, dataset_label(name, source),
+                                           quarantine)
+    if verbose and rejected is not None:
+        print(f"  Quarantined {len(rejected)} invalid row(s)")
+    df = plan.execute(df, name, verbose=verbose)
+    df.insert(0, SOURCE_ROW_COLUMN, (df.index.to_numpy() + 1).astype(np.uint32))
+    
+    planned = set(df.columns)
+    df = add_missing_columns(df, verbose=verbose, virtual=True)
+    df = apply_dtype_plan(df, [col for col in df.columns if col not in planned])
+    
+    if verbose:
+        print(f"  Final shape: {df.shape} + {len(get_defaults(df))} virtual column(s)")
+    
+    df.attrs['validation'] = validation
+    if rejected is not None:
+        df.attrs['quarantine'] = rejected
     
     return df
 
-def combine_datasets(datasets):
+def combine_datasets(datasets, jobs=1, cache_dir=None, fuzzy_headers=False, dedup_keys=None,
+                     quarantine=None):
     """
     Combine multiple datasets
+    
+    With jobs > 1 each dataset is parsed and standardized in a worker
+    process; results are merged in the original dataset order.
+    
+    With cache_dir set, datasets given as files (paths or sniffed sources) are fingerprinted
+    against the cache manifest and only new or changed files are
+    re-standardized; the rest reuse their cached intermediate.
+    
+    With dedup_keys set, rows repeating an earlier row on those columns
+    are dropped (across datasets) and reported per dataset; rows missing
+    any key answer (including defaulted columns) are always kept.
+    
+    Schema validation failures are reported per dataset; with quarantine
+    set to a path, failing rows are left out and written there instead.
+    
+    The result carries a categorical 'source' column (see dataset_label),
+    the 'source_row' of every row and the merged registry of virtual
+    default columns in its attrs; see virtual_columns. student_id numbers
+    the combined rows from 1.
     """
     
     if not datasets:
@@ -314,125 +262,472 @@ def combine_datasets(datasets):
     print("COMBINING AND STANDARDIZING DATASETS")
     print("="*70)
     
-    combined_dfs = []
+    standardized = {}
+    pending = dict(datasets)
+    fingerprints = {}
     
-    for name, df in datasets.items():
-        print(f"\nProcessing: {name}")
-        print(f"  Original shape: {df.shape}")
+    if cache_dir:
+        options = {'fuzzy_headers': fuzzy_headers, 'quarantine': bool(quarantine)}
+        manifest = combiner_cache.load_manifest(cache_dir, options)
         
-        df = standardize_column_names(df, name)
-        df = normalize_scales(df)
-        df = standardize_categorical_values(df)
-        df = add_missing_columns(df)
+        for name, source in datasets.items():
+            if isinstance(source, pd.DataFrame):
+                continue
+            path = os.path.abspath(source_path(source))
+            member = source.get('member') if isinstance(source, dict) else None
+            sheet = source.get('sheet') if isinstance(source, dict) else None
+            label = f"{path}:{member}" if member else (f"{path}[{sheet}]" if sheet else path)
+            part = {'member': member} if member else ({'sheet': sheet} if sheet else {})
+            entry = combiner_cache.fingerprint(path, manifest['files'].get(label))
+            entry['key'] = combiner_cache.intermediate_key(entry['sha256'], {**options, **part})
+            fingerprints[name] = (label, entry)
+            df = combiner_cache.load_intermediate(entry['key'], cache_dir)
+            if df is not None:
+                standardized[name] = df
+                del pending[name]
+                print(f"✓ {name}: unchanged, using cached intermediate {df.shape}")
         
-        print(f"  Final shape: {df.shape}")
+        print(f"\n{len(pending)} of {len(datasets)} dataset(s) need standardizing")
+    
+    def keep(name, df):
+        # Cached as soon as it is ready, so an interrupted run keeps its progress
+        standardized[name] = df
+        if cache_dir and name in fingerprints:
+            label, entry = fingerprints[name]
+            combiner_cache.store_intermediate(df, entry['key'], cache_dir)
+            manifest['files'][label] = entry
+            combiner_cache.save_manifest(manifest, cache_dir)
+    
+    if jobs > 1 and len(pending) > 1:
+        print(f"\nStandardizing {len(pending)} datasets with {jobs} worker processes")
         
-        combined_dfs.append(df)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(standardize_dataset, name, source, False, fuzzy_headers,
+                                       bool(quarantine))
+                       for name, source in pending.items()]
+            
+            for name, future in zip(pending, futures):
+                try:
+                    df = future.result()
+                except Exception as e:
+                    print(f"✗ Error processing {name}: {str(e)}")
+                    continue
+                print(f"✓ {name}: {df.shape}")
+                keep(name, df)
+    else:
+        for name, source in pending.items():
+            try:
+                keep(name, standardize_dataset(name, source, fuzzy_headers=fuzzy_headers,
+                                               quarantine=bool(quarantine)))
+            except Exception as e:
+                print(f"✗ Error processing {name}: {str(e)}")
+    
+    if cache_dir:
+        manifest['files'] = {path: entry for name, (path, entry) in fingerprints.items()
+                             if name in standardized}
+        combiner_cache.save_manifest(manifest, cache_dir)
+    
+    names = [name for name in datasets if name in standardized]
+    
+    if not names:
+        return None
+    
+    # Popped before any frame operation, which would deep-copy the attrs
+    validation = ValidationReport(quarantine)
+    filled = {}
+    for name in names:
+        attrs = standardized[name].attrs
+        validation.add(dataset_label(name, datasets[name]), attrs.pop('validation', None),
+                       attrs.pop('quarantine', None))
+        filled[name] = attrs.pop('filled', [])
+    validation.report()
+    
+    if dedup_keys:
+        dedup = RowDeduplicator(dedup_keys)
+        for name in names:
+            standardized[name] = dedup.filter(standardized[name], name, filled[name])
+        print()
+        dedup.report()
+    
+    combined_dfs = [standardized[name] for name in names]
+    labels = [dataset_label(name, datasets[name]) for name in names]
+    defaults = merge_defaults(dict(zip(labels, combined_dfs)))
+    
+    logical_columns = ['student_id', SOURCE_COLUMN]
+    for df in combined_dfs:
+        for col in list(df.columns) + list(get_defaults(df)):
+            if col not in logical_columns:
+                logical_columns.append(col)
     
     print(f"\n{'='*70}")
     print("MERGING DATASETS")
     print("="*70)
     
-    combined_df = pd.concat(combined_dfs, ignore_index=True, sort=False)
+    combined_df = pd.concat(align_frames(combined_dfs), ignore_index=True, sort=False)
     combined_df.insert(0, 'student_id', range(1, len(combined_df) + 1))
+    combined_df[SOURCE_COLUMN] = pd.Categorical.from_codes(
+        np.repeat(np.arange(len(names)), [len(df) for df in combined_dfs]), categories=labels)
+    combined_df.attrs['defaults'] = defaults
+    combined_df.attrs['columns'] = logical_columns
     
     print(f"\nCombined dataset shape: {combined_df.shape}")
     print(f"Total students: {len(combined_df)}")
+    if defaults:
+        virtual_values = sum(int(defaulted_mask(combined_df, col).sum()) for col in defaults)
+        print(f"Virtual default columns: {len(defaults)} ({virtual_values} values not materialized)")
     
     return combined_df
 
-def create_composite_scores(df):
+def compute_scale_stats(source, dataset_name, chunksize, fuzzy_headers=False, quarantine=False):
     """
-    Create composite scores
+    Cheap pre-pass over one file (path or sniffed source) in chunks:
+    returns the standardized column order, the global (min, max) of every
+    scale column, which the transform plan needs before any chunk can be
+    rescaled, a quantile sketch per numeric column (in normalized units)
+    for median imputation and the planned integer columns holding values
+    that are not whole numbers after rescaling (stored as float32, as in
+    memory)
+    
+    With quarantine, rows failing schema validation are left out of the
+    statistics, as they will be left out of the output.
+    """
+    
+    columns = None
+    scale_stats = {}
+    sketches = {}
+    fractional = set()
+    
+    for chunk in read_source(source, chunksize=chunksize):
+        plan = compile_transform_plan(tuple(chunk.columns), fuzzy_headers)
+        if columns is None:
+            columns = [col for _, col in plan.targets]
+        if quarantine:
+            chunk = split_valid(chunk, plan.targets, dataset_name, quarantine=True)[0]
+        
+        for raw, col in plan.targets:
+            if col in SCALE_COLUMNS:
+                # Text answers are mapped to scores, as the plan will
+                values = pd.Series(scale_values(chunk[raw], plan.operations[col]))
+            elif pd.api.types.is_numeric_dtype(chunk[raw]):
+                values = chunk[raw]
+            else:
+                values = None
+            if col in INTEGER_DTYPES and col not in fractional:
+                whole = values if values is not None else pd.to_numeric(chunk[raw],
+                                                                        errors='coerce')
+                whole = whole.dropna()
+                if len(whole) and not (whole % 1 == 0).all():
+                    fractional.add(col)
+            if values is None:
+                continue
+            sketches.setdefault(col, QuantileSketch()).update(values)
+            
+            if col not in SCALE_COLUMNS:
+                continue
+            col_min, col_max = values.min(), values.max()
+            if pd.isna(col_min):
+                continue
+            if col in scale_stats:
+                prev_min, prev_max = scale_stats[col]
+                scale_stats[col] = (min(prev_min, col_min), max(prev_max, col_max))
+            else:
+                scale_stats[col] = (col_min, col_max)
+    
+    if columns is None:
+        header = read_source(source, nrows=0)
+        plan = compile_transform_plan(tuple(header.columns), fuzzy_headers)
+        columns = [col for _, col in plan.targets]
+    
+    for col, (col_min, col_max) in scale_stats.items():
+        if (col_min >= 1 and col_max <= 5) or col_min == col_max:
+            continue
+        sketches[col] = sketches[col].map(
+            lambda x, lo=col_min, hi=col_max: np.round(1 + 4 * (x - lo) / (hi - lo))
+        )
+        # Rescaled answers are rounded to whole points
+        fractional.discard(col)
+    
+    return columns, scale_stats, sketches, fractional
+
+def stream_combine_datasets(sources, output_filename=DEFAULT_OUTPUT, chunksize=100_000, jobs=1,
+                            fuzzy_headers=False, dedup_keys=None, impute=None, quarantine=None,
+                            partition_by=None):
     """
+    Combine datasets chunk by chunk, appending each processed chunk to the
+    output CSV or Parquet file so peak memory is bounded by chunksize, not
+    total input size
+    
+    Composite scores and range validation are applied per chunk, and with
+    dedup_keys set duplicate rows are dropped against a fingerprint set
+    spanning all files, before missing columns are filled in. With
+    impute='sketch' missing numeric values are filled with medians merged
+    from the per-file quantile sketches of the pre-pass (observed values
+    only; defaulted columns do not count), after the defaults are added,
+    so gaps of columns a file lacks are filled as in clean_and_validate.
+    Otherwise gaps are left for clean_data in the analysis script. With
+    jobs > 1 the statistics pre-pass scans files in parallel worker
+    processes. Every chunk is validated against the column schema; with
+    quarantine set to a path, failing rows go there instead of the output.
+    With partition_by the output is a partitioned dataset directory (see
+    columnar_io.PartitionedWriter).
+    """
+    
+    if not sources:
+        return None
+    
+    print("\n" + "="*70)
+    print("STREAMING COMBINE (PASS 1: SCALE STATISTICS)")
+    print("="*70)
+    
+    names = [f'dataset{i}' for i in range(1, len(sources) + 1)]
+    
+    if jobs > 1 and len(sources) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            scans = list(executor.map(compute_scale_stats, sources, names,
+                                      [chunksize] * len(sources),
+                                      [fuzzy_headers] * len(sources),
+                                      [bool(quarantine)] * len(sources)))
+    else:
+        scans = [compute_scale_stats(source, name, chunksize, fuzzy_headers, bool(quarantine))
+                 for source, name in zip(sources, names)]
+    
+    file_stats = []
+    output_columns = []
+    global_sketches = {}
+    float_columns = set()
+    
+    for name, source, (columns, scale_stats, sketches, fractional) in zip(names, sources, scans):
+        file_stats.append((name, source, scale_stats))
+        float_columns |= fractional
+        for col, sketch in sketches.items():
+            if col in global_sketches:
+                global_sketches[col].merge(sketch)
+            else:
+                global_sketches[col] = sketch
+        
+        header = add_missing_columns(pd.DataFrame(columns=columns), verbose=False)
+        for col in header.columns:
+            if col not in output_columns:
+                output_columns.append(col)
+        
+        print(f"✓ Scanned: {dataset_label(name, source)} ({len(scale_stats)} scale column(s))")
+    
+    output_columns = ['student_id', SOURCE_COLUMN, SOURCE_ROW_COLUMN] + output_columns + [
+        col for col in COMPOSITE_SCORES if col not in output_columns
+    ]
+    
+    medians = {}
+    if impute == 'sketch':
+        medians = {col: sketch.median() for col, sketch in global_sketches.items() if sketch.n}
+        float_columns |= {col for col, median in medians.items() if float(median) % 1}
+        print(f"✓ Estimated medians for {len(medians)} column(s) from merged quantile sketches")
     
     print(f"\n{'='*70}")
-    print("CREATING COMPOSITE SCORES")
+    print("STREAMING COMBINE (PASS 2: STANDARDIZE AND WRITE)")
     print("="*70)
     
-    campus_cols = ['campus_safety', 'social_support', 'campus_facilities', 
-                   'accommodation_satisfaction', 'peer_relationships']
-    if all(col in df.columns for col in campus_cols):
-        df['campus_environment_score'] = df[campus_cols].mean(axis=1)
-        print("✓ Created campus_environment_score")
+    missing = [col for col in partition_by or [] if col not in output_columns]
+    if missing:
+        raise ValueError(f"Cannot partition by {missing}: not a column of the combined dataset")
+    
+    total_rows = 0
+    if partition_by:
+        writer = PartitionedWriter(partitioned_path(output_filename), partition_by,
+                                   table_format(output_filename), widen=True,
+                                   float_columns=float_columns)
+        output_filename = writer.path
+    else:
+        writer = TableWriter(output_filename, float_columns)
+    dedup = RowDeduplicator(dedup_keys) if dedup_keys else None
+    validation = ValidationReport(quarantine)
+    
+    # Every chunk carries all labels, so the Parquet dictionary of source
+    # matches the categorical of combine_datasets
+    labels = [dataset_label(name, source) for name, source, _ in file_stats]
+    
+    with writer:
+        for code, (name, source, scale_stats) in enumerate(file_stats):
+            label = labels[code]
+            print(f"\nProcessing: {name} ({label})")
+            file_rows = 0
+            raw_rows = 0
+            
+            for chunk_index, chunk in enumerate(read_source(source, chunksize=chunksize)):
+                verbose = chunk_index == 0
+                plan = compile_transform_plan(tuple(chunk.columns), fuzzy_headers)
+                chunk_rows = len(chunk)
+                chunk.index = pd.RangeIndex(raw_rows, raw_rows + chunk_rows)
+                chunk, summary, rejected = split_valid(chunk, plan.targets, label,
+                                                       bool(quarantine), row_offset=raw_rows)
+                validation.add(label, summary, rejected)
+                raw_rows += chunk_rows
+                chunk = plan.execute(chunk, name, scale_stats=scale_stats, verbose=verbose)
+                chunk.insert(0, SOURCE_ROW_COLUMN, (chunk.index.to_numpy() + 1).astype(np.uint32))
+                if dedup is not None:
+                    chunk = dedup.filter(chunk, name)
+                chunk = add_missing_columns(chunk, verbose=verbose)
+                chunk = create_composite_scores(chunk, verbose=False)
+                # Defaults are written in by now, so only gaps are filled;
+                # a column this file lacks and no default covers (e.g.
+                # financial_stress) is all gaps, as in clean_and_validate
+                for col, median in medians.items():
+                    values = chunk[col] if col in chunk.columns else empty_column(
+                        col, len(chunk), chunk.index, fallback_dtype='float64')
+                    chunk[col] = fill_missing(values, median)
+                chunk = validate_ranges(chunk, verbose=False)
+                chunk = apply_dtype_plan(chunk)
+                
+                chunk.insert(0, 'student_id', range(total_rows + 1, total_rows + len(chunk) + 1))
+                chunk[SOURCE_COLUMN] = pd.Categorical.from_codes(np.full(len(chunk), code),
+                                                                 categories=labels)
+                chunk = chunk.reindex(columns=output_columns)
+                writer.write(chunk)
+                
+                total_rows += len(chunk)
+                file_rows += len(chunk)
+            
+            print(f"  Rows written: {file_rows}")
+        
+        writer.close(output_columns)
     
-    academic_cols = ['academic_pressure', 'workload_stress', 'exam_anxiety', 
-                     'grade_expectations', 'career_concerns']
-    if all(col in df.columns for col in academic_cols):
-        df['academic_expectation_score'] = df[academic_cols].mean(axis=1)
-        print("✓ Created academic_expectation_score")
+    validation.report()
     
-    mental_cols = ['depression_score', 'anxiety_score', 'stress_level', 'sleep_quality']
-    if all(col in df.columns for col in mental_cols):
-        df['mental_health_score'] = df[mental_cols].mean(axis=1)
-        print("✓ Created mental_health_score")
+    if dedup is not None:
+        print()
+        dedup.report()
+    
+    print(f"\n✓ Saved: {output_filename}")
+    print(f"  Columns: {len(output_columns)}")
+    print(f"  Total Students: {total_rows}")
+    
+    return output_filename
+
+def create_composite_scores(df, verbose=True):
+    """
+    Create composite scores
+    """
+    
+    if verbose:
+        print(f"\n{'='*70}")
+        print("CREATING COMPOSITE SCORES")
+        print("="*70)
+    
+    for score_name, item_cols in COMPOSITE_SCORES.items():
+        if all(has_column(df, col) for col in item_cols):
+            items = pd.DataFrame({col: column_values(df, col) for col in item_cols})
+            df[score_name] = items.mean(axis=1)
+            if verbose:
+                print(f"✓ Created {score_name}")
     
     return df
 
-def clean_and_validate(df):
+def clean_and_validate(df, dedup_keys=None, impute='exact'):
     """
     Final cleaning and validation
+    
+    With dedup_keys set, duplicates are detected by fingerprinting those
+    columns (student_id is synthetic and would make every row unique;
+    see dedup for which rows are compared). impute='sketch' fills
+    numeric gaps with single-pass approximate medians instead of exact ones.
+    
+    Rows holding a virtual default are left alone: they are missing in the
+    frame, so medians and modes only see observed answers, and they are
+    not filled.
     """
     
     print(f"\n{'='*70}")
     print("CLEANING AND VALIDATION")
     print("="*70)
     
-    before = len(df)
-    df = df.drop_duplicates()
-    after = len(df)
-    if before != after:
-        print(f"✓ Removed {before - after} duplicate rows")
+    if dedup_keys:
+        dedup = RowDeduplicator(dedup_keys)
+        df = dedup.filter(df)
+        if dedup.total_duplicates:
+            print(f"✓ Removed {dedup.total_duplicates} duplicate rows")
     
     print(f"\nHandling missing values...")
     numeric_cols = df.select_dtypes(include=[np.number]).columns
-    df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].median())
+    medians = {col: column_median(df[col], impute) for col in numeric_cols}
+    for col in numeric_cols:
+        df[col] = fill_missing(df[col], medians[col], where=~defaulted_mask(df, col))
     
-    categorical_cols = df.select_dtypes(include=['object']).columns
+    categorical_cols = df.select_dtypes(include=['object', 'category']).columns
     for col in categorical_cols:
         if len(df[col].mode()) > 0:
-            df[col] = df[col].fillna(df[col].mode()[0])
+            df[col] = fill_missing(df[col], df[col].mode()[0], where=~defaulted_mask(df, col))
     
     print("✓ Filled missing values")
     
-    score_columns = [col for col in df.columns if 'score' in col or col in [
-        'depression_score', 'anxiety_score', 'stress_level', 'sleep_quality',
-        'campus_safety', 'social_support', 'campus_facilities', 
-        'accommodation_satisfaction', 'peer_relationships',
-        'academic_pressure', 'workload_stress', 'exam_anxiety',
-        'grade_expectations', 'career_concerns'
-    ]]
+    df = validate_ranges(df)
+    
+    return df
+
+def validate_ranges(df, verbose=True):
+    """
+    Coerce and clip scores, CGPA and age to their valid ranges
+    
+    Numeric columns already within range (e.g. clipped by the transform
+    plan) are only checked, not copied
+    """
+    
+    score_columns = [col for col in df.columns if 'score' in col or col in SCALE_COLUMNS]
+    checked = 0
+    
+    def clip(col, lower, upper):
+        nonlocal checked
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            col_min, col_max = values.min(), values.max()
+            if pd.isna(col_min) or (col_min >= lower and col_max <= upper):
+                checked += 1
+                return values
+        else:
+            values = pd.to_numeric(values, errors='coerce')
+        return values.clip(lower, upper)
     
     for col in score_columns:
         if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-            df[col] = df[col].clip(1, 5)
+            df[col] = clip(col, *VALID_RANGES.get(col, (1, 5)))
     
-    print("✓ Validated score ranges (1-5)")
+    if verbose:
+        print("✓ Validated score ranges (1-5)")
     
     if 'cgpa' in df.columns:
-        df['cgpa'] = pd.to_numeric(df['cgpa'], errors='coerce')
-        df['cgpa'] = df['cgpa'].clip(0, 4.0)
-        print("✓ Validated CGPA range (0-4.0)")
+        df['cgpa'] = clip('cgpa', *VALID_RANGES['cgpa'])
+        if verbose:
+            print("✓ Validated CGPA range (0-4.0)")
     
     if 'age' in df.columns:
-        df['age'] = pd.to_numeric(df['age'], errors='coerce')
-        df['age'] = df['age'].clip(16, 40).astype('Int64')
-        print("✓ Validated age range (16-40)")
+        df['age'] = clip('age', *VALID_RANGES['age'])
+        if verbose:
+            print("✓ Validated age range (16-40)")
+    
+    logger.debug("validate_ranges: %d column copies avoided (already in range)", checked)
     
     return df
 
-def save_combined_dataset(df, output_filename='../data/processed/combined_mental_health_data.csv'):
+def save_combined_dataset(df, output_filename=DEFAULT_OUTPUT, partition_by=None):
     """
     Save the combined dataset
+    
+    With partition_by (e.g. ['source']) it is written as a directory of
+    partitions instead, next to output_filename without its extension;
+    partitions of sources missing from this run are kept
     """
     
     print(f"\n{'='*70}")
     print("SAVING COMBINED DATASET")
     print("="*70)
     
-    df.to_csv(output_filename, index=False)
+    df = materialize_defaults(df)
+    missing = [col for col in partition_by or [] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Cannot partition by {missing}: not a column of the combined dataset")
+    output_filename = write_table(df, output_filename, partition_by)
     print(f"\n✓ Saved: {output_filename}")
+    if partition_by:
+        partitions = df.groupby(partition_by, observed=True, dropna=False).ngroups
+        print(f"  Partitioned by {', '.join(partition_by)}: {partitions} partition(s)")
     print(f"  Shape: {df.shape}")
     print(f"  Total Students: {len(df)}")
     
@@ -441,7 +736,7 @@ def save_combined_dataset(df, output_filename='../data/processed/combined_mental
     print("="*70)
     
     # Show key columns
-    key_cols = ['student_id', 'age', 'gender', 'cgpa', 'depression_score', 
+    key_cols = ['student_id', 'source', 'age', 'gender', 'cgpa', 'depression_score', 
                 'anxiety_score', 'stress_level', 'campus_environment_score',
                 'academic_expectation_score', 'mental_health_score']
     
@@ -461,33 +756,175 @@ def save_combined_dataset(df, output_filename='../data/processed/combined_mental
     
     return output_filename
 
-def main():
+def parse_args(argv=None):
+    """
+    Parse command line options
+    """
+    
+    parser = argparse.ArgumentParser(description="Combine student mental health survey datasets")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help="Path of the combined dataset (.csv, .parquet or .feather)")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'feather'], default=None,
+                        help="Output format; replaces the extension of --output")
+    parser.add_argument('--input-dir', default=None,
+                        help="Directory holding the raw exports (default: current directory, "
+                             f"or {RAW_DIR} with --recursive)")
+    parser.add_argument('--recursive', action='store_true',
+                        help="Search the input directory and all its subdirectories")
+    parser.add_argument('--sheets', default=None,
+                        help="Comma-separated sheet name patterns to read from Excel workbooks, "
+                             "e.g. 'Wave*,Survey 2024' (default: all sheets)")
+    parser.add_argument('--partition-by', default=None,
+                        help="Comma-separated columns, e.g. 'source' or 'source,wave': write the "
+                             "combined dataset as a directory with one partition per value, "
+                             "replacing only the partitions present in this run")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Stream each file in chunks of N rows and write incrementally")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Parse and standardize files in N worker processes")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only re-standardize new or changed files, reusing cached intermediates")
+    parser.add_argument('--cache-dir', default=combiner_cache.CACHE_DIR,
+                        help="Directory for the manifest and per-file intermediates")
+    parser.add_argument('--fuzzy-headers', action='store_true',
+                        help="Map unknown headers to the closest known header by trigram similarity")
+    parser.add_argument('--dedup', action='store_true',
+                        help="Drop rows repeating an earlier row's answers on --dedup-keys "
+                             "(rows missing any key answer are always kept)")
+    parser.add_argument('--dedup-keys', default=None,
+                        help="Comma-separated columns that identify a duplicate row; implies "
+                             f"--dedup (default: {','.join(DEFAULT_KEY_COLUMNS)})")
+    parser.add_argument('--impute', choices=['exact', 'sketch'], default='exact',
+                        help="Median imputation: exact, or single-pass quantile sketches "
+                             "(required to impute in streaming mode)")
+    parser.add_argument('--quarantine', nargs='?', const=DEFAULT_QUARANTINE, default=None,
+                        help="Leave rows failing schema validation out of the output and write "
+                             f"them, with reason codes, to this JSON-lines file "
+                             f"(default: {DEFAULT_QUARANTINE})")
+    parser.add_argument('--checkpoint', action='store_true',
+                        help="Keep per-file intermediates and stage checkpoints in --work-dir "
+                             "so a failed run can be resumed")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue after the last completed checkpoint of the same inputs "
+                             "and options (implies --checkpoint)")
+    parser.add_argument('--work-dir', default=WORK_DIR,
+                        help="Directory for checkpoints")
+    parser.add_argument('--debug', action='store_true',
+                        help="Log debug details, e.g. copies avoided by the transform plan")
+    add_instrumentation_args(parser)
+    args = parser.parse_args(argv)
+    
+    args.checkpoint = args.checkpoint or args.resume
+    if args.checkpoint and args.chunksize:
+        parser.error("--checkpoint/--resume apply to in-memory runs, not to --chunksize streaming")
+    
+    if args.format:
+        args.output = with_format(args.output, args.format)
+    
+    if args.sheets:
+        args.sheets = [pattern.strip() for pattern in args.sheets.split(',') if pattern.strip()]
+    
+    if args.partition_by:
+        args.partition_by = [col.strip() for col in args.partition_by.split(',') if col.strip()]
+    
+    if args.dedup_keys:
+        args.dedup_keys = [col.strip() for col in args.dedup_keys.split(',') if col.strip()]
+    elif args.dedup:
+        args.dedup_keys = list(DEFAULT_KEY_COLUMNS)
+    
+    return args
+
+def main(argv=None):
     """
     Main execution
     """
     
+    args = parse_args(argv)
+    
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG, format="%(levelname)s %(name)s: %(message)s")
+    
+    instrument = Instrumentation.from_args('dataset_combiner', args)
+    with instrument.run(argv):
+        run_pipeline(args, instrument)
+
+def run_pipeline(args, instrument):
+    """
+    Run the combiner stages, each inside an instrumentation span
+    """
+    
     print("\n" + "="*70)
     print("STUDENT MENTAL HEALTH DATASET COMBINER")
     print("Auto-Detecting CSV Files")
     print("="*70)
     
-    datasets = load_and_inspect_datasets()
+    with instrument.stage('load_and_inspect_datasets') as span:
+        datasets = load_and_inspect_datasets(args.input_dir, args.recursive, args.sheets)
+        span['sources'] = len(datasets)
+    
+    if args.chunksize:
+        if not datasets:
+            print("\n⚠ No datasets found.")
+            return
+        
+        with instrument.stage('stream_combine_datasets', chunksize=args.chunksize):
+            stream_combine_datasets(list(datasets.values()), args.output, args.chunksize,
+                                    args.jobs, args.fuzzy_headers, args.dedup_keys,
+                                    impute='sketch' if args.impute == 'sketch' else None,
+                                    quarantine=args.quarantine, partition_by=args.partition_by)
+        print(f"\n✅ SUCCESS! Dataset ready for analysis.")
+        return
     
     if not datasets:
         print("\n⚠ No datasets loaded.")
         return
     
-    combined_df = combine_datasets(datasets)
+    checkpoints = None
+    resume_from = None
+    cache_dir = args.cache_dir if args.incremental else None
+    if args.checkpoint:
+        options = {option: getattr(args, option) for option in
+                   ['fuzzy_headers', 'dedup_keys', 'impute', 'quarantine', 'sheets']}
+        checkpoints = CheckpointStore(args.work_dir, run_key(datasets, options), args.resume)
+        cache_dir = cache_dir or checkpoints.files_dir
+        resume_from = checkpoints.last_completed(CHECKPOINT_STAGES)
+    
+    if resume_from:
+        with instrument.stage('load_checkpoint', checkpoint=resume_from) as span:
+            combined_df = checkpoints.load(resume_from)
+            span['rows'] = len(combined_df)
+        print(f"\n↻ Resumed from checkpoint '{resume_from}': {combined_df.shape}")
+    else:
+        with instrument.stage('combine_datasets', jobs=args.jobs) as span:
+            combined_df = combine_datasets(datasets, args.jobs, cache_dir=cache_dir,
+                                           fuzzy_headers=args.fuzzy_headers,
+                                           dedup_keys=args.dedup_keys,
+                                           quarantine=args.quarantine)
+            span['rows'] = None if combined_df is None else len(combined_df)
+            if checkpoints and combined_df is not None:
+                checkpoints.save('combined', combined_df)
+        
+        if combined_df is None:
+            return
     
-    if combined_df is None:
-        return
+    if resume_from != 'cleaned':
+        with instrument.stage('create_composite_scores', rows=len(combined_df)):
+            combined_df = create_composite_scores(combined_df)
+        
+        with instrument.stage('clean_and_validate', rows=len(combined_df)) as span:
+            combined_df = clean_and_validate(combined_df, dedup_keys=None, impute=args.impute)
+            combined_df = apply_dtype_plan(combined_df)
+            span['rows_out'] = len(combined_df)
+            if checkpoints:
+                checkpoints.save('cleaned', combined_df)
     
-    combined_df = create_composite_scores(combined_df)
-    combined_df = clean_and_validate(combined_df)
+    with instrument.stage('save_combined_dataset', rows=len(combined_df)):
+        save_combined_dataset(combined_df, args.output, args.partition_by)
     
-    output_file = save_combined_dataset(combined_df)
+    if checkpoints:
+        checkpoints.clear()
     
     print(f"\n✅ SUCCESS! Dataset ready for analysis.")
 
 if __name__ == "__main__":
-    main()
+    main()
\ No newline at end of file
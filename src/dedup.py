@@ -0,0 +1,159 @@
+"""
+Streaming Duplicate Detection for Student Mental Health Analysis
+Fingerprints rows over a key-column subset and drops repeats chunk by chunk
+
+Each row is reduced to a 64-bit hash of its key columns. Seen hashes live
+in a set of sorted uint64 runs (8 bytes per distinct row), so duplicates
+across files are caught without holding the rows themselves. Two distinct
+rows collide with probability about n^2 / 2^65, i.e. never in practice.
+
+The surveys carry no respondent identifier, so a duplicate can only be
+told from its answers, and different students often give the same ones.
+Deduplication is therefore opt-in, and only rows that answered every key
+column are compared: a missing answer, a virtual default or a column the
+combiner filled in is never taken as a match.
+"""
+
+import numpy as np
+import pandas as pd
+
+from schema import SCALE_COLUMNS
+from virtual_columns import column_values, defaulted_mask, has_column
+
+# Key used when deduplication is enabled without explicit columns;
+# student_id is synthetic and unique per row, so it never belongs in the key
+DEFAULT_KEY_COLUMNS = ['age', 'gender', 'year_of_study', 'cgpa'] + SCALE_COLUMNS + [
+    'seeks_counseling', 'aware_of_services'
+]
+
+def row_fingerprints(df, key_columns):
+    """
+    64-bit hash of each row's key columns
+
+    Numeric columns are hashed as float64 so the same answer stored as
+    int8, Int8 or float in different files fingerprints identically;
+    virtual default columns hash as their default and absent key columns
+    hash as missing.
+    """
+
+    keys = {}
+    for col in key_columns:
+        if not has_column(df, col):
+            keys[col] = np.full(len(df), np.nan)
+            continue
+        values = column_values(df, col)
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            keys[col] = values.to_numpy(dtype='float64', na_value=np.nan)
+        else:
+            keys[col] = values
+
+    frame = pd.DataFrame(keys, index=df.index)
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+def comparable_rows(df, key_columns, filled=()):
+    """
+    Boolean array of the rows whose key columns all hold observed answers:
+    present, not missing and not a default (virtual, or one of the filled
+    columns, e.g. the random ages of a source without an age column)
+    """
+
+    mask = np.ones(len(df), dtype=bool)
+    for col in key_columns:
+        if col in filled or col not in df.columns:
+            # Absent or purely virtual columns hold no answers
+            return np.zeros(len(df), dtype=bool)
+        mask &= df[col].notna().to_numpy() & ~defaulted_mask(df, col)
+    return mask
+
+class FingerprintSet:
+    """
+    Compact set of uint64 fingerprints stored as sorted runs
+
+    Runs are merged log-structured style (a run is folded into its
+    predecessor once it reaches half its size), keeping O(log n) runs.
+    """
+
+    def __init__(self):
+        self._runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self._runs)
+
+    def contains(self, hashes):
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self._runs:
+            pos = np.searchsorted(run, hashes)
+            pos[pos == len(run)] = 0
+            found |= run[pos] == hashes
+        return found
+
+    def add(self, hashes):
+        """
+        Add fingerprints that are unique and not yet in the set
+        """
+
+        if len(hashes) == 0:
+            return
+        self._runs.append(np.sort(hashes))
+        while len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+            last = self._runs.pop()
+            self._runs[-1] = np.sort(np.concatenate([self._runs[-1], last]), kind='stable')
+
+class RowDeduplicator:
+    """
+    Drops rows whose key columns repeat an earlier row, across any number
+    of chunks and sources, and counts the duplicates per source
+
+    Rows with a missing or defaulted key value are kept without being
+    compared (see comparable_rows) and counted as skipped.
+    """
+
+    def __init__(self, key_columns=None):
+        self.key_columns = list(key_columns or DEFAULT_KEY_COLUMNS)
+        self.seen = FingerprintSet()
+        self.duplicates = {}
+        self.skipped = {}
+
+    def filter(self, df, source='dataset', filled=()):
+        """
+        Rows of df that do not repeat an earlier row; filled lists the
+        columns of df holding defaults rather than answers
+        """
+
+        comparable = comparable_rows(df, self.key_columns, filled)
+        positions = np.flatnonzero(comparable)
+        hashes = row_fingerprints(df.iloc[positions], self.key_columns)
+
+        unique = np.zeros(len(positions), dtype=bool)
+        unique[np.unique(hashes, return_index=True)[1]] = True
+        unique &= ~self.seen.contains(hashes)
+        self.seen.add(hashes[unique])
+
+        keep = ~comparable
+        keep[positions[unique]] = True
+
+        removed = int(len(df) - keep.sum())
+        self.duplicates[source] = self.duplicates.get(source, 0) + removed
+        self.skipped[source] = self.skipped.get(source, 0) + int(len(df) - len(positions))
+
+        return df if removed == 0 else df[keep]
+
+    @property
+    def total_duplicates(self):
+        return sum(self.duplicates.values())
+
+    @property
+    def total_skipped(self):
+        return sum(self.skipped.values())
+
+    def report(self):
+        if self.total_duplicates == 0:
+            print("✓ No duplicate rows found")
+        else:
+            print(f"✓ Removed {self.total_duplicates} duplicate rows")
+            for source, count in self.duplicates.items():
+                if count:
+                    print(f"  - {source}: {count}")
+        if self.total_skipped:
+            print(f"  {self.total_skipped} row(s) with missing or defaulted key values "
+                  f"kept without comparing")
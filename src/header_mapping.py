@@ -0,0 +1,184 @@
+"""
+Header Mapping Index for the Dataset Combiner
+Resolves raw survey headers to the standard column names used by the analysis
+"""
+
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+COLUMN_MAPPINGS = {
+    # Demographics
+    'age': 'age',
+    'Age': 'age',
+    'gender': 'gender',
+    'Gender': 'gender',
+    'Choose your gender': 'gender',
+    'sex': 'gender',
+    'year': 'year_of_study',
+    'Year': 'year_of_study',
+    'Your current year of Study': 'year_of_study',
+    'year_of_study': 'year_of_study',
+    'level': 'year_of_study',
+    'cgpa': 'cgpa',
+    'CGPA': 'cgpa',
+    'What is your CGPA?': 'cgpa',
+    'gpa': 'cgpa',
+    'GPA': 'cgpa',
+    
+    # Mental Health Indicators
+    'depression': 'depression_score',
+    'Depression': 'depression_score',
+    'depression_score': 'depression_score',
+    'Depression_Score': 'depression_score',
+    'Do you have Depression?': 'depression_score',
+    'PHQ-9': 'depression_score',
+    'phq9': 'depression_score',
+    
+    'anxiety': 'anxiety_score',
+    'Anxiety': 'anxiety_score',
+    'anxiety_score': 'anxiety_score',
+    'Anxiety_Score': 'anxiety_score',
+    'Do you have Anxiety?': 'anxiety_score',
+    'GAD-7': 'anxiety_score',
+    'gad7': 'anxiety_score',
+    
+    'stress': 'stress_level',
+    'Stress': 'stress_level',
+    'stress_level': 'stress_level',
+    'Stress_Level': 'stress_level',
+    'PSS-10': 'stress_level',
+    'pss10': 'stress_level',
+    
+    'sleep': 'sleep_quality',
+    'sleep_quality': 'sleep_quality',
+    'Sleep_Quality': 'sleep_quality',
+    'Sleep Duration': 'sleep_quality',
+    'sleep_hours': 'sleep_quality',
+    
+    # Campus Environment
+    'campus_safety': 'campus_safety',
+    'safety': 'campus_safety',
+    'social_support': 'social_support',
+    'Social_Support': 'social_support',
+    'support': 'social_support',
+    'facilities': 'campus_facilities',
+    'campus_facilities': 'campus_facilities',
+    'accommodation': 'accommodation_satisfaction',
+    'Residence_Type': 'accommodation_satisfaction',
+    'housing': 'accommodation_satisfaction',
+    'peer_relationships': 'peer_relationships',
+    'relationships': 'peer_relationships',
+    'friends': 'peer_relationships',
+    
+    # Academic Factors
+    'academic_pressure': 'academic_pressure',
+    'Academic Pressure': 'academic_pressure',
+    'pressure': 'academic_pressure',
+    'workload': 'workload_stress',
+    'Work Pressure': 'workload_stress',
+    'workload_stress': 'workload_stress',
+    'exam_anxiety': 'exam_anxiety',
+    'exam_stress': 'exam_anxiety',
+    'Do you have Panic attack?': 'exam_anxiety',
+    'grade_expectations': 'grade_expectations',
+    'expectations': 'grade_expectations',
+    'career_concerns': 'career_concerns',
+    'career': 'career_concerns',
+    
+    # Mental Health Support
+    'counseling': 'seeks_counseling',
+    'seeks_counseling': 'seeks_counseling',
+    'Counseling_Service_Use': 'seeks_counseling',
+    'Did you seek any specialist for a treatment?': 'seeks_counseling',
+    'treatment': 'seeks_counseling',
+    'therapy': 'seeks_counseling',
+    'aware_of_services': 'aware_of_services',
+    'awareness': 'aware_of_services',
+    
+    # Financial
+    'Financial_Stress': 'financial_stress',
+    'Financial Stress': 'financial_stress',
+}
+
+
+# Minimum Dice similarity of character trigrams for a fuzzy header match
+FUZZY_THRESHOLD = 0.75
+
+def normalize_header(header):
+    """
+    Canonical form of a header: case-folded, punctuation and whitespace
+    collapsed, tokens sorted ("Anxiety_score " -> "anxiety score")
+    """
+    
+    tokens = re.sub(r'[^0-9a-z]+', ' ', str(header).casefold()).split()
+    return ' '.join(sorted(tokens))
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# Built once at import: normalized header -> standard column
+HEADER_INDEX = {normalize_header(raw): target for raw, target in COLUMN_MAPPINGS.items()}
+
+# Trigram -> normalized headers containing it, for fuzzy lookups
+_TRIGRAM_SIZES = {key: len(_trigrams(key)) for key in HEADER_INDEX}
+_TRIGRAM_INDEX = defaultdict(list)
+for _key in HEADER_INDEX:
+    for _gram in _trigrams(_key):
+        _TRIGRAM_INDEX[_gram].append(_key)
+
+def fuzzy_match(normalized):
+    """
+    Closest known header by trigram Dice similarity, as (target, score),
+    or (None, score) when nothing reaches FUZZY_THRESHOLD
+    """
+    
+    grams = _trigrams(normalized)
+    overlaps = Counter()
+    for gram in grams:
+        overlaps.update(_TRIGRAM_INDEX.get(gram, ()))
+    
+    if not overlaps:
+        return None, 0.0
+    
+    best_key, best_score = None, 0.0
+    for key, shared in overlaps.items():
+        score = 2 * shared / (len(grams) + _TRIGRAM_SIZES[key])
+        if score > best_score:
+            best_key, best_score = key, score
+    
+    if best_score < FUZZY_THRESHOLD:
+        return None, best_score
+    return HEADER_INDEX[best_key], best_score
+
+@lru_cache(maxsize=4096)
+def resolve_rename_plan(headers, fuzzy=False):
+    """
+    Rename plan for a header signature (tuple of raw headers), cached so
+    files sharing a schema resolve once
+    
+    Returns a tuple of (raw header, standard column, fuzzy score or None).
+    Each standard column is claimed once: headers already spelled as the
+    standard name win, then the first matching header in file order.
+    """
+    
+    matches = []
+    for header in headers:
+        target = HEADER_INDEX.get(normalize_header(header))
+        score = None
+        if target is None and fuzzy:
+            target, score = fuzzy_match(normalize_header(header))
+        matches.append((header, target, score))
+    
+    claimed = {header for header, target, _ in matches if header == target}
+    plan = []
+    for header, target, score in matches:
+        if target is None or header == target:
+            continue
+        if target in claimed:
+            continue
+        claimed.add(target)
+        plan.append((header, target, score))
+    
+    return tuple(plan)
@@ -0,0 +1,303 @@
+"""
+Stage Instrumentation for Student Mental Health Analysis
+Times each pipeline stage and records its memory use, optionally with a profile
+
+Both command line scripts run their stages inside Instrumentation.stage()
+spans. A span measures wall time, CPU time (including finished child
+processes, plus any worker CPU the stage reports in span['worker_cpu_s']),
+RSS at its start and end, and the peak RSS reached in between. The kernel
+counter behind the peak (VmHWM) is reset when a top-level span starts.
+Finished spans are
+
+- appended to a JSON-lines trace file (--trace), one event per line,
+  flushed immediately so a crashed run keeps its trace,
+- summarized in a timing table at the end of the run, and
+- optionally profiled (--profile-dir), either with cProfile (one .prof
+  file per stage, for pstats or snakeviz) or with a low-overhead stack
+  sampler (one .folded file per stage, in the collapsed-stack format read
+  by flamegraph.pl and speedscope).
+
+--quiet sends the progress banners of the run to /dev/null. Errors and
+logging output still reach stderr.
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+PROFILERS = ['cprofile', 'sample']
+SAMPLE_INTERVAL = 0.005
+
+def add_instrumentation_args(parser):
+    """
+    Add the --quiet, --trace, --profile-dir and --profiler options
+    """
+
+    parser.add_argument('--quiet', action='store_true',
+                        help="Suppress progress banners and the timing summary")
+    parser.add_argument('--trace', default=None,
+                        help="Append per-stage timing and memory spans to this JSON-lines file")
+    parser.add_argument('--profile-dir', default=None,
+                        help="Write one profile per stage to this directory")
+    parser.add_argument('--profiler', choices=PROFILERS, default='cprofile',
+                        help="cprofile: deterministic .prof files; "
+                             "sample: collapsed stacks from a stack sampler (.folded)")
+    return parser
+
+def _status_mb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def current_rss_mb():
+    """
+    Resident set size of this process in MB (None where unavailable)
+    """
+
+    return _status_mb('VmRSS')
+
+def reset_peak_rss():
+    """
+    Restart the kernel's peak-RSS counter; False where that is not allowed
+    """
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    """
+    Peak resident set size in MB since the last reset (or process start)
+    """
+
+    peak = _status_mb('VmHWM')
+    if peak is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return peak
+
+def cpu_seconds():
+    """
+    User + system CPU time of this process and its finished children
+    """
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a fixed interval and counts the
+    collapsed stacks
+    """
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _collapse(self, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+class Instrumentation:
+    """
+    Timing and memory spans for the stages of one run
+    """
+
+    def __init__(self, program, trace=None, profile_dir=None, profiler='cprofile', quiet=False):
+        self.program = program
+        self.trace_path = trace
+        self.profile_dir = profile_dir
+        self.profiler = profiler
+        self.quiet = quiet
+        self.run_id = uuid.uuid4().hex[:12]
+        self.spans = []
+        self._depth = 0
+        self._trace = None
+
+    @classmethod
+    def from_args(cls, program, args):
+        """
+        Instrumentation configured by the add_instrumentation_args options
+        """
+
+        return cls(program, trace=args.trace, profile_dir=args.profile_dir,
+                   profiler=args.profiler, quiet=args.quiet)
+
+    def _emit(self, event):
+        if self._trace is None:
+            return
+        record = {'run_id': self.run_id, 'program': self.program, **event}
+        self._trace.write(json.dumps(record, default=str) + '\n')
+        self._trace.flush()
+
+    @contextlib.contextmanager
+    def run(self, argv=None):
+        """
+        Wrap a whole run: open the trace, silence stdout with --quiet and
+        print the timing summary at the end
+        """
+
+        if self.trace_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.trace_path)), exist_ok=True)
+            self._trace = open(self.trace_path, 'a', encoding='utf-8')
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+
+        started = time.perf_counter()
+        self._emit({'event': 'run_start', 'time': _now(),
+                    'argv': list(sys.argv[1:] if argv is None else argv)})
+        status = 'error'
+        try:
+            with contextlib.ExitStack() as stack:
+                if self.quiet:
+                    devnull = stack.enter_context(open(os.devnull, 'w'))
+                    stack.enter_context(contextlib.redirect_stdout(devnull))
+                yield self
+            status = 'ok'
+        finally:
+            self._emit({'event': 'run_end', 'time': _now(), 'status': status,
+                        'wall_s': round(time.perf_counter() - started, 4),
+                        # ru_maxrss is never reset, so it covers the whole run
+                        'peak_rss_mb': _round(
+                            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)})
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+            if status == 'ok' and not self.quiet:
+                self.print_summary()
+
+    @contextlib.contextmanager
+    def stage(self, name, **fields):
+        """
+        Measure one stage; the yielded dict takes extra fields for the
+        trace (e.g. span['rows'] = len(df)). span['worker_cpu_s'] is added
+        to cpu_s: CPU time of pool workers that are still alive, which
+        RUSAGE_CHILDREN does not count yet
+        """
+
+        span = dict(fields)
+        top_level = self._depth == 0
+        peak_resets = top_level and reset_peak_rss()
+        profiler = self._start_profiler() if top_level else None
+
+        self._depth += 1
+        rss_start = current_rss_mb()
+        started_at = _now()
+        wall_start, cpu_start = time.perf_counter(), cpu_seconds()
+        status, error = 'ok', None
+        try:
+            yield span
+        except BaseException as e:
+            status, error = 'error', f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, cpu_seconds() - cpu_start
+            cpu += span.get('worker_cpu_s') or 0.0
+            self._depth -= 1
+            if profiler is not None:
+                self._stop_profiler(profiler, name)
+
+            record = {
+                'event': 'span', 'stage': name, 'depth': self._depth, 'start': started_at,
+                'status': status, 'wall_s': round(wall, 4), 'cpu_s': round(cpu, 4),
+                'rss_start_mb': _round(rss_start), 'rss_end_mb': _round(current_rss_mb()),
+                # Without a reset the peak covers the whole process so far
+                'peak_rss_mb': _round(peak_rss_mb()), 'peak_is_stage': bool(peak_resets),
+                **span,
+            }
+            if error:
+                record['error'] = error
+            self.spans.append(record)
+            self._emit(record)
+
+    def _start_profiler(self):
+        if not self.profile_dir:
+            return None
+        if self.profiler == 'sample':
+            profiler = StackSampler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def _stop_profiler(self, profiler, name):
+        stem = os.path.join(self.profile_dir, f"{self.program}.{name}")
+        if isinstance(profiler, StackSampler):
+            profiler.stop()
+            profiler.dump(stem + '.folded')
+        else:
+            profiler.disable()
+            profiler.dump_stats(stem + '.prof')
+
+    def print_summary(self):
+        """
+        Table of the top-level stage spans in run order, with their share
+        of the total wall time
+        """
+
+        spans = [span for span in self.spans if span['depth'] == 0]
+        if not spans:
+            return
+
+        total = sum(span['wall_s'] for span in spans) or 1
+        print("\n" + "="*70)
+        print("STAGE TIMINGS")
+        print("="*70)
+        print(f"  {'Stage':<32} {'Wall (s)':>9} {'CPU (s)':>9} {'Peak RSS (MB)':>14} {'Share':>6}")
+        for span in spans:
+            peak = f"{span['peak_rss_mb']:.1f}" if span['peak_rss_mb'] is not None else "n/a"
+            print(f"  {span['stage']:<32} {span['wall_s']:>9.3f} {span['cpu_s']:>9.3f} "
+                  f"{peak:>14} {span['wall_s'] / total:>6.1%}")
+        if self.trace_path:
+            print(f"\n✓ Trace appended: {self.trace_path}")
+        if self.profile_dir:
+            print(f"✓ Profiles saved: {self.profile_dir}")
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+
+def _round(value, digits=1):
+    return None if value is None else round(value, digits)
@@ -3,31 +3,81 @@ Student Mental Health Analysis - Main Analysis Script
 Analyzes relationships between campus environment, academic expectations, and mental health
 """
 
+import os
+import sys
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy import stats
-from scipy.stats import pearsonr, ttest_ind, f_oneway
+import argparse
 import warnings
+from functools import lru_cache
+from importlib.metadata import version
 warnings.filterwarnings('ignore')
 
-# Set style for better visualizations
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set_palette("husl")
+from columnar_io import iter_table, preferred_input, read_table, with_format, write_table
+from categorical_kernels import clean_labels, to_yes_no
+from schema import COMPOSITE_COLUMNS, apply_dtype_plan, fill_missing
+from dedup import DEFAULT_KEY_COLUMNS, RowDeduplicator
+from quantile_sketch import column_median
+from synthetic_data import generate_sample
+from instrumentation import Instrumentation, add_instrumentation_args
+from moment_stats import SufficientStats, f_oneway, ttest_ind
+from rank_correlation import RankCorrelation
+from scatter_density import DENSITY_THRESHOLD, density_grid, use_density
+from render_scheduler import RenderScheduler, default_workers
+from output_cache import CACHE_DIR, OutputCache, code_version
 
 # Configuration
 FIGURE_SIZE = (20, 12)
 DPI = 100
 RANDOM_SEED = 42
+INPUT_FILE = '../data/processed/combined_mental_health_data.csv'
+PROCESSED_OUTPUT = '../data/processed/processed_mental_health_data.csv'
+VISUALIZATION_DIR = '../outputs/visualizations'
 
-def load_data(filepath=None):
+CORRELATION_COLUMNS = [
+    'depression_score', 'anxiety_score', 'stress_level', 'sleep_quality',
+    'campus_safety', 'social_support', 'campus_facilities', 
+    'accommodation_satisfaction', 'peer_relationships',
+    'academic_pressure', 'workload_stress', 'exam_anxiety',
+    'grade_expectations', 'career_concerns'
+]
+MAIN_FACTORS = ['campus_environment_score', 'academic_expectation_score', 'mental_health_score']
+CORRELATION_LABELS = {'spearman': 'Spearman', 'kendall': 'Kendall tau-b'}
+
+# Columns and groupings whose moments the summary, correlation, testing
+# and findings stages share (see moment_stats)
+MOMENT_COLUMNS = ['age', 'cgpa'] + CORRELATION_COLUMNS + MAIN_FACTORS
+
+@lru_cache(maxsize=None)
+def plotting():
     """
-    Load dataset from CSV or generate sample data
+    matplotlib.pyplot, imported and styled on first use (in each render
+    worker too)
+    
+    pyplot and seaborn (which pulls in scipy.stats) take seconds to
+    import; a run that only replays its cached report never needs them
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
+    # Set style for better visualizations
+    plt.style.use('seaborn-v0_8-darkgrid')
+    sns.set_palette("husl")
+    return plt
+
+def load_data(filepath=None, columns=None, filters=None):
+    """
+    Load dataset from CSV/Parquet/Feather or generate sample data
+    
+    A partitioned, Parquet or Feather copy next to a CSV path is preferred
+    when it is up to date; columns limits the load to the listed columns
+    and filters to matching rows, e.g. {'source': ['survey_a.csv']} (only
+    the matching partitions of a partitioned dataset are read)
     """
     if filepath:
         try:
-            df = pd.read_csv(filepath)
+            filepath = preferred_input(filepath)
+            df = read_table(filepath, columns, filters)
             print(f"✓ Loaded data from {filepath}")
             print(f"  Shape: {df.shape}")
             return df
@@ -40,80 +90,53 @@ def load_data(filepath=None):
     print("GENERATING SAMPLE DATA")
     print("="*70)
     
-    np.random.seed(RANDOM_SEED)
     n = 500
-    
-    data = {
-        'student_id': range(1, n + 1),
-        'age': np.random.randint(18, 26, n),
-        'gender': np.random.choice(['Male', 'Female', 'Other'], n, p=[0.45, 0.50, 0.05]),
-        'year_of_study': np.random.choice([1, 2, 3, 4], n),
-        'cgpa': np.round(np.random.uniform(2.0, 4.0, n), 2),
-        'depression_score': np.random.randint(1, 6, n),
-        'anxiety_score': np.random.randint(1, 6, n),
-        'stress_level': np.random.randint(1, 6, n),
-        'sleep_quality': np.random.randint(1, 6, n),
-        'campus_safety': np.random.randint(1, 6, n),
-        'social_support': np.random.randint(1, 6, n),
-        'campus_facilities': np.random.randint(1, 6, n),
-        'accommodation_satisfaction': np.random.randint(1, 6, n),
-        'peer_relationships': np.random.randint(1, 6, n),
-        'academic_pressure': np.random.randint(1, 6, n),
-        'workload_stress': np.random.randint(1, 6, n),
-        'exam_anxiety': np.random.randint(1, 6, n),
-        'grade_expectations': np.random.randint(1, 6, n),
-        'career_concerns': np.random.randint(1, 6, n),
-        'seeks_counseling': np.random.choice(['Yes', 'No'], n, p=[0.3, 0.7]),
-        'aware_of_services': np.random.choice(['Yes', 'No'], n, p=[0.6, 0.4]),
-    }
-    
-    df = pd.DataFrame(data)
-    
-    # Add realistic correlations
-    df['depression_score'] = np.clip(
-        df['depression_score'] + 0.3 * df['academic_pressure'] - 0.2 * df['social_support'],
-        1, 5
-    ).astype(int)
-    
-    df['anxiety_score'] = np.clip(
-        df['anxiety_score'] + 0.4 * df['exam_anxiety'] - 0.15 * df['campus_safety'],
-        1, 5
-    ).astype(int)
-    
-    df['stress_level'] = np.clip(
-        df['stress_level'] + 0.35 * df['workload_stress'] - 0.2 * df['peer_relationships'],
-        1, 5
-    ).astype(int)
+    df = generate_sample(n, RANDOM_SEED)
     
     print(f"✓ Generated sample data with {n} students")
     return df
 
-def clean_data(df):
+def clean_data(df, impute='exact', dedup_keys=None):
     """
     Clean and preprocess the dataset
+    
+    impute='sketch' fills gaps with single-pass approximate medians
+    (quantile_sketch) instead of exact per-column medians
+    
+    With dedup_keys (e.g. dedup.DEFAULT_KEY_COLUMNS) rows repeating an
+    earlier row's answers on those columns are dropped first, before any
+    gap is filled, so rows missing a key answer are never matched
     """
     print("\n" + "="*70)
     print("DATA CLEANING AND PREPROCESSING")
     print("="*70)
     
+    # Remove duplicates (fingerprinted on survey answers, not student_id)
+    if dedup_keys:
+        dedup = RowDeduplicator(dedup_keys)
+        df = dedup.filter(df)
+        if dedup.total_duplicates:
+            df = df.copy()  # the columns are rewritten below
+            print(f"✓ Removed {dedup.total_duplicates} duplicate rows")
+    
     # Convert year_of_study to numeric
     if 'year_of_study' in df.columns:
         df['year_of_study'] = pd.to_numeric(df['year_of_study'], errors='coerce')
-        df['year_of_study'] = df['year_of_study'].fillna(df['year_of_study'].median())
+        df['year_of_study'] = fill_missing(df['year_of_study'], column_median(df['year_of_study'], impute))
         df['year_of_study'] = df['year_of_study'].astype(int)
         print("✓ Cleaned year_of_study column")
     
     # Convert age to numeric
     if 'age' in df.columns:
         df['age'] = pd.to_numeric(df['age'], errors='coerce')
-        df['age'] = df['age'].fillna(df['age'].median())
+        df['age'] = fill_missing(df['age'], column_median(df['age'], impute))
         df['age'] = df['age'].clip(16, 50).astype(int)
         print("✓ Cleaned age column")
     
     # Convert CGPA to numeric
     if 'cgpa' in df.columns:
         df['cgpa'] = pd.to_numeric(df['cgpa'], errors='coerce')
-        df['cgpa'] = df['cgpa'].fillna(df['cgpa'].median())
+        df['cgpa'] = fill_missing(df['cgpa'], column_median(df['cgpa'], impute))
         df['cgpa'] = df['cgpa'].clip(0, 4.0)
         print("✓ Cleaned cgpa column")
     
@@ -129,39 +152,23 @@ def clean_data(df):
     for col in score_cols:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors='coerce')
-            df[col] = df[col].fillna(df[col].median())
+            df[col] = fill_missing(df[col], column_median(df[col], impute))
             df[col] = df[col].clip(1, 5)
     
     print(f"✓ Cleaned {len([c for c in score_cols if c in df.columns])} score columns")
     
     # Clean categorical columns
     if 'gender' in df.columns:
-        df['gender'] = df['gender'].astype(str).str.strip()
-        df['gender'] = df['gender'].replace({'nan': 'Other', 'None': 'Other'})
+        df['gender'] = clean_labels(df['gender'], {'nan': 'Other', 'None': 'Other'})
         print("✓ Cleaned gender column")
     
-    if 'seeks_counseling' in df.columns:
-        df['seeks_counseling'] = df['seeks_counseling'].astype(str).str.strip()
-        yes_values = ['Yes', 'yes', 'YES', 'Y', 'y', '1', 'True', 'true']
-        df['seeks_counseling'] = df['seeks_counseling'].apply(
-            lambda x: 'Yes' if x in yes_values else 'No'
-        )
-        print("✓ Cleaned seeks_counseling column")
-    
-    if 'aware_of_services' in df.columns:
-        df['aware_of_services'] = df['aware_of_services'].astype(str).str.strip()
-        yes_values = ['Yes', 'yes', 'YES', 'Y', 'y', '1', 'True', 'true']
-        df['aware_of_services'] = df['aware_of_services'].apply(
-            lambda x: 'Yes' if x in yes_values else 'No'
-        )
-        print("✓ Cleaned aware_of_services column")
-    
-    # Remove duplicates
-    before = len(df)
-    df = df.drop_duplicates()
-    after = len(df)
-    if before != after:
-        print(f"✓ Removed {before - after} duplicate rows")
+    for col in ['seeks_counseling', 'aware_of_services']:
+        if col in df.columns:
+            df[col] = to_yes_no(df[col])
+            print(f"✓ Cleaned {col} column")
+    
+    df = apply_dtype_plan(df)
+    print("✓ Applied compact dtypes (int8 scores, categorical answers)")
     
     return df
 
@@ -196,30 +203,112 @@ def create_composite_scores(df):
         df['mental_health_score'] = df[available_mental_cols].mean(axis=1)
         print(f"✓ Created mental_health_score (using {len(available_mental_cols)} columns)")
     
+    df = apply_dtype_plan(df, COMPOSITE_COLUMNS)
+    
     return df
 
-def exploratory_data_analysis(df):
+def score_band(col, low=2.5, high=3.5):
+    """
+    Grouping for SufficientStats: 'low' below low, 'high' above high,
+    no group in between
+    """
+    def band(chunk):
+        values = chunk[col].to_numpy(dtype='float64', na_value=np.nan)
+        codes = np.select([values < low, values > high], [0, 1], -1).astype(np.int8)
+        return pd.Categorical.from_codes(codes, ['low', 'high'])
+    return band
+
+# Per group only the mental health scores are tracked
+MOMENT_GROUP_COLUMNS = ['depression_score', 'anxiety_score', 'stress_level', 'mental_health_score']
+MOMENT_GROUPINGS = {
+    'campus_band': score_band('campus_environment_score'),
+    'academic_band': score_band('academic_expectation_score'),
+    'year_of_study': 'year_of_study',
+}
+
+def compute_moments(chunks, chunksize=200_000):
+    """
+    Accumulate the shared moments in one pass over a DataFrame or a
+    stream of frames (e.g. iter_table), so data that does not fit in
+    memory can be tested too
+    """
+    if isinstance(chunks, pd.DataFrame):
+        return SufficientStats.from_frame(chunks, MOMENT_COLUMNS, MOMENT_GROUPINGS,
+                                          MOMENT_GROUP_COLUMNS, chunksize)
+    return SufficientStats.from_chunks(chunks, MOMENT_COLUMNS, MOMENT_GROUPINGS,
+                                       MOMENT_GROUP_COLUMNS)
+
+def submit_figure(renderer, render, data, filename):
+    """
+    Hand a figure to the render scheduler, or draw it right away
+    """
+    path = os.path.join(VISUALIZATION_DIR, filename)
+    (renderer or RenderScheduler()).submit(render, data, path)
+
+def histogram(values, bins):
+    """
+    Bin counts and edges of the present values, so a figure can be drawn
+    without the rows
+    
+    The column's own dtype is kept: plt.hist places the edges of float32
+    data in float32, and values on an edge must land in the same bin
+    """
+    return np.histogram(pd.Series(values).dropna().to_numpy(), bins=bins)
+
+def plot_histogram(counts, edges, **kwargs):
+    """
+    Draw pre-binned counts as plt.hist would draw the values
+    """
+    plt = plotting()
+    plt.hist(edges[:-1], bins=edges, weights=counts, edgecolor='black', alpha=0.7, **kwargs)
+
+def exploratory_data_analysis(df, renderer=None):
     """
     Create comprehensive EDA visualizations
+    
+    Only bin and value counts are handed to the renderer (see
+    render_scheduler); without one the figure is drawn right away
     """
     print("\n" + "="*70)
     print("EXPLORATORY DATA ANALYSIS")
     print("="*70)
     
+    data = {
+        'age': histogram(df['age'], 15),
+        'gender': df['gender'].value_counts(),
+        'year_of_study': (df['year_of_study'].value_counts().sort_index()
+                          if 'year_of_study' in df.columns else None),
+        'cgpa': histogram(df['cgpa'], 20),
+        'seeks_counseling': df['seeks_counseling'].value_counts(),
+        'aware_of_services': df['aware_of_services'].value_counts(),
+    }
+    for col in ['depression_score', 'anxiety_score', 'stress_level']:
+        data[col] = histogram(df[col], 5)
+    for col in MAIN_FACTORS:
+        data[col] = histogram(df[col], 20)
+    
+    submit_figure(renderer, render_exploratory_data_analysis, data,
+                  '01_exploratory_data_analysis.png')
+
+def render_exploratory_data_analysis(data, path):
+    """
+    Draw the EDA figure from exploratory_data_analysis's counts
+    """
+    plt = plotting()
     fig = plt.figure(figsize=FIGURE_SIZE)
     fig.suptitle('Student Mental Health - Exploratory Data Analysis', 
                  fontsize=20, fontweight='bold', y=0.995)
     
     # 1. Age Distribution
     plt.subplot(3, 4, 1)
-    plt.hist(df['age'], bins=15, edgecolor='black', alpha=0.7)
+    plot_histogram(*data['age'])
     plt.title('Age Distribution', fontweight='bold')
     plt.xlabel('Age')
     plt.ylabel('Frequency')
     
     # 2. Gender Distribution
     plt.subplot(3, 4, 2)
-    gender_counts = df['gender'].value_counts()
+    gender_counts = data['gender']
     plt.bar(gender_counts.index, gender_counts.values, edgecolor='black', alpha=0.7)
     plt.title('Gender Distribution', fontweight='bold')
     plt.xlabel('Gender')
@@ -228,8 +317,8 @@ def exploratory_data_analysis(df):
     
     # 3. Year of Study
     plt.subplot(3, 4, 3)
-    if 'year_of_study' in df.columns:
-        year_counts = df['year_of_study'].value_counts().sort_index()
+    year_counts = data['year_of_study']
+    if year_counts is not None:
         plt.bar(year_counts.index, year_counts.values, edgecolor='black', alpha=0.7)
         plt.title('Year of Study Distribution', fontweight='bold')
         plt.xlabel('Year')
@@ -241,56 +330,56 @@ def exploratory_data_analysis(df):
     
     # 4. CGPA Distribution
     plt.subplot(3, 4, 4)
-    plt.hist(df['cgpa'], bins=20, edgecolor='black', alpha=0.7)
+    plot_histogram(*data['cgpa'])
     plt.title('CGPA Distribution', fontweight='bold')
     plt.xlabel('CGPA')
     plt.ylabel('Frequency')
     
     # 5. Depression Score
     plt.subplot(3, 4, 5)
-    plt.hist(df['depression_score'], bins=5, edgecolor='black', alpha=0.7, color='purple')
+    plot_histogram(*data['depression_score'], color='purple')
     plt.title('Depression Score Distribution', fontweight='bold')
     plt.xlabel('Score (1-5)')
     plt.ylabel('Frequency')
     
     # 6. Anxiety Score
     plt.subplot(3, 4, 6)
-    plt.hist(df['anxiety_score'], bins=5, edgecolor='black', alpha=0.7, color='red')
+    plot_histogram(*data['anxiety_score'], color='red')
     plt.title('Anxiety Score Distribution', fontweight='bold')
     plt.xlabel('Score (1-5)')
     plt.ylabel('Frequency')
     
     # 7. Stress Level
     plt.subplot(3, 4, 7)
-    plt.hist(df['stress_level'], bins=5, edgecolor='black', alpha=0.7, color='orange')
+    plot_histogram(*data['stress_level'], color='orange')
     plt.title('Stress Level Distribution', fontweight='bold')
     plt.xlabel('Score (1-5)')
     plt.ylabel('Frequency')
     
     # 8. Mental Health Score
     plt.subplot(3, 4, 8)
-    plt.hist(df['mental_health_score'], bins=20, edgecolor='black', alpha=0.7, color='darkred')
+    plot_histogram(*data['mental_health_score'], color='darkred')
     plt.title('Overall Mental Health Score', fontweight='bold')
     plt.xlabel('Score (1-5)')
     plt.ylabel('Frequency')
     
     # 9. Campus Environment Score
     plt.subplot(3, 4, 9)
-    plt.hist(df['campus_environment_score'], bins=20, edgecolor='black', alpha=0.7, color='green')
+    plot_histogram(*data['campus_environment_score'], color='green')
     plt.title('Campus Environment Score', fontweight='bold')
     plt.xlabel('Score (1-5)')
     plt.ylabel('Frequency')
     
     # 10. Academic Expectation Score
     plt.subplot(3, 4, 10)
-    plt.hist(df['academic_expectation_score'], bins=20, edgecolor='black', alpha=0.7, color='blue')
+    plot_histogram(*data['academic_expectation_score'], color='blue')
     plt.title('Academic Expectation Score', fontweight='bold')
     plt.xlabel('Score (1-5)')
     plt.ylabel('Frequency')
     
     # 11. Counseling Seeking Behavior
     plt.subplot(3, 4, 11)
-    counseling_counts = df['seeks_counseling'].value_counts()
+    counseling_counts = data['seeks_counseling']
     plt.bar(counseling_counts.index, counseling_counts.values, edgecolor='black', alpha=0.7)
     plt.title('Seeks Counseling', fontweight='bold')
     plt.xlabel('Response')
@@ -298,85 +387,165 @@ def exploratory_data_analysis(df):
     
     # 12. Service Awareness
     plt.subplot(3, 4, 12)
-    awareness_counts = df['aware_of_services'].value_counts()
+    awareness_counts = data['aware_of_services']
     plt.bar(awareness_counts.index, awareness_counts.values, edgecolor='black', alpha=0.7)
     plt.title('Aware of Services', fontweight='bold')
     plt.xlabel('Response')
     plt.ylabel('Count')
     
     plt.tight_layout()
-    plt.savefig('../outputs/visualizations/01_exploratory_data_analysis.png', dpi=DPI, bbox_inches='tight')
-    print("✓ Saved: 01_exploratory_data_analysis.png")
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
     plt.close()
 
-def correlation_analysis(df):
+def correlation_analysis(df, stats=None, renderer=None, method='pearson'):
     """
     Perform and visualize correlation analysis
+    
+    Pearson correlations come from the shared moments (computed here when
+    stats is None); method 'spearman' or 'kendall' (tau-b) uses rank
+    correlations instead, which only assume the 1-5 scores are ordered
     """
+    if method == 'pearson':
+        if stats is None:
+            stats = compute_moments(df)
+        matrix = stats.overall.corr_matrix
+        corr = lambda a, b: stats.overall.corr(a, b)[0]
+    else:
+        ranks = RankCorrelation(df, CORRELATION_COLUMNS + MAIN_FACTORS)
+        matrix = lambda columns: ranks.corr_matrix(columns, method)
+        corr = lambda a, b: ranks.corr(a, b, method)
+    
     print("\n" + "="*70)
     print("CORRELATION ANALYSIS")
     print("="*70)
     
+    data = {
+        'corr_matrix': matrix(CORRELATION_COLUMNS),
+        'main_corr': matrix(MAIN_FACTORS),
+        'method': None if method == 'pearson' else CORRELATION_LABELS[method],
+    }
+    submit_figure(renderer, render_correlation_analysis, data,
+                  '02_correlation_analysis.png')
+    
+    # Print key correlations
+    label = f" ({data['method']})" if data['method'] else ""
+    print(f"\nKey Correlation Coefficients{label}:")
+    print(f"  Campus Environment ↔ Mental Health: {corr('campus_environment_score', 'mental_health_score'):.3f}")
+    print(f"  Academic Expectations ↔ Mental Health: {corr('academic_expectation_score', 'mental_health_score'):.3f}")
+
+def render_correlation_analysis(data, path):
+    """
+    Draw the correlation heatmaps from correlation_analysis's matrices
+    """
+    import seaborn as sns
+    
+    plt = plotting()
     fig = plt.figure(figsize=(24, 10))
     fig.suptitle('Correlation Analysis - Campus Environment, Academic Expectations & Mental Health', 
                  fontsize=18, fontweight='bold', y=0.995)
     
-    # Select relevant columns
-    correlation_cols = [
-        'depression_score', 'anxiety_score', 'stress_level', 'sleep_quality',
-        'campus_safety', 'social_support', 'campus_facilities', 
-        'accommodation_satisfaction', 'peer_relationships',
-        'academic_pressure', 'workload_stress', 'exam_anxiety',
-        'grade_expectations', 'career_concerns'
-    ]
-    
     # 1. Full Correlation Heatmap
     plt.subplot(1, 2, 1)
-    corr_matrix = df[correlation_cols].corr()
-    sns.heatmap(corr_matrix, annot=True, fmt='.2f', cmap='coolwarm', 
+    sns.heatmap(data['corr_matrix'], annot=True, fmt='.2f', cmap='coolwarm', 
                 center=0, square=True, linewidths=1, cbar_kws={"shrink": 0.8})
-    plt.title('Correlation Matrix - All Factors', fontweight='bold', fontsize=14)
+    suffix = f" ({data['method']})" if data['method'] else ""
+    plt.title('Correlation Matrix - All Factors' + suffix, fontweight='bold', fontsize=14)
     
     # 2. Main Factors Correlation
     plt.subplot(1, 2, 2)
-    main_factors = ['campus_environment_score', 'academic_expectation_score', 'mental_health_score']
-    main_corr = df[main_factors].corr()
-    sns.heatmap(main_corr, annot=True, fmt='.3f', cmap='RdYlGn_r', 
+    sns.heatmap(data['main_corr'], annot=True, fmt='.3f', cmap='RdYlGn_r', 
                 center=0, square=True, linewidths=2, cbar_kws={"shrink": 0.8},
                 vmin=-1, vmax=1)
-    plt.title('Main Composite Scores Correlation', fontweight='bold', fontsize=14)
+    plt.title('Main Composite Scores Correlation' + suffix, fontweight='bold', fontsize=14)
     
     plt.tight_layout()
-    plt.savefig('../outputs/visualizations/02_correlation_analysis.png', dpi=DPI, bbox_inches='tight')
-    print("✓ Saved: 02_correlation_analysis.png")
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
     plt.close()
+
+def scatter_trend(df, stats, x_col, y_col, density=False):
+    """
+    Points of a scatter plot (or, with density, their counts on a grid)
+    and the end points of the least-squares line from the moments
+    """
+    x = df[x_col].to_numpy(dtype='float64')
+    y = df[y_col].to_numpy(dtype='float64')
+    slope, intercept = stats.overall.linear_fit(x_col, y_col)
+    ends = np.array([np.nanmin(x), np.nanmax(x)])
+    if density:
+        return {'density': density_grid(x, y), 'trend': (ends, slope * ends + intercept)}
+    return {'x': x, 'y': y, 'trend': (ends, slope * ends + intercept)}
+
+def plot_scatter_trend(points, color=None, cmap='Blues'):
+    from matplotlib.colors import LogNorm
+    
+    plt = plotting()
+    if 'density' in points:
+        counts, x_edges, y_edges = points['density']
+        mesh = plt.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0),
+                              cmap=cmap, norm=LogNorm())
+        plt.colorbar(mesh, label='Students')
+    else:
+        plt.scatter(points['x'], points['y'], alpha=0.5, s=50, color=color)
+    plt.plot(*points['trend'], "r--", linewidth=2, label='Trend Line')
+
+def box_stats(df, columns, labels):
+    """
+    Box-plot statistics (quartiles, whiskers, outliers) of columns, as
+    plt.boxplot computes them; repeated outliers are kept once, since they
+    are drawn on top of each other
+    """
+    from matplotlib import cbook
     
-    # Print key correlations
-    print("\nKey Correlation Coefficients:")
-    print(f"  Campus Environment ↔ Mental Health: {df['campus_environment_score'].corr(df['mental_health_score']):.3f}")
-    print(f"  Academic Expectations ↔ Mental Health: {df['academic_expectation_score'].corr(df['mental_health_score']):.3f}")
+    stats = cbook.boxplot_stats([df[col] for col in columns], labels=labels)
+    for box in stats:
+        box['fliers'] = np.unique(box['fliers'])
+    return stats
 
-def advanced_visualizations(df):
+def advanced_visualizations(df, stats=None, renderer=None, density_threshold=DENSITY_THRESHOLD):
     """
     Create advanced analytical visualizations
+    
+    Above density_threshold rows the scatter plots become density plots
+    (see scatter_density); trend lines come from the shared moments
+    (computed here when stats is None)
     """
+    if stats is None:
+        stats = compute_moments(df)
+    
     print("\n" + "="*70)
     print("ADVANCED VISUALIZATIONS")
     print("="*70)
     
+    density = use_density(len(df), density_threshold)
+    if density:
+        print(f"  {len(df):,} students: scatter plots drawn as densities")
+    
+    indicators = ['depression_score', 'anxiety_score', 'stress_level']
+    data = {
+        'campus': scatter_trend(df, stats, 'campus_environment_score', 'mental_health_score', density),
+        'academic': scatter_trend(df, stats, 'academic_expectation_score', 'mental_health_score', density),
+        'cgpa': scatter_trend(df, stats, 'cgpa', 'mental_health_score', density),
+        'year': (df.groupby('year_of_study', observed=True)[indicators].mean()
+                 if 'year_of_study' in df.columns else None),
+        'gender': df.groupby('gender', observed=True)[indicators].mean(),
+        'boxes': box_stats(df, indicators + ['sleep_quality'],
+                           ['Depression', 'Anxiety', 'Stress', 'Sleep Quality']),
+    }
+    submit_figure(renderer, render_advanced_visualizations, data,
+                  '03_advanced_visualizations.png')
+
+def render_advanced_visualizations(data, path):
+    """
+    Draw the advanced figure from advanced_visualizations's aggregates
+    """
+    plt = plotting()
     fig = plt.figure(figsize=(24, 16))
     fig.suptitle('Advanced Analysis - Relationships and Patterns', 
                  fontsize=20, fontweight='bold', y=0.995)
     
     # 1. Campus Environment vs Mental Health
     plt.subplot(2, 3, 1)
-    plt.scatter(df['campus_environment_score'], df['mental_health_score'], 
-                alpha=0.5, s=50)
-    z = np.polyfit(df['campus_environment_score'], df['mental_health_score'], 1)
-    p = np.poly1d(z)
-    plt.plot(df['campus_environment_score'].sort_values(), 
-             p(df['campus_environment_score'].sort_values()), 
-             "r--", linewidth=2, label='Trend Line')
+    plot_scatter_trend(data['campus'])
     plt.xlabel('Campus Environment Score', fontweight='bold')
     plt.ylabel('Mental Health Score', fontweight='bold')
     plt.title('Campus Environment vs Mental Health', fontweight='bold')
@@ -385,13 +554,7 @@ def advanced_visualizations(df):
     
     # 2. Academic Expectations vs Mental Health
     plt.subplot(2, 3, 2)
-    plt.scatter(df['academic_expectation_score'], df['mental_health_score'], 
-                alpha=0.5, s=50, color='orange')
-    z = np.polyfit(df['academic_expectation_score'], df['mental_health_score'], 1)
-    p = np.poly1d(z)
-    plt.plot(df['academic_expectation_score'].sort_values(), 
-             p(df['academic_expectation_score'].sort_values()), 
-             "r--", linewidth=2, label='Trend Line')
+    plot_scatter_trend(data['academic'], color='orange', cmap='Oranges')
     plt.xlabel('Academic Expectation Score', fontweight='bold')
     plt.ylabel('Mental Health Score', fontweight='bold')
     plt.title('Academic Expectations vs Mental Health', fontweight='bold')
@@ -400,8 +563,8 @@ def advanced_visualizations(df):
     
     # 3. Mental Health by Year of Study
     plt.subplot(2, 3, 3)
-    if 'year_of_study' in df.columns:
-        year_data = df.groupby('year_of_study')[['depression_score', 'anxiety_score', 'stress_level']].mean()
+    year_data = data['year']
+    if year_data is not None:
         x = year_data.index
         width = 0.25
         plt.bar(x - width, year_data['depression_score'], width, label='Depression', alpha=0.8)
@@ -420,8 +583,7 @@ def advanced_visualizations(df):
     
     # 4. Mental Health by Gender
     plt.subplot(2, 3, 4)
-    gender_data = df.groupby('gender')[['depression_score', 'anxiety_score', 'stress_level']].mean()
-    gender_data.plot(kind='bar', ax=plt.gca(), alpha=0.8)
+    data['gender'].plot(kind='bar', ax=plt.gca(), alpha=0.8)
     plt.xlabel('Gender', fontweight='bold')
     plt.ylabel('Average Score', fontweight='bold')
     plt.title('Mental Health by Gender', fontweight='bold')
@@ -431,12 +593,7 @@ def advanced_visualizations(df):
     
     # 5. CGPA vs Mental Health
     plt.subplot(2, 3, 5)
-    plt.scatter(df['cgpa'], df['mental_health_score'], alpha=0.5, s=50, color='green')
-    z = np.polyfit(df['cgpa'], df['mental_health_score'], 1)
-    p = np.poly1d(z)
-    plt.plot(df['cgpa'].sort_values(), 
-             p(df['cgpa'].sort_values()), 
-             "r--", linewidth=2, label='Trend Line')
+    plot_scatter_trend(data['cgpa'], color='green', cmap='Greens')
     plt.xlabel('CGPA', fontweight='bold')
     plt.ylabel('Mental Health Score', fontweight='bold')
     plt.title('CGPA vs Mental Health', fontweight='bold')
@@ -445,90 +602,134 @@ def advanced_visualizations(df):
     
     # 6. Box Plot - Mental Health Indicators
     plt.subplot(2, 3, 6)
-    mental_indicators = df[['depression_score', 'anxiety_score', 'stress_level', 'sleep_quality']]
-    plt.boxplot([mental_indicators[col] for col in mental_indicators.columns],
-                labels=['Depression', 'Anxiety', 'Stress', 'Sleep Quality'])
+    plt.gca().bxp(data['boxes'])
     plt.ylabel('Score (1-5)', fontweight='bold')
     plt.title('Mental Health Indicators Distribution', fontweight='bold')
     plt.xticks(rotation=45)
     plt.grid(True, alpha=0.3, axis='y')
     
     plt.tight_layout()
-    plt.savefig('../outputs/visualizations/03_advanced_visualizations.png', dpi=DPI, bbox_inches='tight')
-    print("✓ Saved: 03_advanced_visualizations.png")
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
     plt.close()
 
-def statistical_testing(df):
+def statistical_testing(df, stats=None):
     """
     Perform statistical hypothesis testing
+    
+    Every parametric test is derived from the shared moments (computed
+    here when stats is None), so df is only scanned once; the rank
+    correlations need the rows and are left out when df is None
+    (--stats-only)
     """
+    if stats is None:
+        stats = compute_moments(df)
+    
     print("\n" + "="*70)
     print("STATISTICAL HYPOTHESIS TESTING")
     print("="*70)
     
     # Test 1: Campus Environment and Mental Health
     print("\n1. Campus Environment Impact on Mental Health")
-    poor_campus = df[df['campus_environment_score'] < 2.5]['mental_health_score']
-    good_campus = df[df['campus_environment_score'] > 3.5]['mental_health_score']
+    poor_campus = stats.group('campus_band', 'low')
+    good_campus = stats.group('campus_band', 'high')
     
-    if len(poor_campus) > 0 and len(good_campus) > 0:
-        t_stat, p_value = ttest_ind(poor_campus, good_campus)
+    if poor_campus.count('mental_health_score') > 0 and good_campus.count('mental_health_score') > 0:
+        t_stat, p_value = ttest_ind(poor_campus, good_campus, 'mental_health_score')
         print(f"   T-statistic: {t_stat:.4f}")
         print(f"   P-value: {p_value:.4f}")
         print(f"   Result: {'Statistically significant' if p_value < 0.05 else 'Not significant'} (α=0.05)")
     
     # Test 2: Academic Expectations and Mental Health
     print("\n2. Academic Expectations Impact on Mental Health")
-    low_academic = df[df['academic_expectation_score'] < 2.5]['mental_health_score']
-    high_academic = df[df['academic_expectation_score'] > 3.5]['mental_health_score']
+    low_academic = stats.group('academic_band', 'low')
+    high_academic = stats.group('academic_band', 'high')
     
-    if len(low_academic) > 0 and len(high_academic) > 0:
-        t_stat, p_value = ttest_ind(low_academic, high_academic)
+    if low_academic.count('mental_health_score') > 0 and high_academic.count('mental_health_score') > 0:
+        t_stat, p_value = ttest_ind(low_academic, high_academic, 'mental_health_score')
         print(f"   T-statistic: {t_stat:.4f}")
         print(f"   P-value: {p_value:.4f}")
         print(f"   Result: {'Statistically significant' if p_value < 0.05 else 'Not significant'} (α=0.05)")
     
     # Test 3: ANOVA - Mental Health across Years
     print("\n3. Mental Health Differences Across Academic Years")
-    if 'year_of_study' in df.columns and df['year_of_study'].nunique() >= 2:
-        years = sorted(df['year_of_study'].unique())
-        groups = [df[df['year_of_study'] == year]['mental_health_score'] for year in years if len(df[df['year_of_study'] == year]) > 0]
-        if len(groups) >= 2:
-            f_stat, p_value = f_oneway(*groups)
-            print(f"   F-statistic: {f_stat:.4f}")
-            print(f"   P-value: {p_value:.4f}")
-            print(f"   Result: {'Statistically significant' if p_value < 0.05 else 'Not significant'} (α=0.05)")
-        else:
-            print("   Not enough year groups for ANOVA")
+    groups = [moments for _, moments in stats.ordered_groups('year_of_study')
+              if moments.count('mental_health_score') > 0]
+    if len(groups) >= 2:
+        f_stat, p_value = f_oneway(groups, 'mental_health_score')
+        print(f"   F-statistic: {f_stat:.4f}")
+        print(f"   P-value: {p_value:.4f}")
+        print(f"   Result: {'Statistically significant' if p_value < 0.05 else 'Not significant'} (α=0.05)")
     else:
         print("   Year of study data not available or insufficient")
     
     # Test 4: Pearson Correlations
     print("\n4. Pearson Correlation Coefficients")
-    corr1, p1 = pearsonr(df['campus_environment_score'], df['mental_health_score'])
+    corr1, p1 = stats.overall.pearsonr('campus_environment_score', 'mental_health_score')
     print(f"   Campus Environment ↔ Mental Health: r={corr1:.3f}, p={p1:.4f}")
     
-    corr2, p2 = pearsonr(df['academic_expectation_score'], df['mental_health_score'])
+    corr2, p2 = stats.overall.pearsonr('academic_expectation_score', 'mental_health_score')
     print(f"   Academic Expectations ↔ Mental Health: r={corr2:.3f}, p={p2:.4f}")
+    
+    # Test 5: Rank Correlations (the scores are ordinal)
+    if df is not None:
+        print("\n5. Rank Correlation Coefficients")
+        ranks = RankCorrelation(df, MAIN_FACTORS)
+        for label, col in [('Campus Environment', 'campus_environment_score'),
+                           ('Academic Expectations', 'academic_expectation_score')]:
+            rho, p_rho = ranks.spearmanr(col, 'mental_health_score')
+            tau, p_tau = ranks.kendalltau(col, 'mental_health_score')
+            print(f"   {label} ↔ Mental Health: Spearman ρ={rho:.3f} (p={p_rho:.4f}), "
+                  f"Kendall τ-b={tau:.3f} (p={p_tau:.4f})")
 
-def key_findings_summary(df):
+def key_findings_summary(df, stats=None, renderer=None):
     """
     Create summary visualizations of key findings
+    
+    Correlations and average scores come from the shared moments
+    (computed here when stats is None)
     """
+    if stats is None:
+        stats = compute_moments(df)
+    
     print("\n" + "="*70)
     print("KEY FINDINGS SUMMARY")
     print("="*70)
     
+    df['mh_category'] = pd.cut(df['mental_health_score'], 
+                                bins=[0, 2, 3, 4, 5], 
+                                labels=['Good', 'Moderate', 'Poor', 'Severe'])
+    data = {
+        'mh_dist': df['mh_category'].value_counts(),
+        'util': {
+            'High MH Concerns': (df['mental_health_score'] >= 3.5).sum() / len(df) * 100,
+            'Seeking Counseling': (df['seeks_counseling'] == 'Yes').sum() / len(df) * 100,
+            'Aware of Services': (df['aware_of_services'] == 'Yes').sum() / len(df) * 100
+        },
+        'correlations': [
+            stats.overall.corr(col, 'mental_health_score')[0]
+            for col in ['campus_environment_score', 'academic_expectation_score', 'social_support',
+                        'workload_stress', 'peer_relationships']
+        ],
+        'averages': [
+            stats.overall.mean(col)
+            for col in ['depression_score', 'anxiety_score', 'stress_level', 'mental_health_score']
+        ],
+    }
+    submit_figure(renderer, render_key_findings_summary, data,
+                  '04_key_findings_summary.png')
+
+def render_key_findings_summary(data, path):
+    """
+    Draw the executive summary from key_findings_summary's figures
+    """
+    plt = plotting()
     fig = plt.figure(figsize=(20, 14))
     fig.suptitle('Key Findings - Executive Summary', 
                  fontsize=20, fontweight='bold', y=0.995)
     
     # 1. Mental Health Status Pie Chart
     plt.subplot(2, 2, 1)
-    df['mh_category'] = pd.cut(df['mental_health_score'], 
-                                bins=[0, 2, 3, 4, 5], 
-                                labels=['Good', 'Moderate', 'Poor', 'Severe'])
-    mh_dist = df['mh_category'].value_counts()
+    mh_dist = data['mh_dist']
     colors = ['#2ecc71', '#f39c12', '#e67e22', '#e74c3c']
     plt.pie(mh_dist.values, labels=mh_dist.index, autopct='%1.1f%%',
             colors=colors, startangle=90, textprops={'fontsize': 12, 'fontweight': 'bold'})
@@ -536,11 +737,7 @@ def key_findings_summary(df):
     
     # 2. Service Utilization Gap
     plt.subplot(2, 2, 2)
-    util_data = {
-        'High MH Concerns': (df['mental_health_score'] >= 3.5).sum() / len(df) * 100,
-        'Seeking Counseling': (df['seeks_counseling'] == 'Yes').sum() / len(df) * 100,
-        'Aware of Services': (df['aware_of_services'] == 'Yes').sum() / len(df) * 100
-    }
+    util_data = data['util']
     bars = plt.bar(util_data.keys(), util_data.values(), 
                    color=['#e74c3c', '#3498db', '#2ecc71'], alpha=0.8, edgecolor='black')
     plt.ylabel('Percentage (%)', fontweight='bold', fontsize=12)
@@ -557,13 +754,7 @@ def key_findings_summary(df):
     plt.subplot(2, 2, 3)
     factors = ['Campus\nEnvironment', 'Academic\nExpectations', 'Social\nSupport', 
                'Workload\nStress', 'Peer\nRelationships']
-    correlations = [
-        df['campus_environment_score'].corr(df['mental_health_score']),
-        df['academic_expectation_score'].corr(df['mental_health_score']),
-        df['social_support'].corr(df['mental_health_score']),
-        df['workload_stress'].corr(df['mental_health_score']),
-        df['peer_relationships'].corr(df['mental_health_score'])
-    ]
+    correlations = data['correlations']
     colors_corr = ['green' if c < 0 else 'red' for c in correlations]
     bars = plt.barh(factors, correlations, color=colors_corr, alpha=0.7, edgecolor='black')
     plt.xlabel('Correlation Coefficient', fontweight='bold', fontsize=12)
@@ -578,12 +769,7 @@ def key_findings_summary(df):
     # 4. Mental Health Indicators Average
     plt.subplot(2, 2, 4)
     indicators = ['Depression', 'Anxiety', 'Stress', 'Overall\nMH Score']
-    values = [
-        df['depression_score'].mean(),
-        df['anxiety_score'].mean(),
-        df['stress_level'].mean(),
-        df['mental_health_score'].mean()
-    ]
+    values = data['averages']
     bars = plt.bar(indicators, values, color=['#9b59b6', '#e74c3c', '#f39c12', '#34495e'], 
                    alpha=0.8, edgecolor='black')
     plt.ylabel('Average Score (1-5)', fontweight='bold', fontsize=12)
@@ -598,41 +784,42 @@ def key_findings_summary(df):
     plt.grid(True, alpha=0.3, axis='y')
     
     plt.tight_layout()
-    plt.savefig('../outputs/visualizations/04_key_findings_summary.png', dpi=DPI, bbox_inches='tight')
-    print("✓ Saved: 04_key_findings_summary.png")
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
     plt.close()
 
-def save_processed_data(df):
+def save_processed_data(df, output_file=PROCESSED_OUTPUT):
     """
-    Save processed dataset
+    Save processed dataset (format follows the file extension)
     """
-    output_file = '../data/processed/processed_mental_health_data.csv'
-    df.to_csv(output_file, index=False)
+    write_table(df, output_file)
     print(f"\n✓ Saved processed data: {output_file}")
     print(f"  Shape: {df.shape}")
 
-def print_summary_statistics(df):
+def print_summary_statistics(df, stats=None):
     """
-    Print summary statistics
+    Print summary statistics (averages from the shared moments when given)
     """
+    if stats is None:
+        stats = compute_moments(df)
+    
     print("\n" + "="*70)
     print("SUMMARY STATISTICS")
     print("="*70)
     
     print(f"\n📊 Dataset Overview:")
     print(f"   Total Students: {len(df)}")
-    print(f"   Average Age: {df['age'].mean():.1f} years")
-    print(f"   Average CGPA: {df['cgpa'].mean():.2f}/4.0")
+    print(f"   Average Age: {stats.overall.mean('age'):.1f} years")
+    print(f"   Average CGPA: {stats.overall.mean('cgpa'):.2f}/4.0")
     
     print(f"\n🧠 Mental Health Indicators (Average):")
-    print(f"   Depression Score: {df['depression_score'].mean():.2f}/5.0")
-    print(f"   Anxiety Score: {df['anxiety_score'].mean():.2f}/5.0")
-    print(f"   Stress Level: {df['stress_level'].mean():.2f}/5.0")
-    print(f"   Mental Health Score: {df['mental_health_score'].mean():.2f}/5.0")
+    print(f"   Depression Score: {stats.overall.mean('depression_score'):.2f}/5.0")
+    print(f"   Anxiety Score: {stats.overall.mean('anxiety_score'):.2f}/5.0")
+    print(f"   Stress Level: {stats.overall.mean('stress_level'):.2f}/5.0")
+    print(f"   Mental Health Score: {stats.overall.mean('mental_health_score'):.2f}/5.0")
     
     print(f"\n🏫 Campus & Academic (Average):")
-    print(f"   Campus Environment: {df['campus_environment_score'].mean():.2f}/5.0")
-    print(f"   Academic Expectations: {df['academic_expectation_score'].mean():.2f}/5.0")
+    print(f"   Campus Environment: {stats.overall.mean('campus_environment_score'):.2f}/5.0")
+    print(f"   Academic Expectations: {stats.overall.mean('academic_expectation_score'):.2f}/5.0")
     
     print(f"\n⚠️ Risk Assessment:")
     high_risk = (df['mental_health_score'] >= 3.5).sum()
@@ -642,36 +829,243 @@ def print_summary_statistics(df):
     aware = (df['aware_of_services'] == 'Yes').sum()
     print(f"   Aware of Services: {aware} ({aware/len(df)*100:.1f}%)")
 
-def main():
+# Stages that take the shared moments
+MOMENT_STAGES = [correlation_analysis, statistical_testing, advanced_visualizations,
+                 key_findings_summary]
+FIGURE_STAGES = [exploratory_data_analysis, correlation_analysis, advanced_visualizations,
+                 key_findings_summary]
+
+# What every output depends on besides the data: loading, cleaning,
+# scoring and moments (with the helper modules they call) and the
+# configuration and library versions of the figures
+PIPELINE_CODE = [load_data, clean_data, create_composite_scores, score_band, compute_moments,
+                 plotting, submit_figure] + [sys.modules[obj.__module__] for obj in
+                                   (read_table, clean_labels, fill_missing, RowDeduplicator,
+                                    column_median, generate_sample, SufficientStats)]
+PIPELINE_CONFIG = {
+    'figure_size': FIGURE_SIZE, 'dpi': DPI, 'seed': RANDOM_SEED, 'columns': MOMENT_COLUMNS,
+    'groups': MOMENT_GROUP_COLUMNS, 'libraries': [np.__version__, pd.__version__,
+                                                  version('matplotlib'), version('seaborn')],
+}
+
+# Stages with file outputs: stage -> (output, functions besides the pipeline).
+# The processed data includes the mh_category column of key_findings_summary
+CACHED_STAGES = {
+    'exploratory_data_analysis': ('01_exploratory_data_analysis.png',
+                                  [exploratory_data_analysis, render_exploratory_data_analysis,
+                                   histogram, plot_histogram]),
+    'correlation_analysis': ('02_correlation_analysis.png',
+                             [correlation_analysis, render_correlation_analysis,
+                              sys.modules[RankCorrelation.__module__]]),
+    'advanced_visualizations': ('03_advanced_visualizations.png',
+                                [advanced_visualizations, render_advanced_visualizations,
+                                 scatter_trend, plot_scatter_trend, box_stats,
+                                 sys.modules[density_grid.__module__]]),
+    'key_findings_summary': ('04_key_findings_summary.png',
+                             [key_findings_summary, render_key_findings_summary]),
+    'save_processed_data': (None, [save_processed_data, key_findings_summary,
+                                   sys.modules[write_table.__module__]]),
+}
+
+def stage_outputs(stage, processed_file):
+    """
+    Files a cached stage writes
+    """
+    output, _ = CACHED_STAGES[stage]
+    return [processed_file if output is None else os.path.join(VISUALIZATION_DIR, output)]
+
+def stage_keys(cache, processed_file):
+    """
+    Cache key of every stage with file outputs
+    """
+    keys = {}
+    for stage, (output, functions) in CACHED_STAGES.items():
+        config = dict(PIPELINE_CONFIG, output=output or processed_file)
+        keys[stage] = cache.stage_key(code_version(PIPELINE_CODE + functions, config))
+    return keys
+
+def run_streaming_tests(args, instrument):
+    """
+    Hypothesis tests only, from moments accumulated over the input in
+    chunks; the input must already be cleaned and scored (the combiner's
+    output is)
+    """
+    path = preferred_input(args.input)
+    filters = {'source': args.source} if args.source else None
+    columns = MOMENT_COLUMNS + ['year_of_study']
+    
+    with instrument.stage('compute_moments', chunksize=args.chunksize) as span:
+        stats = compute_moments(iter_table(path, columns, args.chunksize, filters))
+        span['rows'] = stats.rows
+    print(f"✓ Accumulated moments of {stats.rows} rows from {path} in chunks of {args.chunksize}")
+    
+    if not stats.rows:
+        print("\n⚠ No rows to test")
+        return
+    
+    with instrument.stage('statistical_testing', rows=stats.rows):
+        statistical_testing(None, stats)
+
+def parse_args(argv=None):
+    """
+    Parse command line options
+    """
+    parser = argparse.ArgumentParser(description="Student mental health analysis")
+    parser.add_argument('--input', default=INPUT_FILE,
+                        help="Combined dataset to analyse (.csv, .parquet or .feather)")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'feather'], default='csv',
+                        help="Format of the processed dataset written at the end")
+    parser.add_argument('--impute', choices=['exact', 'sketch'], default='exact',
+                        help="Median imputation: exact, or single-pass quantile sketches")
+    parser.add_argument('--dedup', action='store_true',
+                        help="Drop rows repeating an earlier row's answers (off by default: "
+                             "the surveys have no respondent id, so equal answers may be "
+                             "different students)")
+    parser.add_argument('--stats-only', action='store_true',
+                        help="Only run the hypothesis tests, streaming the (already cleaned) "
+                             "input in chunks so it never has to fit in memory")
+    parser.add_argument('--chunksize', type=int, default=200_000,
+                        help="Rows per chunk for --stats-only")
+    parser.add_argument('--source', default=None,
+                        help="Comma-separated source labels to analyse (the 'source' column "
+                             "of the combined dataset), e.g. 'survey_a.csv'")
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help="Directory recording the keys and outputs of each stage")
+    parser.add_argument('--force', action='store_true',
+                        help="Rebuild every output, even when input and code are unchanged")
+    parser.add_argument('--correlation', choices=['pearson', 'spearman', 'kendall'],
+                        default='pearson',
+                        help="Correlation of the heatmaps: Pearson, or a rank correlation "
+                             "(Spearman, Kendall tau-b) for the ordinal 1-5 scores")
+    parser.add_argument('--density-threshold', type=int, default=DENSITY_THRESHOLD,
+                        help="Rows above which scatter plots are drawn as 2D histograms")
+    parser.add_argument('--render-jobs', type=int, default=default_workers(),
+                        help="Processes drawing the figures in parallel (1 draws them "
+                             "inline, one after another)")
+    add_instrumentation_args(parser)
+    args = parser.parse_args(argv)
+    
+    if args.source:
+        args.source = [label.strip() for label in args.source.split(',') if label.strip()]
+    
+    return args
+
+def main(argv=None):
     """
     Main execution function
     """
+    args = parse_args(argv)
+    
+    instrument = Instrumentation.from_args('mental_health_analysis', args)
+    with instrument.run(argv):
+        run_analysis(args, instrument)
+
+def run_analysis(args, instrument):
+    """
+    Run the analysis stages, each inside an instrumentation span
+    """
+    
     print("\n" + "="*70)
     print("STUDENT MENTAL HEALTH ANALYSIS")
     print("Analyzing Campus Environment, Academic Expectations & Mental Health")
     print("="*70)
     
+    if args.stats_only:
+        run_streaming_tests(args, instrument)
+        return
+    
+    processed_file = with_format(PROCESSED_OUTPUT, args.format)
+    with instrument.stage('output_cache') as span:
+        cache = OutputCache(preferred_input(args.input) if args.input else None, args.cache_dir,
+                            options={'source': args.source, 'impute': args.impute,
+                                     'dedup': args.dedup,
+                                     'density_threshold': args.density_threshold,
+                                     'correlation': args.correlation},
+                            force=args.force)
+        keys = stage_keys(cache, processed_file)
+        run_key = cache.run_key(keys.values())
+        stale = {stage for stage, key in keys.items() if not cache.is_fresh(stage, key)}
+        report = None if stale else cache.report(run_key)
+        span['stale'] = len(stale)
+    
+    if report is not None:
+        print("\n↻ Input and code unchanged; all outputs are up to date (--force rebuilds them)")
+        print("  Report of the last run:")
+        print(report, end='')
+        return
+    
+    if 'save_processed_data' in stale:
+        stale.add('key_findings_summary')  # adds the mh_category column
+    
+    with cache.capture() as printed:
+        completed = run_stages(args, instrument, stale, processed_file)
+    if completed:
+        for stage in stale:
+            cache.record(stage, keys[stage], stage_outputs(stage, processed_file))
+        cache.save(printed.getvalue(), run_key)
+
+def run_stages(args, instrument, stale, processed_file):
+    """
+    Load, clean and score the data and run the analysis stages; cached
+    stages not in stale are skipped. Returns whether the run completed
+    """
+    
     # Load data - Change filepath to your CSV file or leave None for sample data
-    df = load_data('../data/processed/combined_mental_health_data.csv')
+    with instrument.stage('load_data') as span:
+        df = load_data(args.input, filters={'source': args.source} if args.source else None)
+        span['rows'] = len(df)
+    
+    if args.source and not len(df):
+        print(f"\n⚠ No rows for source(s): {', '.join(args.source)}")
+        return False
     
     # Clean the data
-    df = clean_data(df)
+    with instrument.stage('clean_data', rows=len(df)) as span:
+        df = clean_data(df, impute=args.impute,
+                        dedup_keys=DEFAULT_KEY_COLUMNS if args.dedup else None)
+        span['rows_out'] = len(df)
     
     # Create composite scores
-    df = create_composite_scores(df)
+    with instrument.stage('create_composite_scores', rows=len(df)):
+        df = create_composite_scores(df)
     
-    # Print summary statistics
-    print_summary_statistics(df)
-    
-    # Run analyses
-    exploratory_data_analysis(df)
-    correlation_analysis(df)
-    statistical_testing(df)
-    advanced_visualizations(df)
-    key_findings_summary(df)
+    # One pass for every correlation, mean and hypothesis test below
+    with instrument.stage('compute_moments', rows=len(df)):
+        stats = compute_moments(df)
     
-    # Save processed data
-    save_processed_data(df)
+    # Print summary statistics
+    print_summary_statistics(df, stats)
+    
+    # Run analyses; figures are drawn by the render workers while the
+    # following stages run
+    with RenderScheduler(args.render_jobs) as renderer:
+        for stage in [exploratory_data_analysis, correlation_analysis, statistical_testing,
+                      advanced_visualizations, key_findings_summary]:
+            if stage.__name__ in CACHED_STAGES and stage.__name__ not in stale:
+                print(f"\n↻ Up to date: {CACHED_STAGES[stage.__name__][0]}")
+                continue
+            kwargs = {'stats': stats} if stage in MOMENT_STAGES else {}
+            if stage in FIGURE_STAGES:
+                kwargs['renderer'] = renderer
+            if stage is correlation_analysis:
+                kwargs['method'] = args.correlation
+            if stage is advanced_visualizations:
+                kwargs['density_threshold'] = args.density_threshold
+            with instrument.stage(stage.__name__, rows=len(df)):
+                stage(df, **kwargs)
+        
+        # Save processed data
+        if 'save_processed_data' in stale:
+            with instrument.stage('save_processed_data', rows=len(df)):
+                save_processed_data(df, processed_file)
+        else:
+            print(f"\n↻ Up to date: {processed_file}")
+        
+        # The workers' CPU time covers every figure, including those drawn
+        # while the stages above were running
+        with instrument.stage('render_figures', workers=renderer.workers) as span:
+            renderer.wait()
+            span['worker_cpu_s'] = round(renderer.cpu_seconds(), 4)
     
     print("\n" + "="*70)
     print("✅ ANALYSIS COMPLETE!")
@@ -681,7 +1075,7 @@ def main():
     print("   2. 02_correlation_analysis.png")
     print("   3. 03_advanced_visualizations.png")
     print("   4. 04_key_findings_summary.png")
-    print("   5. processed_mental_health_data.csv")
+    print(f"   5. {os.path.basename(processed_file)}")
     
     print("\n🎯 Next Steps:")
     print("   1. Review the generated visualizations")
@@ -696,8 +1090,8 @@ def main():
     print(f"   • Only {seeking_pct:.1f}% are seeking counseling services")
     print(f"   • Service utilization gap: {high_risk_pct - seeking_pct:.1f}%")
     
-    campus_corr = df['campus_environment_score'].corr(df['mental_health_score'])
-    academic_corr = df['academic_expectation_score'].corr(df['mental_health_score'])
+    campus_corr = stats.overall.corr('campus_environment_score', 'mental_health_score')[0]
+    academic_corr = stats.overall.corr('academic_expectation_score', 'mental_health_score')[0]
     print(f"   • Campus Environment correlation: {campus_corr:.3f}")
     print(f"   • Academic Expectations correlation: {academic_corr:.3f}")
     
@@ -705,6 +1099,7 @@ def main():
     print("Thank you for using Student Mental Health Analysis!")
     print("For questions or issues, please check the README.md file")
     print("="*70 + "\n")
+    return True
 
 if __name__ == "__main__":
     main()
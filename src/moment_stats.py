@@ -0,0 +1,326 @@
+"""
+Sufficient Statistics for Student Mental Health Analysis
+One-pass moments behind every correlation, t-test and ANOVA of the analysis
+
+Pearson's r, the pooled two-sample t-test and one-way ANOVA only depend on
+counts, sums, sums of squares and cross-products. Moments accumulates
+those for a set of columns with a few matrix products per chunk:
+
+    n[i, j]  rows where columns i and j are both present
+    s[i, j]  sum of column i over those rows
+    q[i, j]  sum of squares of column i over those rows
+    c[i, j]  sum of products of columns i and j
+
+so missing values are excluded pairwise, as in DataFrame.corr(). Values
+are shifted by the first chunk's column means before accumulating, which
+keeps the sums small and avoids cancellation in var = q/n - (s/n)^2.
+
+SufficientStats keeps one Moments for all rows plus one per group of each
+grouping (a column, or a function of the chunk returning labels), so the
+whole hypothesis-testing section needs one scan of the data, in memory
+or chunk by chunk. Moments of separate chunks or files merge by addition.
+
+The p-value functions import scipy.stats when first called: it is by far
+the slowest import of the analysis, and a run replaying cached outputs
+computes no test at all.
+"""
+
+import numpy as np
+import pandas as pd
+
+class Moments:
+    """
+    Pairwise count, sum, sum-of-squares and cross-product matrices of columns
+    """
+
+    def __init__(self, columns, shift=None):
+        self.columns = list(columns)
+        self.index = {col: i for i, col in enumerate(self.columns)}
+        k = len(self.columns)
+        self.shift = shift
+        self.n = np.zeros((k, k))
+        self.s = np.zeros((k, k))
+        self.q = np.zeros((k, k))
+        self.c = np.zeros((k, k))
+
+    def update(self, values):
+        """
+        Add the rows of a (rows x columns) float array; NaN marks missing
+        """
+
+        if not len(values):
+            return
+        if self.shift is None:
+            with np.errstate(all='ignore'):
+                shift = np.nanmean(values, axis=0)
+            self.shift = np.where(np.isfinite(shift), shift, 0.0)
+
+        present = np.isfinite(values)
+        if present.all():
+            # Complete rows (the usual case after cleaning): every pair
+            # shares all rows, so only the cross-products need a matrix product
+            x = values - self.shift
+            sums, squares = x.sum(axis=0), np.einsum('ij,ij->j', x, x)
+            self.n += len(x)
+            self.s += sums[:, None]
+            self.q += squares[:, None]
+            self.c += x.T @ x
+            return
+
+        x = np.where(present, values - self.shift, 0.0)
+        mask = present.astype(np.float64)
+        self.n += mask.T @ mask
+        self.s += x.T @ mask
+        self.q += (x * x).T @ mask
+        self.c += x.T @ x
+
+    def merge(self, other):
+        """
+        Add the moments of other (same columns and shift)
+        """
+
+        if self.shift is None:
+            self.shift = other.shift
+        elif other.shift is not None and not np.array_equal(self.shift, other.shift):
+            other = other.shifted(self.shift)
+        for name in ('n', 's', 'q', 'c'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    def shifted(self, shift):
+        """
+        The same moments expressed around another shift
+        """
+
+        d = np.asarray(shift) - self.shift
+        result = Moments(self.columns, np.asarray(shift, dtype=float))
+        di, dj = d[:, None], d[None, :]
+        result.n = self.n.copy()
+        result.s = self.s - di * self.n
+        result.q = self.q - 2 * di * self.s + di * di * self.n
+        result.c = self.c - dj * self.s - di * self.s.T + di * dj * self.n
+        return result
+
+    def count(self, col):
+        i = self.index[col]
+        return int(self.n[i, i])
+
+    def mean(self, col):
+        i = self.index[col]
+        n = self.n[i, i]
+        return self.s[i, i] / n + self.shift[i] if n else np.nan
+
+    def var(self, col, ddof=1):
+        i = self.index[col]
+        n = self.n[i, i]
+        if n <= ddof:
+            return np.nan
+        return max(self.q[i, i] - self.s[i, i] ** 2 / n, 0.0) / (n - ddof)
+
+    def corr(self, a, b):
+        """
+        Pearson's r over the rows where both columns are present, and
+        that row count
+        """
+
+        i, j = self.index[a], self.index[b]
+        n = self.n[i, j]
+        if n < 2:
+            return np.nan, int(n)
+        sxy = self.c[i, j] - self.s[i, j] * self.s[j, i] / n
+        sxx = self.q[i, j] - self.s[i, j] ** 2 / n
+        syy = self.q[j, i] - self.s[j, i] ** 2 / n
+        if sxx <= 0 or syy <= 0:
+            return np.nan, int(n)
+        return float(np.clip(sxy / np.sqrt(sxx * syy), -1, 1)), int(n)
+
+    def linear_fit(self, x, y):
+        """
+        Least-squares line of y on x over the rows where both are present,
+        as np.polyfit(x, y, 1): (slope, intercept)
+        """
+
+        i, j = self.index[x], self.index[y]
+        n = self.n[i, j]
+        if n < 2:
+            return np.nan, np.nan
+        sxy = self.c[i, j] - self.s[i, j] * self.s[j, i] / n
+        sxx = self.q[i, j] - self.s[i, j] ** 2 / n
+        if sxx <= 0:
+            return np.nan, np.nan
+        slope = sxy / sxx
+        mean_x = self.s[i, j] / n + self.shift[i]
+        mean_y = self.s[j, i] / n + self.shift[j]
+        return float(slope), float(mean_y - slope * mean_x)
+
+    def corr_matrix(self, columns=None):
+        """
+        Pairwise Pearson correlation matrix, like DataFrame.corr()
+        """
+
+        columns = self.columns if columns is None else list(columns)
+        matrix = np.array([[self.corr(a, b)[0] if a != b else 1.0 for b in columns]
+                           for a in columns])
+        return pd.DataFrame(matrix, index=columns, columns=columns)
+
+    def pearsonr(self, a, b):
+        """
+        Pearson's r and its two-sided p-value (t-distribution with n-2
+        degrees of freedom, as scipy.stats.pearsonr)
+        """
+
+        r, n = self.corr(a, b)
+        if np.isnan(r) or n < 3:
+            return r, np.nan
+        if abs(r) == 1:
+            return r, 0.0
+        from scipy import stats as distributions
+        t = r * np.sqrt((n - 2) / (1 - r * r))
+        return r, float(2 * distributions.t.sf(abs(t), n - 2))
+
+def ttest_ind(first, second, col):
+    """
+    Student's t-test (pooled variance) of col between two groups, as
+    scipy.stats.ttest_ind with its defaults: (t, p)
+    """
+
+    n1, n2 = first.count(col), second.count(col)
+    if n1 < 1 or n2 < 1 or n1 + n2 < 3:
+        return np.nan, np.nan
+    dof = n1 + n2 - 2
+    pooled = ((n1 - 1) * np.nan_to_num(first.var(col)) +
+              (n2 - 1) * np.nan_to_num(second.var(col))) / dof
+    if pooled <= 0:
+        return np.nan, np.nan
+    from scipy import stats as distributions
+    t = (first.mean(col) - second.mean(col)) / np.sqrt(pooled * (1 / n1 + 1 / n2))
+    return float(t), float(2 * distributions.t.sf(abs(t), dof))
+
+def f_oneway(groups, col):
+    """
+    One-way ANOVA of col across groups (Moments), as
+    scipy.stats.f_oneway: (F, p)
+    """
+
+    groups = [group for group in groups if group.count(col) > 0]
+    counts = np.array([group.count(col) for group in groups], dtype=float)
+    total = counts.sum()
+    if len(groups) < 2 or total <= len(groups):
+        return np.nan, np.nan
+    means = np.array([group.mean(col) for group in groups])
+    grand_mean = (counts * means).sum() / total
+    between = (counts * (means - grand_mean) ** 2).sum()
+    within = sum(group.var(col, ddof=0) * group.count(col) for group in groups)
+    df_between, df_within = len(groups) - 1, total - len(groups)
+    if within <= 0:
+        return np.nan, np.nan
+    from scipy import stats as distributions
+    f = (between / df_between) / (within / df_within)
+    return float(f), float(distributions.f.sf(f, df_between, df_within))
+
+def _labels(chunk, key):
+    labels = key(chunk) if callable(key) else chunk[key]
+    codes, uniques = pd.factorize(pd.Series(labels, copy=False), sort=True)
+    return codes, uniques
+
+class SufficientStats:
+    """
+    Moments of columns over all rows and, for group_columns (default: all
+    columns), per group of each grouping
+
+    groupings maps a name to a column or to a function of the chunk that
+    returns one label per row (None/NaN leaves the row out of that
+    grouping), e.g. {'year': 'year_of_study'}. A grouping column missing
+    from the data yields no groups.
+    """
+
+    def __init__(self, columns, groupings=None, group_columns=None):
+        self.columns = list(columns)
+        self.group_columns = self.columns if group_columns is None else list(group_columns)
+        self._group_positions = [self.columns.index(col) for col in self.group_columns]
+        self.groupings = dict(groupings or {})
+        self.overall = Moments(self.columns)
+        self.groups = {name: {} for name in self.groupings}
+        self.rows = 0
+
+    def _values(self, chunk):
+        # Column-major, so each column is copied in one contiguous write
+        values = np.empty((len(chunk), len(self.columns)), order='F')
+        for i, col in enumerate(self.columns):
+            values[:, i] = (chunk[col].to_numpy(dtype='float64', na_value=np.nan)
+                            if col in chunk.columns else np.nan)
+        return values
+
+    def update(self, chunk):
+        """
+        Add one chunk (DataFrame) of rows
+        """
+
+        values = self._values(chunk)
+        self.overall.update(values)
+        self.rows += len(chunk)
+        if not self.groupings:
+            return self
+
+        group_values = values[:, self._group_positions]
+        shift = self.overall.shift[self._group_positions]
+
+        for name, key in self.groupings.items():
+            if not callable(key) and key not in chunk.columns:
+                continue
+            codes, uniques = _labels(chunk, key)
+            if len(uniques) < np.iinfo(np.int16).max:
+                codes = codes.astype(np.int16)  # numpy radix-sorts 16-bit keys
+            # One stable sort groups the rows of every label contiguously
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            grouped = group_values[order[bounds[0]:]]
+            bounds -= bounds[0]
+            for code, label in enumerate(uniques):
+                start, end = bounds[code], bounds[code + 1]
+                if start == end:
+                    continue
+                moments = self.groups[name].get(label)
+                if moments is None:
+                    moments = self.groups[name][label] = Moments(self.group_columns, shift)
+                moments.update(grouped[start:end])
+        return self
+
+    @classmethod
+    def from_frame(cls, df, columns, groupings=None, group_columns=None, chunksize=200_000):
+        """
+        Accumulate the moments of an in-memory frame, chunksize rows at a time
+        """
+
+        return cls.from_chunks((df.iloc[start:start + chunksize]
+                                for start in range(0, max(len(df), 1), chunksize)),
+                               columns, groupings, group_columns)
+
+    @classmethod
+    def from_chunks(cls, chunks, columns, groupings=None, group_columns=None):
+        """
+        Accumulate the moments of a stream of frames in one pass
+        """
+
+        result = cls(columns, groupings, group_columns)
+        for chunk in chunks:
+            result.update(chunk)
+        return result
+
+    def group(self, name, label):
+        """
+        Moments of one group (empty when no row had that label)
+        """
+
+        moments = self.groups[name].get(label)
+        if moments is None:
+            moments = Moments(self.group_columns, self.overall.shift[self._group_positions]
+                              if self.overall.shift is not None else None)
+        return moments
+
+    def ordered_groups(self, name):
+        """
+        (label, Moments) of a grouping in label order
+        """
+
+        return sorted(self.groups[name].items(), key=lambda item: item[0])
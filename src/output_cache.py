@@ -0,0 +1,193 @@
+"""
+Output Cache for the Analysis
+Skips analysis stages whose outputs are already up to date
+
+Every stage with file outputs (the four figures and the processed
+dataset) is keyed on:
+
+- the content hash of the input (every file of a partitioned dataset;
+  hashes are reused while size and mtime are unchanged, as in
+  combiner_cache)
+- the run options that shape the outputs
+- the code version of the stage: the source of its functions plus the
+  configuration and library versions they depend on
+
+The manifest records each stage's key and the size and mtime of the files
+it wrote. A stage is up to date when its key matches and its files are
+still the ones it wrote. The printed report of the last run is kept too,
+so a run that finds every stage up to date replays it without loading
+the data.
+"""
+
+import hashlib
+import inspect
+import io
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+import combiner_cache
+
+CACHE_DIR = '../data/processed/.analysis_cache'
+MANIFEST_NAME = 'manifest.json'
+REPORT_NAME = 'report.txt'
+
+# Bump whenever the manifest layout or the keying changes
+CACHE_VERSION = 1
+
+def _digest(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str)
+                          .encode('utf-8')).hexdigest()
+
+def input_fingerprint(path, previous=None):
+    """
+    Content hash of an input file or partitioned directory, plus the
+    per-file entries that let the next run skip re-reading unchanged files
+    """
+
+    previous = (previous or {}).get('files', {})
+    if os.path.isdir(path):
+        names = []
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            names.extend(os.path.relpath(os.path.join(root, name), path)
+                         for name in sorted(files) if not name.startswith('.'))
+    else:
+        names = ['']
+
+    files = {name: combiner_cache.fingerprint(os.path.join(path, name) if name else path,
+                                              previous.get(name))
+             for name in names}
+    return {'path': os.path.abspath(path), 'files': files,
+            'sha256': _digest(sorted((name, entry['sha256']) for name, entry in files.items()))}
+
+def code_version(objects, config=None):
+    """
+    Hash of the source of functions or modules plus a configuration
+    """
+
+    sources = [inspect.getsource(obj) for obj in objects]
+    return _digest([sources, config])
+
+def _atomic_write_text(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _output_state(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+class _Tee(io.TextIOBase):
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = io.StringIO()
+
+    def write(self, text):
+        self.buffer.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+class OutputCache:
+    """
+    Stage keys and recorded outputs of the analysis, persisted in cache_dir
+    """
+
+    def __init__(self, path, cache_dir=CACHE_DIR, options=None, force=False):
+        """
+        Cache keyed on the content of path; a missing path (sample data)
+        is keyed on the options alone
+        """
+
+        self.cache_dir = cache_dir
+        self.options = options
+        self.force = force
+        self.manifest = self._load()
+
+        if path and os.path.exists(path):
+            self.manifest['input'] = input_fingerprint(path, self.manifest.get('input'))
+            self.input_key = self.manifest['input']['sha256']
+        else:
+            self.manifest['input'] = None
+            self.input_key = 'sample'
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.cache_dir, MANIFEST_NAME), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            manifest = {}
+        if manifest.get('version') != CACHE_VERSION:
+            manifest = {'version': CACHE_VERSION, 'input': None, 'stages': {}, 'report': None}
+        return manifest
+
+    def stage_key(self, code):
+        return _digest([self.input_key, self.options, code])
+
+    def is_fresh(self, stage, key):
+        """
+        Whether stage last ran with key and its outputs are untouched since
+        """
+
+        entry = self.manifest['stages'].get(stage)
+        if self.force or not entry or entry['key'] != key:
+            return False
+        return all(_output_state(path) == state for path, state in entry['outputs'].items())
+
+    def record(self, stage, key, outputs):
+        """
+        Remember the files a stage wrote under its key
+        """
+
+        self.manifest['stages'][stage] = {
+            'key': key,
+            'outputs': {path: _output_state(path) for path in outputs},
+        }
+
+    def run_key(self, keys):
+        return _digest(sorted(keys))
+
+    def report(self, run_key):
+        """
+        Printed report of the last run if it had run_key, or None
+        """
+
+        if self.force or self.manifest.get('report') != run_key:
+            return None
+        try:
+            with open(os.path.join(self.cache_dir, REPORT_NAME), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def capture(self):
+        """
+        Copy everything printed in the block; yields the buffer
+        """
+
+        tee = _Tee(sys.stdout)
+        sys.stdout = tee
+        try:
+            yield tee.buffer
+        finally:
+            sys.stdout = tee.stream
+
+    def save(self, report=None, run_key=None):
+        """
+        Write the manifest (and the printed report of the run)
+        """
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if report is not None:
+            _atomic_write_text(os.path.join(self.cache_dir, REPORT_NAME), report)
+            self.manifest['report'] = run_key
+        _atomic_write_text(os.path.join(self.cache_dir, MANIFEST_NAME),
+                           json.dumps(self.manifest, indent=2, sort_keys=True))
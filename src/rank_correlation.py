@@ -0,0 +1,214 @@
+"""
+Rank Correlations for Student Mental Health Analysis
+Spearman's rho and Kendall's tau-b of ordinal (1-5) survey items
+
+Pearson's r treats Likert answers as interval data; rank correlations
+only assume an order. Both are computed from each column's sorted distinct
+values (pd.factorize, a hash pass plus a sort of the few levels):
+
+- Spearman's rho is Pearson's r of the tied (average) ranks. For complete
+  columns the ranks of all columns are correlated in one Moments pass;
+  pairs with missing values use the pair's contingency table, so ranks
+  are taken over the rows where both are present (as DataFrame.corr).
+- Kendall's tau-b comes from the contingency table of the two columns'
+  levels: concordant and discordant pairs are sums of 2D cumulative sums,
+  O(k^2) for k levels instead of O(n^2) (DataFrame.corr('kendall')).
+  Columns with too many levels for a table fall back to
+  scipy.stats.kendalltau, which is O(n log n).
+
+p-values follow scipy.stats.spearmanr and the asymptotic (tied data)
+branch of scipy.stats.kendalltau; scipy.stats itself is only imported
+once a p-value or the fallback is needed, as in moment_stats.
+"""
+
+import numpy as np
+import pandas as pd
+
+from moment_stats import Moments
+
+# Largest contingency table (levels of x times levels of y) built per pair
+MAX_TABLE_CELLS = 1 << 16
+
+def _tie_sums(counts):
+    # Tie statistics of one margin, as scipy.stats.kendalltau's count_rank_tie
+    t = counts.astype(np.float64)
+    return ((t * (t - 1) / 2).sum(), (t * (t - 1) * (t - 2)).sum(),
+            (t * (t - 1) * (2 * t + 5)).sum())
+
+def _level_ranks(counts):
+    # Average (tied) rank of each level, 1-based
+    return np.cumsum(counts) - (counts - 1) / 2
+
+def table_spearman(table):
+    """
+    Spearman's rho of a contingency table (rows: levels of x in order,
+    columns: levels of y): (rho, n)
+    """
+
+    n = table.sum()
+    if n < 2:
+        return np.nan, int(n)
+    rows, cols = table.sum(axis=1), table.sum(axis=0)
+    dx = _level_ranks(rows) - (n + 1) / 2
+    dy = _level_ranks(cols) - (n + 1) / 2
+    sxx, syy = (rows * dx * dx).sum(), (cols * dy * dy).sum()
+    if sxx <= 0 or syy <= 0:
+        return np.nan, int(n)
+    return float(np.clip(dx @ table @ dy / np.sqrt(sxx * syy), -1, 1)), int(n)
+
+def table_kendall(table):
+    """
+    Kendall's tau-b of a contingency table and its asymptotic p-value:
+    (tau, p, n)
+    """
+
+    table = table.astype(np.int64)
+    n = int(table.sum())
+    if n < 2:
+        return np.nan, np.nan, n
+
+    # at_or_above[i, j]: rows with x level >= i and y level >= j;
+    # at_or_below[i, j]: x level >= i and y level <= j
+    at_or_above = table[::-1, ::-1].cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]
+    at_or_below = table[::-1, :].cumsum(axis=0)[::-1, :].cumsum(axis=1)
+    concordant = (table[:-1, :-1] * at_or_above[1:, 1:]).sum(dtype=np.float64)
+    discordant = (table[:-1, 1:] * at_or_below[1:, :-1]).sum(dtype=np.float64)
+
+    total = n * (n - 1) / 2
+    x_tie, x0, x1 = _tie_sums(table.sum(axis=1))
+    y_tie, y0, y1 = _tie_sums(table.sum(axis=0))
+    if x_tie == total or y_tie == total:
+        return np.nan, np.nan, n
+
+    s = concordant - discordant
+    tau = float(np.clip(s / np.sqrt(total - x_tie) / np.sqrt(total - y_tie), -1, 1))
+
+    from scipy import stats as distributions
+    m = n * (n - 1.0)
+    var = ((m * (2 * n + 5) - x1 - y1) / 18 + 2 * x_tie * y_tie / m +
+           (x0 * y0 / (9 * m * (n - 2)) if n > 2 else 0.0))
+    p = float(2 * distributions.norm.sf(abs(s) / np.sqrt(var))) if var > 0 else np.nan
+    return tau, p, n
+
+def spearman_p(rho, n):
+    """
+    Two-sided p-value of Spearman's rho (t-distribution with n-2 degrees
+    of freedom, as scipy.stats.spearmanr)
+    """
+
+    if np.isnan(rho) or n < 3:
+        return np.nan
+    if abs(rho) == 1:
+        return 0.0
+    from scipy import stats as distributions
+    t = rho * np.sqrt((n - 2) / (1 - rho * rho))
+    return float(2 * distributions.t.sf(abs(t), n - 2))
+
+class RankCorrelation:
+    """
+    Spearman and Kendall tau-b correlations between columns of a frame
+    """
+
+    def __init__(self, df, columns):
+        self.columns = list(columns)
+        self.codes, self.levels = {}, {}
+        for col in self.columns:
+            # Codes follow the sorted distinct values; missing values (and
+            # columns missing from df) get -1
+            if col in df.columns:
+                codes, levels = pd.factorize(df[col].to_numpy(dtype='float64', na_value=np.nan),
+                                             sort=True)
+            else:
+                codes, levels = np.full(len(df), -1, dtype=np.intp), np.empty(0)
+            self.codes[col], self.levels[col] = codes, levels
+        self.complete = {col: bool((codes >= 0).all()) for col, codes in self.codes.items()}
+        self._spearman = None
+
+    def ranks(self, col):
+        """
+        Tied (average) ranks of a complete column
+        """
+
+        codes = self.codes[col]
+        return _level_ranks(np.bincount(codes, minlength=len(self.levels[col])))[codes]
+
+    def _pair(self, a, b):
+        x, y = self.codes[a], self.codes[b]
+        if not (self.complete[a] and self.complete[b]):
+            both = (x >= 0) & (y >= 0)
+            x, y = x[both], y[both]
+        return x, y
+
+    def table(self, a, b):
+        """
+        Contingency table of the levels of a (rows) and b (columns) over
+        the rows where both are present
+        """
+
+        x, y = self._pair(a, b)
+        ka, kb = len(self.levels[a]), len(self.levels[b])
+        return np.bincount(x.astype(np.int64) * kb + y, minlength=ka * kb).reshape(ka, kb)
+
+    def _fits_table(self, a, b):
+        return len(self.levels[a]) * len(self.levels[b]) <= MAX_TABLE_CELLS
+
+    def spearman(self, a, b):
+        """
+        Spearman's rho over the rows where both columns are present, and
+        that row count
+        """
+
+        if self.complete[a] and self.complete[b]:
+            if self._spearman is None:
+                complete = [col for col in self.columns if self.complete[col]]
+                self._spearman = Moments(complete)
+                self._spearman.update(np.column_stack([self.ranks(col) for col in complete]))
+            return self._spearman.corr(a, b)
+        if self._fits_table(a, b):
+            return table_spearman(self.table(a, b))
+        x, y = self._pair(a, b)
+        ranks = [_level_ranks(np.bincount(codes))[codes] for codes in
+                 (pd.factorize(x, sort=True)[0], pd.factorize(y, sort=True)[0])]
+        moments = Moments(['x', 'y'])
+        moments.update(np.column_stack(ranks).astype(np.float64))
+        return moments.corr('x', 'y')
+
+    def spearmanr(self, a, b):
+        """
+        Spearman's rho and its two-sided p-value
+        """
+
+        rho, n = self.spearman(a, b)
+        return rho, spearman_p(rho, n)
+
+    def kendalltau(self, a, b):
+        """
+        Kendall's tau-b and its two-sided (asymptotic) p-value
+        """
+
+        if self._fits_table(a, b):
+            tau, p, _ = table_kendall(self.table(a, b))
+            return tau, p
+        from scipy import stats as distributions
+        x, y = self._pair(a, b)
+        result = distributions.kendalltau(x, y)
+        return float(result.statistic), float(result.pvalue)
+
+    def corr(self, a, b, method='spearman'):
+        if method == 'spearman':
+            return self.spearman(a, b)[0]
+        if method == 'kendall':
+            return self.kendalltau(a, b)[0]
+        raise ValueError(f"Unknown rank correlation method: {method}")
+
+    def corr_matrix(self, columns=None, method='spearman'):
+        """
+        Pairwise rank correlation matrix, like DataFrame.corr(method)
+        """
+
+        columns = self.columns if columns is None else list(columns)
+        matrix = np.eye(len(columns))
+        for i, a in enumerate(columns):
+            for j in range(i + 1, len(columns)):
+                matrix[i, j] = matrix[j, i] = self.corr(a, columns[j], method)
+        return pd.DataFrame(matrix, index=columns, columns=columns)
@@ -0,0 +1,539 @@
+"""
+Raw Source Discovery for Student Mental Health Analysis
+Finds survey exports and sniffs their format without parsing them
+
+Only the first SNIFF_BYTES of each file are read: enough to detect the
+encoding, the delimiter, the header row (exports often start with a few
+preamble lines) and to estimate the row count from the average line
+length. Since the rest of a file is never checked, files sniffed as UTF-8
+are read with a decoding fallback: a byte sequence further down that is
+not valid UTF-8 (e.g. an accented name saved by Excel as cp1252) decodes
+as cp1252 instead of failing the read partway through. Files are sniffed
+concurrently in a thread pool since the work is I/O bound; full parsing
+is left to read_source when the pipeline actually needs the rows.
+
+Compressed exports (.gz, .bz2, .xz, .zst) and the CSV members of .zip
+bundles are read as decompressing streams, so chunked reads never
+inflate a whole file to disk or memory.
+
+Excel workbooks (.xlsx, .xlsm) yield one source per sheet whose name
+matches the sheet patterns. Sheets are opened with openpyxl in read-only
+mode, which parses the sheet XML as a stream: sniffing reads the first
+SNIFF_ROWS rows, and read_source builds DataFrames of chunksize rows at a
+time instead of loading the whole workbook as pd.read_excel does.
+"""
+
+import bz2
+import codecs
+import csv
+import fnmatch
+import glob
+import gzip
+import lzma
+import os
+import struct
+import zipfile
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from xml.etree import ElementTree
+
+import pandas as pd
+
+RAW_DIR = '../data/raw'
+SNIFF_BYTES = 64 * 1024
+RAW_EXTENSIONS = ('.csv', '.tsv')
+COMPRESSIONS = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz', '.zst': 'zstd'}
+ARCHIVE_EXTENSIONS = ('.zip',)
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xlsm')
+SNIFF_ROWS = 200
+WORKBOOK_CHUNKSIZE = 50_000
+DELIMITERS = ',;\t|'
+ENCODINGS = ['utf-8', 'cp1252', 'latin-1']
+
+# Outputs of this project that may sit next to the raw exports
+OUTPUT_PREFIXES = ('combined_', 'processed_')
+
+# Decoding error handler of files sniffed as UTF-8 (see _cp1252_fallback)
+UTF8_FALLBACK = 'utf8-cp1252-fallback'
+
+def _cp1252_fallback(error):
+    # Decode the invalid bytes as cp1252; its five undefined bytes map to
+    # the same code point, as in latin-1
+    invalid = error.object[error.start:error.end]
+    text = ''.join(bytes([byte]).decode('cp1252', errors='ignore') or chr(byte)
+                   for byte in invalid)
+    return text, error.end
+
+codecs.register_error(UTF8_FALLBACK, _cp1252_fallback)
+
+def compression_of(path):
+    """
+    Compression of a file from its extension (None for plain files)
+    """
+
+    return COMPRESSIONS.get(os.path.splitext(path)[1].lower())
+
+def is_raw_file(path, extensions=RAW_EXTENSIONS):
+    """
+    Whether path is a raw export, possibly compressed (e.g. .csv.gz)
+    """
+
+    name = os.path.basename(path).lower()
+    if compression_of(name):
+        name = os.path.splitext(name)[0]
+    return name.endswith(extensions)
+
+def is_workbook(path):
+    """
+    Whether path is an Excel workbook read sheet by sheet
+    """
+
+    return path.lower().endswith(WORKBOOK_EXTENSIONS)
+
+def discover_files(root='.', recursive=False, extensions=RAW_EXTENSIONS):
+    """
+    Raw export files, .zip bundles and Excel workbooks under root (sorted),
+    skipping the project's own outputs and Excel lock files (~$*)
+    """
+
+    pattern = os.path.join(root, '**', '*') if recursive else os.path.join(root, '*')
+    paths = [
+        path for path in glob.glob(pattern, recursive=recursive)
+        if os.path.isfile(path)
+        and (is_raw_file(path, extensions) or is_workbook(path)
+             or path.lower().endswith(ARCHIVE_EXTENSIONS))
+        and not os.path.basename(path).startswith(OUTPUT_PREFIXES + ('~$',))
+    ]
+    return sorted(os.path.normpath(path) for path in paths)
+
+def archive_members(path, extensions=RAW_EXTENSIONS):
+    """
+    Raw export members of a .zip bundle, in archive order
+    """
+
+    with zipfile.ZipFile(path) as archive:
+        return [
+            info.filename for info in archive.infolist()
+            if not info.is_dir()
+            and not info.filename.startswith('__MACOSX/')
+            and info.filename.lower().endswith(extensions)
+        ]
+
+def _open_workbook(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("Reading Excel workbooks requires the 'openpyxl' package") from None
+
+    return load_workbook(path, read_only=True, data_only=True)
+
+def workbook_sheets(path, patterns=None):
+    """
+    Names of the sheets matching any of the shell-style patterns
+    (case-insensitive; all sheets when patterns is empty), in workbook order
+
+    The names are read from xl/workbook.xml directly: opening the workbook
+    with openpyxl would scan every sheet for its dimensions.
+    """
+
+    try:
+        with zipfile.ZipFile(path) as archive:
+            root = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        names = [element.get('name') for element in root.iter()
+                 if element.tag.rsplit('}', 1)[-1] == 'sheet']
+    except KeyError:
+        workbook = _open_workbook(path)
+        try:
+            names = workbook.sheetnames
+        finally:
+            workbook.close()
+    if not patterns:
+        return names
+    return [name for name in names
+            if any(fnmatch.fnmatch(name.lower(), pattern.lower()) for pattern in patterns)]
+
+def expand_sources(paths, sheets=None):
+    """
+    One {'path', 'member', 'sheet'} entry per plain/compressed file, per
+    raw member of each .zip bundle and per matching sheet of each workbook
+    """
+
+    entries = []
+    for path in paths:
+        if path.lower().endswith(ARCHIVE_EXTENSIONS):
+            entries.extend({'path': path, 'member': member, 'sheet': None}
+                           for member in archive_members(path))
+        elif is_workbook(path):
+            entries.extend({'path': path, 'member': None, 'sheet': sheet}
+                           for sheet in workbook_sheets(path, sheets))
+        else:
+            entries.append({'path': path, 'member': None, 'sheet': None})
+    return entries
+
+def _open_zstd(path):
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Reading .zst files requires the 'zstandard' package") from None
+
+    raw = open(path, 'rb')
+    return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+
+def open_binary(path, member=None):
+    """
+    Decompressing binary stream over a file or a .zip member
+    """
+
+    if member is not None:
+        # The member stream keeps the archive's file open until it is closed
+        with zipfile.ZipFile(path) as archive:
+            return archive.open(member)
+
+    compression = compression_of(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'bz2':
+        return bz2.open(path, 'rb')
+    if compression == 'xz':
+        return lzma.open(path, 'rb')
+    if compression == 'zstd':
+        return _open_zstd(path)
+    return open(path, 'rb')
+
+def uncompressed_size(path, member=None):
+    """
+    Decompressed size when the container records it cheaply (zip directory,
+    gzip ISIZE trailer, zstd frame header), else None
+    """
+
+    if member is not None:
+        with zipfile.ZipFile(path) as archive:
+            return archive.getinfo(member).file_size
+
+    compression = compression_of(path)
+    if compression is None:
+        return os.path.getsize(path)
+
+    if compression == 'gzip':
+        # ISIZE is the input size mod 2^32 of the last gzip member
+        with open(path, 'rb') as f:
+            f.seek(-4, os.SEEK_END)
+            return struct.unpack('<I', f.read(4))[0]
+
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            return None
+        with open(path, 'rb') as f:
+            size = zstandard.frame_content_size(f.read(18))
+        return size if size >= 0 else None
+
+    return None
+
+def _detect_encoding(sample, complete=True):
+    if sample.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    if sample.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'utf-16'
+
+    # A truncated sample may end in the middle of a multi-byte character
+    body = sample if complete else sample[:-3]
+    for encoding in ENCODINGS:
+        try:
+            body.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+def _detect_delimiter(lines):
+    try:
+        return csv.Sniffer().sniff('\n'.join(lines[:50]), delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        counts = {sep: sum(line.count(sep) for line in lines[:50]) for sep in DELIMITERS}
+        return max(counts, key=counts.get) if any(counts.values()) else ','
+
+def _detect_header_row(lines, delimiter):
+    """
+    Index of the first line with the typical field count of the sample;
+    lines before it are treated as preamble
+    """
+
+    widths = [len(next(csv.reader([line], delimiter=delimiter), [])) for line in lines]
+    if not widths:
+        return 0, []
+    typical = Counter(width for width in widths if width > 1).most_common(1)
+    typical = typical[0][0] if typical else widths[0]
+    for index, width in enumerate(widths):
+        if width == typical:
+            return index, next(csv.reader([lines[index]], delimiter=delimiter))
+    return 0, next(csv.reader([lines[0]], delimiter=delimiter), [])
+
+def sniff_file(path, member=None, sample_bytes=SNIFF_BYTES):
+    """
+    Format of one raw file (or .zip member) from its first sample_bytes of
+    decompressed content:
+    {'path', 'member', 'sheet', 'compression', 'encoding', 'delimiter', 'header_row',
+     'columns', 'estimated_rows', 'exact_rows', 'size'}
+
+    estimated_rows is None when a compressed file does not record its
+    decompressed size (bz2, xz)
+    """
+
+    size = uncompressed_size(path, member)
+    with open_binary(path, member) as f:
+        # One extra byte tells whether the sample holds the whole file
+        sample = f.read(sample_bytes + 1)
+
+    complete = len(sample) <= sample_bytes
+    sample = sample[:sample_bytes]
+    encoding = _detect_encoding(sample, complete)
+    text = sample.decode(encoding, errors='ignore')
+    lines = text.splitlines()
+    if not complete and lines:
+        lines = lines[:-1]
+
+    delimiter = _detect_delimiter(lines)
+    header_row, columns = _detect_header_row(lines, delimiter)
+    data_lines = [line for line in lines[header_row + 1:] if line.strip()]
+
+    if complete:
+        estimated_rows = len(data_lines)
+    elif data_lines and size:
+        header_bytes = len('\n'.join(lines[:header_row + 1]).encode(encoding, errors='ignore')) + 1
+        line_bytes = len('\n'.join(data_lines).encode(encoding, errors='ignore')) / len(data_lines)
+        estimated_rows = int((size - header_bytes) / max(line_bytes, 1))
+    else:
+        estimated_rows = None if size is None else 0
+
+    return {
+        'path': path,
+        'member': member,
+        'sheet': None,
+        'compression': 'zip' if member is not None else compression_of(path),
+        'encoding': encoding,
+        'delimiter': delimiter,
+        'header_row': header_row,
+        'columns': [col.strip() for col in columns],
+        'estimated_rows': estimated_rows,
+        'exact_rows': complete,
+        'size': size,
+    }
+
+def _header_name(value, index):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return f"Unnamed: {index}"
+    return str(value).strip()
+
+def sniff_sheets(path, sheets, sample_rows=SNIFF_ROWS):
+    """
+    Layout of workbook sheets from their first sample_rows rows, in the
+    same shape as sniff_file (encoding and delimiter are None); the
+    workbook is opened once for all of them
+    """
+
+    workbook = _open_workbook(path)
+    try:
+        results = []
+        for sheet in sheets:
+            worksheet = workbook[sheet]
+            # max_row comes from the sheet's <dimension> tag, when the writer set it
+            rows = list(islice(worksheet.iter_rows(min_row=1, values_only=True), sample_rows + 1))
+            results.append(_sheet_layout(path, sheet, rows, worksheet.max_row, sample_rows))
+        return results
+    finally:
+        workbook.close()
+
+def _sheet_layout(path, sheet, rows, max_row, sample_rows):
+    """
+    Header row (the first row as wide as the typical row; title rows
+    above it are preamble), columns and estimated row count of a sheet
+    """
+
+    complete = len(rows) <= sample_rows
+    rows = rows[:sample_rows]
+    widths = [sum(value is not None for value in row) for row in rows]
+    typical = Counter(width for width in widths if width > 1).most_common(1)
+    typical = typical[0][0] if typical else max(widths, default=0)
+    header_row = next((index for index, width in enumerate(widths) if width >= typical), 0)
+
+    header = list(rows[header_row]) if rows else []
+    while header and header[-1] is None:
+        header.pop()
+    data_rows = sum(1 for row in rows[header_row + 1:] if any(value is not None for value in row))
+
+    if complete:
+        estimated_rows = data_rows
+    elif max_row:
+        estimated_rows = max_row - header_row - 1
+    else:
+        estimated_rows = None
+
+    return {
+        'path': path,
+        'member': None,
+        'sheet': sheet,
+        'compression': None,
+        'encoding': None,
+        'delimiter': None,
+        'header_row': header_row,
+        'columns': [_header_name(value, index) for index, value in enumerate(header)],
+        'estimated_rows': estimated_rows,
+        'exact_rows': complete,
+        'size': os.path.getsize(path),
+    }
+
+def sniff_files(paths, max_workers=16, sheets=None):
+    """
+    Sniff many files concurrently, one result per file, .zip member or
+    workbook sheet matching sheets (see workbook_sheets) in the order of
+    paths; a file that cannot be read yields {'path', 'member', 'sheet',
+    'error'} instead
+    """
+
+    entries = []
+    for path in paths:
+        try:
+            entries.extend(expand_sources([path], sheets))
+        except (OSError, zipfile.BadZipFile) as e:
+            entries.append({'path': path, 'member': None, 'sheet': None, 'error': str(e)})
+
+    # Sheets are sniffed per workbook, which is parsed once for all of them
+    tasks = []
+    workbooks = defaultdict(list)
+    for entry in entries:
+        if entry.get('sheet') is None or 'error' in entry:
+            tasks.append([entry])
+        else:
+            if entry['path'] not in workbooks:
+                tasks.append(workbooks[entry['path']])
+            workbooks[entry['path']].append(entry)
+
+    def sniff(group):
+        first = group[0]
+        if 'error' in first:
+            return group
+        try:
+            if first['sheet'] is not None:
+                return sniff_sheets(first['path'], [entry['sheet'] for entry in group])
+            return [sniff_file(first['path'], first['member'])]
+        except Exception as e:
+            return [{**entry, 'error': str(e)} for entry in group]
+
+    if len(tasks) <= 1:
+        groups = [sniff(group) for group in tasks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+            groups = list(executor.map(sniff, tasks))
+    return [result for group in groups for result in group]
+
+def source_path(source):
+    """
+    File path of a source given as a path or a sniffed source dict
+    """
+
+    return source['path'] if isinstance(source, dict) else source
+
+def source_label(source, root=None):
+    """
+    Display name of a source: its path (relative to root, when given),
+    plus the member for .zip bundles or the sheet for workbooks
+    """
+
+    path = source_path(source)
+    if root is not None:
+        path = os.path.relpath(path, root)
+    if isinstance(source, dict) and source.get('member'):
+        return f"{path}:{source['member']}"
+    if isinstance(source, dict) and source.get('sheet'):
+        return f"{path}[{source['sheet']}]"
+    return path
+
+def _encoding_errors(source):
+    """
+    Decoding error handling for a sniffed source: only the first
+    SNIFF_BYTES were checked, so UTF-8 falls back to cp1252 for invalid bytes
+    """
+
+    return UTF8_FALLBACK if source['encoding'] in ('utf-8', 'utf-8-sig') else 'strict'
+
+def _read_member(source, kwargs):
+    chunked = kwargs.get('chunksize') is not None or kwargs.get('iterator')
+    stream = open_binary(source['path'], source['member'])
+    try:
+        reader = pd.read_csv(stream, sep=source['delimiter'], encoding=source['encoding'],
+                             encoding_errors=_encoding_errors(source),
+                             skiprows=source['header_row'], **kwargs)
+    except Exception:
+        stream.close()
+        raise
+
+    if not chunked:
+        stream.close()
+        return reader
+
+    def chunks():
+        with stream, reader:
+            yield from reader
+    return chunks()
+
+def _sheet_frames(source, chunksize, nrows):
+    """
+    DataFrames of up to chunksize rows streamed from a workbook sheet;
+    blank rows are skipped and cells beyond the header are ignored
+    """
+
+    columns = source['columns']
+    workbook = _open_workbook(source['path'])
+    try:
+        rows = workbook[source['sheet']].iter_rows(min_row=source['header_row'] + 2,
+                                                   max_col=len(columns), values_only=True)
+        rows = (row for row in rows if any(value is not None for value in row))
+        if nrows is not None:
+            rows = islice(rows, nrows)
+
+        while True:
+            block = list(islice(rows, chunksize))
+            if not block:
+                break
+            yield pd.DataFrame.from_records(block, columns=columns, coerce_float=True)
+    finally:
+        workbook.close()
+
+def _read_sheet(source, chunksize=None, nrows=None, iterator=False, **kwargs):
+    if kwargs:
+        raise TypeError(f"Unsupported options for workbook sheets: {', '.join(kwargs)}")
+
+    frames = _sheet_frames(source, chunksize or WORKBOOK_CHUNKSIZE, nrows)
+    if chunksize is not None or iterator:
+        return frames
+
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame(columns=source['columns'])
+    return pd.concat(frames, ignore_index=True)
+
+def read_source(source, **kwargs):
+    """
+    pd.read_csv with the sniffed encoding, delimiter and header row;
+    extra keyword arguments (chunksize, nrows, ...) are passed through
+
+    Compressed files and .zip members are decompressed as a stream while
+    pandas parses them, chunk by chunk when chunksize is given. Workbook
+    sheets are streamed the same way (only chunksize and nrows apply).
+    """
+
+    if not isinstance(source, dict):
+        return pd.read_csv(source, **kwargs)
+
+    if source.get('sheet') is not None:
+        return _read_sheet(source, **kwargs)
+
+    if source.get('member') is not None:
+        return _read_member(source, kwargs)
+
+    return pd.read_csv(source['path'], sep=source['delimiter'], encoding=source['encoding'],
+                       encoding_errors=_encoding_errors(source), skiprows=source['header_row'],
+                       compression=source.get('compression'), **kwargs)
@@ -0,0 +1,116 @@
+"""
+Render Scheduler for the Analysis Figures
+Draws the report figures off-screen, several at a time
+
+Each figure stage of the analysis reduces the data to what its plots need
+(bin counts, group means, correlation matrices, box-plot statistics) and
+submits that, together with a module-level render function, to a
+RenderScheduler. With more than one worker the figures are drawn and
+written by a pool of processes on matplotlib's Agg backend, so the parent
+keeps computing the next stage while the PNGs are encoded, and only the
+small aggregates are pickled to the workers, never the rows. With one
+worker (or when process pools are unavailable) figures are drawn inline,
+in submission order, exactly as before.
+
+Pool workers outlive the figures they draw, so their CPU time is not in
+the parent's RUSAGE_CHILDREN until the pool shuts down. Every task returns
+its worker's cumulative CPU time instead, and cpu_seconds() sums the last
+value seen from each worker (start-up and imports included).
+"""
+
+import os
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+def default_workers():
+    """
+    Worker processes used when none are requested: one per figure, up to
+    the number of CPUs
+    """
+
+    return max(1, min(4, os.cpu_count() or 1))
+
+def _init_worker():
+    # Workers never open a window; Agg also avoids a display dependency
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+def _render_task(render, data, path):
+    render(data, path)
+    return os.getpid(), time.process_time()
+
+class RenderScheduler:
+    """
+    Runs render(data, path) calls inline or in a process pool
+    """
+
+    def __init__(self, workers=1):
+        self.workers = max(1, int(workers or 1))
+        self.pending = []
+        self.executor = None
+        self.worker_cpu = {}
+        if self.workers > 1:
+            try:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker)
+            except (OSError, NotImplementedError) as e:
+                print(f"⚠ Rendering figures inline ({e})")
+                self.workers = 1
+
+    def submit(self, render, data, path):
+        """
+        Draw one figure into path; render must be a module-level function
+        so that it can be sent to a worker
+        """
+
+        if self.executor is None:
+            render(data, path)
+            print(f"✓ Saved: {os.path.basename(path)}")
+            return
+        future = self.executor.submit(_render_task, render, data, path)
+        future.add_done_callback(lambda done: done.exception() is None and
+                                 print(f"✓ Saved: {os.path.basename(path)}"))
+        self.pending.append(future)
+
+    def wait(self):
+        """
+        Block until every submitted figure is written; re-raises the first
+        rendering error
+        """
+
+        pending, self.pending = self.pending, []
+        for future in pending:
+            pid, cpu = future.result()
+            self.worker_cpu[pid] = max(cpu, self.worker_cpu.get(pid, 0.0))
+
+    def cpu_seconds(self):
+        """
+        CPU time used so far by the pool workers whose figures were waited
+        for (0 when rendering inline, where the parent's own CPU time
+        already covers it)
+        """
+
+        return sum(self.worker_cpu.values())
+
+    def close(self, cancel=False):
+        if self.executor is not None:
+            if cancel:
+                for future in self.pending:
+                    future.cancel()
+                self.pending = []
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.wait()
+        finally:
+            self.close(cancel=exc_type is not None)
+        return False
@@ -0,0 +1,53 @@
+"""
+Density Aggregation for Large Scatter Plots
+Bins x/y pairs on a regular grid so large cohorts plot as a density
+
+A scatter plot of every student stops being readable (and quick to draw
+or ship to a browser) long before millions of rows. Above
+DENSITY_THRESHOLD rows the analysis figures and the dashboard draw a 2D
+histogram instead: counts on a DENSITY_BINS x DENSITY_BINS grid, computed
+with one pass of integer arithmetic and a bincount (no sorting), plus a
+trend line from the moments of the two columns (Moments.linear_fit).
+"""
+
+import numpy as np
+
+# Rows above which scatter plots become density plots
+DENSITY_THRESHOLD = 100_000
+DENSITY_BINS = 60
+
+def use_density(rows, threshold=DENSITY_THRESHOLD):
+    """
+    Whether a scatter plot of rows points is drawn as a density
+    """
+
+    return threshold is not None and rows > threshold
+
+def _edges(values, bins):
+    low, high = (float(values.min()), float(values.max())) if len(values) else (0.0, 1.0)
+    if low == high:
+        low, high = low - 0.5, high + 0.5  # as np.histogram does
+    return np.linspace(low, high, bins + 1)
+
+def density_grid(x, y, bins=DENSITY_BINS):
+    """
+    Counts of the (x, y) pairs where both are present on a bins x bins
+    grid spanning their range: (counts[x_bin, y_bin], x_edges, y_edges),
+    as np.histogram2d
+    """
+
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    present = np.isfinite(x) & np.isfinite(y)
+    if not present.all():
+        x, y = x[present], y[present]
+
+    x_edges, y_edges = _edges(x, bins), _edges(y, bins)
+    cells = []
+    for values, edges in ((x, x_edges), (y, y_edges)):
+        scale = bins / (edges[-1] - edges[0])
+        # The maximum lands on the last edge; it belongs to the last bin
+        cells.append(np.minimum(((values - edges[0]) * scale).astype(np.intp), bins - 1))
+
+    counts = np.bincount(cells[0] * bins + cells[1], minlength=bins * bins)
+    return counts.reshape(bins, bins), x_edges, y_edges
@@ -0,0 +1,185 @@
+"""
+Column Schema for Student Mental Health Analysis
+Compact dtypes shared by the combiner, the analysis script and the dashboard
+
+Likert items are stored as 8-bit integers, composites and CGPA as float32
+and the categorical answers as pandas Categoricals. Integer columns with
+missing values use the nullable variant (Int8/UInt8); columns holding
+non-integral values fall back to float32 so nothing is rounded.
+"""
+
+import numpy as np
+import pandas as pd
+
+from categorical_kernels import (ACCOMMODATION_SCORES, GENDER_MAPPING, NO_VALUES, YES_NO_SCORES,
+                                 YES_VALUES)
+
+SCALE_COLUMNS = [
+    'depression_score', 'anxiety_score', 'stress_level', 'sleep_quality',
+    'campus_safety', 'social_support', 'campus_facilities',
+    'accommodation_satisfaction', 'peer_relationships',
+    'academic_pressure', 'workload_stress', 'exam_anxiety',
+    'grade_expectations', 'career_concerns'
+]
+
+COMPOSITE_COLUMNS = ['campus_environment_score', 'academic_expectation_score', 'mental_health_score']
+
+# Valid value ranges enforced by validate_ranges (composites share the 1-5 scale)
+VALID_RANGES = {
+    **{col: (1, 5) for col in SCALE_COLUMNS + COMPOSITE_COLUMNS},
+    'cgpa': (0, 4.0),
+    'age': (16, 40),
+}
+
+INTEGER_DTYPES = {
+    **{col: 'int8' for col in SCALE_COLUMNS},
+    'age': 'uint8',
+    'year_of_study': 'uint8',
+}
+
+FLOAT_DTYPES = {
+    **{col: 'float32' for col in COMPOSITE_COLUMNS},
+    'cgpa': 'float32',
+}
+
+CATEGORIES = {
+    'gender': ['Female', 'Male', 'Other'],
+    'seeks_counseling': ['No', 'Yes'],
+    'aware_of_services': ['No', 'Yes'],
+}
+
+# Declarative rules for raw answers, checked by validation.validate_frame
+# before any coercion: 'type' is number, integer or category; 'range' is
+# (lower, upper) with None for an open bound; 'categories' lists the
+# accepted spellings and 'labels' the text answers a number column also
+# accepts (scored by the transform plan). Raw scale items only need to be
+# non-negative numbers since each source is rescaled to 1-5 from its own
+# range.
+COLUMN_RULES = {
+    **{col: {'type': 'number', 'range': (0, None)} for col in SCALE_COLUMNS},
+    **{col: {'type': 'number', 'range': (0, None), 'labels': list(YES_NO_SCORES)}
+       for col in ['depression_score', 'anxiety_score', 'exam_anxiety']},
+    'accommodation_satisfaction': {'type': 'number', 'range': (0, None),
+                                   'labels': list(ACCOMMODATION_SCORES)},
+    'age': {'type': 'number', 'range': VALID_RANGES['age']},
+    'cgpa': {'type': 'number', 'range': VALID_RANGES['cgpa']},
+    'year_of_study': {'type': 'integer', 'range': (1, 8)},
+    'gender': {'type': 'category', 'categories': list(GENDER_MAPPING)},
+    'seeks_counseling': {'type': 'category', 'categories': YES_VALUES + NO_VALUES},
+    'aware_of_services': {'type': 'category', 'categories': YES_VALUES + NO_VALUES},
+}
+
+NULLABLE_INTEGERS = {'int8': 'Int8', 'uint8': 'UInt8'}
+
+def _compact_integer(series, dtype):
+    values = pd.to_numeric(series, errors='coerce')
+    valid = values.dropna()
+
+    if len(valid) and not (valid % 1 == 0).all():
+        return values.astype('float32')
+
+    info = np.iinfo(dtype)
+    if len(valid) and (valid.min() < info.min or valid.max() > info.max):
+        return values
+
+    if len(valid) < len(values):
+        return values.astype(NULLABLE_INTEGERS[dtype])
+    return values.astype(dtype)
+
+def _compact_categorical(series, categories):
+    if isinstance(series.dtype, pd.CategoricalDtype) and list(series.cat.categories) == categories:
+        return series
+
+    extra = sorted(set(series.dropna().astype(str).unique()) - set(categories))
+    return pd.Categorical(series.astype(object).where(series.notna()),
+                          categories=categories + extra)
+
+def compact_dtype(series):
+    """
+    Planned compact dtype for one column (unknown columns are returned as is)
+    """
+
+    name = series.name
+    if name in INTEGER_DTYPES:
+        return _compact_integer(series, INTEGER_DTYPES[name])
+    if name in FLOAT_DTYPES:
+        return pd.to_numeric(series, errors='coerce').astype(FLOAT_DTYPES[name])
+    if name in CATEGORIES:
+        return pd.Series(_compact_categorical(series, CATEGORIES[name]),
+                         index=series.index, name=name)
+    return series
+
+def apply_dtype_plan(df, columns=None):
+    """
+    Downcast the planned columns of df (all of them by default)
+    """
+
+    columns = df.columns if columns is None else [col for col in columns if col in df.columns]
+    for col in columns:
+        if col in INTEGER_DTYPES or col in FLOAT_DTYPES or col in CATEGORIES:
+            df[col] = compact_dtype(df[col])
+    return df
+
+def fill_missing(series, value, where=None):
+    """
+    fillna that widens a nullable integer column to float when the fill
+    value (e.g. a median of 2.5) is not integral; with a boolean where
+    mask only the missing values at those rows are filled
+    """
+
+    missing = series.isna().to_numpy()
+    if where is not None:
+        missing &= where
+    if not missing.any() or pd.isna(value):
+        # Nothing to fill, or nothing to fill with (e.g. the median of a
+        # column without any observed value)
+        return series
+    if isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and \
+            pd.api.types.is_integer_dtype(series.dtype) and float(value) % 1:
+        series = series.astype('float64')
+    if where is None:
+        return series.fillna(value)
+    return series.mask(missing, value)
+
+def empty_column(name, length, index=None, fallback_dtype=object):
+    """
+    All-missing column with the planned dtype, used to pre-align frames;
+    columns outside the plan use fallback_dtype
+    """
+
+    if name in INTEGER_DTYPES:
+        dtype = NULLABLE_INTEGERS[INTEGER_DTYPES[name]]
+    elif name in FLOAT_DTYPES:
+        dtype = FLOAT_DTYPES[name]
+    elif name in CATEGORIES:
+        dtype = pd.CategoricalDtype(CATEGORIES[name])
+    else:
+        dtype = fallback_dtype
+    return pd.Series(np.nan, index=index if index is not None else pd.RangeIndex(length),
+                     name=name, dtype=dtype)
+
+def align_frames(frames):
+    """
+    Give every frame the same columns, in first-seen order, with planned
+    dtypes for the ones it lacks, so pd.concat keeps compact dtypes
+    instead of upcasting to object
+    """
+
+    columns = []
+    fallback = {}
+    for frame in frames:
+        for col in frame.columns:
+            if col not in columns:
+                columns.append(col)
+                dtype = frame[col].dtype
+                fallback[col] = dtype if pd.api.types.is_float_dtype(dtype) else (
+                    np.float64 if pd.api.types.is_numeric_dtype(dtype) else object)
+
+    aligned = []
+    for frame in frames:
+        missing = {col: empty_column(col, len(frame), frame.index, fallback[col])
+                   for col in columns if col not in frame.columns}
+        if missing:
+            frame = pd.concat([frame, pd.DataFrame(missing, index=frame.index)], axis=1)
+        aligned.append(frame[columns])
+    return aligned
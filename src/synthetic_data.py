@@ -0,0 +1,332 @@
+"""
+Synthetic Survey Generator for Student Mental Health Analysis
+Generates correlated survey responses at any scale for tests and benchmarks
+
+Item answers come from a Gaussian copula: each row draws a multivariate
+normal vector over the fourteen scale items with a configurable
+correlation matrix, and each item is cut into its answer scale through
+the normal CDF. Demographics and the Yes/No answers are drawn
+independently.
+
+Rows are generated in chunks whose random streams are seeded from
+(seed, chunk index), so a dataset is reproducible for a given seed and
+chunksize whether it is generated sequentially or in worker processes.
+Source schemas re-encode the same answers with the raw headers and answer
+scales of the survey exports the combiner understands.
+"""
+
+import argparse
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from columnar_io import TableWriter, with_format
+from schema import SCALE_COLUMNS, apply_dtype_plan
+
+RANDOM_SEED = 42
+DEFAULT_CHUNKSIZE = 1_000_000
+DEFAULT_OUTPUT = '../data/raw/synthetic_{schema}.csv'
+
+ITEM_GROUPS = {
+    'mental_health': ['depression_score', 'anxiety_score', 'stress_level', 'sleep_quality'],
+    'campus_environment': ['campus_safety', 'social_support', 'campus_facilities',
+                           'accommodation_satisfaction', 'peer_relationships'],
+    'academic_expectation': ['academic_pressure', 'workload_stress', 'exam_anxiety',
+                             'grade_expectations', 'career_concerns'],
+}
+
+# Latent correlation within each group and between groups
+WITHIN_GROUP_CORRELATION = {'mental_health': 0.40, 'campus_environment': 0.30,
+                            'academic_expectation': 0.35}
+BETWEEN_GROUP_CORRELATION = {
+    ('mental_health', 'academic_expectation'): 0.20,
+    ('mental_health', 'campus_environment'): -0.15,
+    ('campus_environment', 'academic_expectation'): 0.0,
+}
+
+# The relationships the original 500-row sample injected, made explicit
+PAIR_CORRELATIONS = {
+    ('depression_score', 'academic_pressure'): 0.35,
+    ('depression_score', 'social_support'): -0.25,
+    ('anxiety_score', 'exam_anxiety'): 0.40,
+    ('anxiety_score', 'campus_safety'): -0.20,
+    ('stress_level', 'workload_stress'): 0.35,
+    ('stress_level', 'peer_relationships'): -0.25,
+}
+
+GENDER_PROBABILITIES = {'Male': 0.45, 'Female': 0.50, 'Other': 0.05}
+YES_PROBABILITIES = {'seeks_counseling': 0.3, 'aware_of_services': 0.6}
+
+# Raw header -> (encoding, standard column, encoding arguments)
+SOURCE_SCHEMAS = {
+    'standard': {
+        'student_id': ('id', None, ()),
+        'age': ('age', 'age', ()),
+        'gender': ('gender', 'gender', ('Male', 'Female', 'Other')),
+        'year_of_study': ('year', 'year_of_study', ()),
+        'cgpa': ('cgpa', 'cgpa', (2.0, 4.0)),
+        **{col: ('scale', col, (1, 5)) for col in SCALE_COLUMNS},
+        'seeks_counseling': ('flag', 'seeks_counseling', ('Yes', 'No')),
+        'aware_of_services': ('flag', 'aware_of_services', ('Yes', 'No')),
+    },
+    'kaggle': {
+        'Choose your gender': ('gender', 'gender', ('Male', 'Female', 'Other')),
+        'Age': ('age', 'age', ()),
+        'Your current year of Study': ('year', 'year_of_study', ()),
+        'What is your CGPA?': ('cgpa', 'cgpa', (2.0, 4.0)),
+        'Do you have Depression?': ('threshold', 'depression_score', ('Yes', 'No')),
+        'Do you have Anxiety?': ('threshold', 'anxiety_score', ('Yes', 'No')),
+        'Do you have Panic attack?': ('threshold', 'exam_anxiety', ('Yes', 'No')),
+        'Did you seek any specialist for a treatment?': ('flag', 'seeks_counseling', ('Yes', 'No')),
+    },
+    'clinical': {
+        'Gender': ('gender', 'gender', ('M', 'F', 'prefer not to say')),
+        'age': ('age', 'age', ()),
+        'CGPA': ('cgpa', 'cgpa', (2.0, 4.0)),
+        'PHQ-9': ('scale', 'depression_score', (0, 27)),
+        'GAD-7': ('scale', 'anxiety_score', (0, 21)),
+        'PSS-10': ('scale', 'stress_level', (0, 40)),
+        'Sleep Duration': ('scale', 'sleep_quality', (4, 10)),
+        'Academic Pressure': ('scale', 'academic_pressure', (1, 5)),
+        'Work Pressure': ('scale', 'workload_stress', (1, 5)),
+        'Financial Stress': ('extra', None, (1, 5)),
+        'counseling': ('flag', 'seeks_counseling', ('yes', 'no')),
+    },
+    'campus': {
+        'sex': ('gender', 'gender', ('male', 'female', 'other')),
+        'year': ('year', 'year_of_study', ()),
+        'GPA': ('cgpa', 'cgpa', (2.0, 4.0)),
+        'safety': ('scale', 'campus_safety', (1, 7)),
+        'support': ('scale', 'social_support', (1, 7)),
+        'facilities': ('scale', 'campus_facilities', (1, 7)),
+        'housing': ('scale', 'accommodation_satisfaction', (1, 7)),
+        'friends': ('scale', 'peer_relationships', (1, 7)),
+        'pressure': ('scale', 'academic_pressure', (1, 10)),
+        'workload': ('scale', 'workload_stress', (1, 10)),
+        'exam_stress': ('scale', 'exam_anxiety', (1, 10)),
+        'expectations': ('scale', 'grade_expectations', (1, 10)),
+        'career': ('scale', 'career_concerns', (1, 10)),
+        'awareness': ('flag', 'aware_of_services', ('Y', 'N')),
+    },
+}
+
+def correlation_matrix(pairs=None):
+    """
+    Latent correlation matrix over SCALE_COLUMNS: the default group and
+    pair structure, updated with {(item_a, item_b): r} pairs
+
+    A matrix that is no longer positive definite after the updates is
+    replaced by the nearest one (negative eigenvalues clipped).
+    """
+
+    group_of = {col: group for group, cols in ITEM_GROUPS.items() for col in cols}
+    index = {col: i for i, col in enumerate(SCALE_COLUMNS)}
+    matrix = np.eye(len(SCALE_COLUMNS))
+
+    for a in SCALE_COLUMNS:
+        for b in SCALE_COLUMNS:
+            if a == b:
+                continue
+            ga, gb = group_of[a], group_of[b]
+            if ga == gb:
+                r = WITHIN_GROUP_CORRELATION[ga]
+            else:
+                r = BETWEEN_GROUP_CORRELATION.get((ga, gb), BETWEEN_GROUP_CORRELATION.get((gb, ga), 0.0))
+            matrix[index[a], index[b]] = r
+
+    for (a, b), r in {**PAIR_CORRELATIONS, **(pairs or {})}.items():
+        if a not in index or b not in index:
+            raise ValueError(f"Unknown item in correlation pair: {a}, {b}")
+        if not -1 < r < 1:
+            raise ValueError(f"Correlation must be in (-1, 1): {a}, {b} = {r}")
+        matrix[index[a], index[b]] = matrix[index[b], index[a]] = r
+
+    eigenvalues, eigenvectors = np.linalg.eigh(matrix)
+    if eigenvalues.min() <= 0:
+        eigenvalues = np.clip(eigenvalues, 1e-6, None)
+        matrix = eigenvectors @ np.diag(eigenvalues) @ eigenvectors.T
+        scale = np.sqrt(np.diag(matrix))
+        matrix = matrix / np.outer(scale, scale)
+
+    return matrix
+
+def load_correlation_pairs(path):
+    """
+    Correlation pairs from a JSON object {"item_a,item_b": r, ...}
+    """
+
+    with open(path, encoding='utf-8') as f:
+        raw = json.load(f)
+    return {tuple(part.strip() for part in key.split(',')): float(r) for key, r in raw.items()}
+
+def _latent_uniforms(rng, n, cholesky):
+    """
+    Correlated uniform(0, 1) draws, one column per scale item
+    """
+
+    # Imported here: the analysis imports this module for its sample data
+    # even on runs that never generate any
+    from scipy.special import ndtr
+
+    normals = rng.standard_normal((n, cholesky.shape[0]), dtype=np.float32)
+    return ndtr(normals @ cholesky.T.astype(np.float32))
+
+def _to_scale(uniforms, lower, upper):
+    levels = upper - lower + 1
+    values = lower + np.minimum(np.floor(uniforms * levels), levels - 1)
+    return values.astype(np.int16 if upper > 127 else np.int8)
+
+def _choice(rng, n, labels, probabilities):
+    return np.asarray(labels, dtype=object)[rng.choice(len(labels), n, p=probabilities)]
+
+def generate_chunk(n_rows, chunk_index=0, seed=RANDOM_SEED, schema='standard',
+                   correlation=None, start_id=1):
+    """
+    One chunk of synthetic responses in a source schema
+
+    The chunk's random stream depends only on (seed, chunk_index).
+    """
+
+    if schema not in SOURCE_SCHEMAS:
+        raise ValueError(f"Unknown schema '{schema}', expected one of {sorted(SOURCE_SCHEMAS)}")
+
+    rng = np.random.default_rng([seed, chunk_index])
+    matrix = correlation if correlation is not None else correlation_matrix()
+    uniforms = _latent_uniforms(rng, n_rows, np.linalg.cholesky(matrix))
+    item_index = {col: i for i, col in enumerate(SCALE_COLUMNS)}
+
+    data = {}
+    for header, (encoding, column, args) in SOURCE_SCHEMAS[schema].items():
+        if encoding == 'id':
+            data[header] = np.arange(start_id, start_id + n_rows)
+        elif encoding == 'age':
+            data[header] = rng.integers(18, 26, n_rows, dtype=np.int8)
+        elif encoding == 'year':
+            data[header] = rng.integers(1, 5, n_rows, dtype=np.int8)
+        elif encoding == 'cgpa':
+            data[header] = np.round(rng.uniform(*args, n_rows), 2)
+        elif encoding == 'gender':
+            data[header] = _choice(rng, n_rows, args, list(GENDER_PROBABILITIES.values()))
+        elif encoding == 'flag':
+            p = YES_PROBABILITIES[column]
+            data[header] = _choice(rng, n_rows, args, [p, 1 - p])
+        elif encoding == 'scale':
+            data[header] = _to_scale(uniforms[:, item_index[column]], *args)
+        elif encoding == 'threshold':
+            # Yes for the top two answers of the underlying 1-5 item
+            data[header] = np.where(uniforms[:, item_index[column]] >= 0.6, args[0], args[1])
+        elif encoding == 'extra':
+            data[header] = rng.integers(args[0], args[1] + 1, n_rows, dtype=np.int8)
+
+    return pd.DataFrame(data)
+
+def generate_sample(n=500, seed=RANDOM_SEED):
+    """
+    Small standardized sample (the analysis and dashboard fallback data)
+    """
+
+    return apply_dtype_plan(generate_chunk(n, seed=seed, schema='standard'))
+
+def _chunk_task(args):
+    return generate_chunk(*args)
+
+def iter_chunks(n_rows, chunksize=DEFAULT_CHUNKSIZE, seed=RANDOM_SEED, schema='standard',
+                correlation=None, jobs=1):
+    """
+    Yield the chunks of an n_rows dataset in order; with jobs > 1 they are
+    generated in worker processes, at most 2 * jobs chunks ahead
+    """
+
+    matrix = correlation if correlation is not None else correlation_matrix()
+    tasks = [
+        (min(chunksize, n_rows - start), index, seed, schema, matrix, start + 1)
+        for index, start in enumerate(range(0, n_rows, chunksize))
+    ]
+
+    if jobs <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _chunk_task(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_chunk_task, task))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def write_dataset(output, n_rows, chunksize=DEFAULT_CHUNKSIZE, seed=RANDOM_SEED,
+                  schema='standard', correlation=None, jobs=1, verbose=True):
+    """
+    Generate n_rows chunk by chunk straight into a CSV or Parquet file
+    """
+
+    columns = list(SOURCE_SCHEMAS[schema])
+    written = 0
+    with TableWriter(output) as writer:
+        for chunk in iter_chunks(n_rows, chunksize, seed, schema, correlation, jobs):
+            writer.write(chunk)
+            written += len(chunk)
+            if verbose:
+                print(f"  {written:,} / {n_rows:,} rows")
+        writer.close(columns)
+
+    if verbose:
+        print(f"✓ Saved: {output} ({written:,} rows, schema '{schema}')")
+    return output
+
+def parse_args(argv=None):
+    """
+    Parse command line options
+    """
+
+    parser = argparse.ArgumentParser(description="Generate synthetic student mental health survey data")
+    parser.add_argument('--rows', type=int, default=1_000_000,
+                        help="Number of rows to generate")
+    parser.add_argument('--schema', choices=sorted(SOURCE_SCHEMAS), default='standard',
+                        help="Column layout: standardized columns or a raw export schema")
+    parser.add_argument('--output', default=None,
+                        help=f"Output path, .csv or .parquet (default: {DEFAULT_OUTPUT})")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=None,
+                        help="Output format; replaces the extension of --output")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Rows per generated chunk (part of what the seed reproduces)")
+    parser.add_argument('--seed', type=int, default=RANDOM_SEED,
+                        help="Base seed; chunk i uses the stream seeded by (seed, i)")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Generate chunks in N worker processes")
+    parser.add_argument('--correlation', default=None,
+                        help='JSON file of item pair correlations, e.g. {"depression_score,sleep_quality": -0.4}')
+    args = parser.parse_args(argv)
+
+    if args.output is None:
+        args.output = DEFAULT_OUTPUT.format(schema=args.schema)
+    if args.format:
+        args.output = with_format(args.output, args.format)
+
+    return args
+
+def main(argv=None):
+    """
+    Main execution
+    """
+
+    args = parse_args(argv)
+    pairs = load_correlation_pairs(args.correlation) if args.correlation else None
+
+    print("="*70)
+    print("SYNTHETIC SURVEY GENERATOR")
+    print("="*70)
+    print(f"\nGenerating {args.rows:,} rows (schema '{args.schema}', seed {args.seed}, "
+          f"chunks of {args.chunksize:,}, {args.jobs} job(s))")
+
+    write_dataset(args.output, args.rows, args.chunksize, args.seed, args.schema,
+                  correlation_matrix(pairs), args.jobs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Fused Transform Plan for the Dataset Combiner
+Resolves rename, coercion, rescale, categorical mapping, clipping and dtype
+for each column once, then runs them in a single pass
+
+The staged pipeline it replaces (standardize_column_names,
+normalize_scales, standardize_categorical_values, apply_dtype_plan and,
+later, validate_ranges) walked the frame once per stage and started with
+a full df.copy(). A TransformPlan is compiled from the header tuple alone
+(and cached like the rename plan): every column gets its ordered list of
+operations, with the same semantics and order as those stages, which are
+still the names of the per-stage counts logged below. Executing it
+takes each source column without copying, coerces it to one float buffer
+that the rescale and the clip update in place, casts it to its planned
+dtype, and assembles the result with a single zero-copy DataFrame
+construction.
+
+Columns the combiner assigns itself (student_id, source, source_row) are
+dropped from the raw data: a source's own ids would clash with them.
+
+Scale items some exports answer in words (Yes/No for depression,
+anxiety and panic attacks, the residence type for accommodation) are
+mapped to scores before they are coerced to numbers; numeric answers in
+the same column are parsed as usual.
+
+Only scale columns are clipped here, where the rescale already bounds
+them; CGPA and age are clipped by validate_ranges after deduplication, so
+duplicate detection still compares the answers as given.
+
+Column copies avoided per stage are reported on the 'transform_plan'
+logger at DEBUG level.
+"""
+
+import logging
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from categorical_kernels import (accommodation_to_score, normalize_gender, to_yes_no,
+                                 yes_no_to_score)
+from header_mapping import resolve_rename_plan
+from schema import SCALE_COLUMNS, VALID_RANGES, compact_dtype
+from virtual_columns import SOURCE_COLUMN, SOURCE_ROW_COLUMN
+
+logger = logging.getLogger('transform_plan')
+
+YES_NO_COLUMNS = ['seeks_counseling', 'aware_of_services']
+
+# Scale items whose text answers are mapped to scores, and the kernels
+SCORED_COLUMNS = {
+    'depression_score': 'yes_no_score',
+    'anxiety_score': 'yes_no_score',
+    'exam_anxiety': 'yes_no_score',
+    'accommodation_satisfaction': 'accommodation_score',
+}
+SCORE_KERNELS = {'yes_no_score': yes_no_to_score, 'accommodation_score': accommodation_to_score}
+
+# Assigned by the combiner; rows are identified by (source, source_row)
+DROPPED_COLUMNS = ('student_id', SOURCE_COLUMN, SOURCE_ROW_COLUMN)
+
+STAGES = ['standardize_column_names', 'normalize_scales', 'standardize_categorical_values',
+          'apply_dtype_plan', 'validate_ranges']
+
+# Column copies the staged pipeline makes: to_numeric, the five rescale
+# operations (-, *, /, +, round) plus astype, and to_numeric + clip when
+# validating
+RESCALE_COPIES = 6
+VALIDATE_COPIES = 2
+
+def column_operations(target):
+    """
+    Ordered operations for one standardized column name
+
+    Scale columns answered in words are mapped to scores (SCORED_COLUMNS)
+    before they are coerced to numbers.
+    """
+
+    if target in SCALE_COLUMNS:
+        scored = (SCORED_COLUMNS[target],) if target in SCORED_COLUMNS else ()
+        return scored + ('numeric', 'rescale', 'clip', 'cast')
+    if target == 'gender':
+        return ('gender', 'cast')
+    if target in YES_NO_COLUMNS:
+        return ('yes_no', 'cast')
+    if target in ('age', 'year_of_study', 'cgpa'):
+        return ('cast',)
+    return ()
+
+def scale_values(series, operations=()):
+    """
+    Float64 values of a raw scale column (a new buffer): numbers as they
+    are, text answers mapped by the score kernel among operations, if
+    any, and anything else NaN
+    """
+
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype='float64', na_value=np.nan, copy=True)
+
+    values = pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan,
+                                                             copy=True)
+    kernel = next((SCORE_KERNELS[op] for op in operations if op in SCORE_KERNELS), None)
+    if kernel is not None:
+        text = np.isnan(values) & series.notna().to_numpy()
+        if text.any():
+            values[text] = kernel(series[text]).to_numpy(dtype='float64')
+    return values
+
+class TransformPlan:
+    """
+    Per-column operations for one header layout
+    """
+
+    def __init__(self, headers, fuzzy_headers=False):
+        self.headers = list(headers)
+        self.renames = resolve_rename_plan(headers, fuzzy_headers)
+        rename_map = {raw: target for raw, target, _ in self.renames}
+        targets = [(raw, rename_map.get(raw, raw)) for raw in headers]
+        self.dropped = [raw for raw, target in targets if target in DROPPED_COLUMNS]
+        self.targets = [(raw, target) for raw, target in targets
+                        if target not in DROPPED_COLUMNS]
+        self.operations = {target: column_operations(target) for _, target in self.targets}
+
+    def print_renames(self, dataset_name):
+        if not self.renames:
+            return
+        print(f"{dataset_name} - Column Mapping:")
+        for old, new, score in self.renames:
+            suffix = f"  (fuzzy, similarity {score:.2f})" if score is not None else ""
+            print(f"  {old} → {new}{suffix}")
+
+    def _numeric_column(self, target, series, scale_stats, verbose, copies):
+        """
+        Map, coerce, rescale and clip one scale column inside a single
+        float64 buffer
+        """
+
+        values = scale_values(series, self.operations[target])
+        copies['scale'] += 1
+
+        if scale_stats is not None:
+            col_range = scale_stats.get(target)
+        elif np.isnan(values).all():
+            col_range = None
+        else:
+            col_range = (np.nanmin(values), np.nanmax(values))
+
+        if col_range is not None:
+            col_min, col_max = col_range
+            if not (col_min >= 1 and col_max <= 5) and col_min != col_max:
+                # Same operation order as 1 + 4 * (x - min) / (max - min)
+                np.subtract(values, col_min, out=values)
+                np.multiply(values, 4, out=values)
+                np.divide(values, col_max - col_min, out=values)
+                np.add(values, 1, out=values)
+                np.round(values, out=values)
+                copies['rescaled'] += 1
+                if verbose:
+                    print(f"  Normalized {target}: [{col_min}, {col_max}] → [1, 5]")
+
+        lower, upper = VALID_RANGES[target]
+        np.clip(values, lower, upper, out=values)
+
+        return pd.Series(values, index=series.index, name=target, copy=False)
+
+    def execute(self, df, dataset_name='dataset', scale_stats=None, verbose=True):
+        """
+        Run the plan over df; scale_stats optionally fixes the rescale
+        range per column (see compute_scale_stats)
+        """
+
+        if list(df.columns) != self.headers:
+            raise ValueError("Transform plan was compiled for different headers")
+
+        if verbose:
+            self.print_renames(dataset_name)
+            if self.dropped:
+                print(f"  Dropped {', '.join(self.dropped)} (assigned by the combiner)")
+
+        copies = Counter()
+        columns = {}
+        for raw, target in self.targets:
+            series = df[raw]
+            ops = self.operations[target]
+
+            if 'numeric' in ops:
+                series = self._numeric_column(target, series, scale_stats, verbose, copies)
+            elif 'gender' in ops:
+                series = normalize_gender(series)
+                copies['categorical'] += 1
+            elif 'yes_no' in ops:
+                series = to_yes_no(series)
+                copies['categorical'] += 1
+
+            if 'cast' in ops:
+                series = compact_dtype(series.rename(target, copy=False))
+                copies['cast'] += 1
+            elif series.name != target:
+                series = series.rename(target, copy=False)
+
+            columns[target] = series
+
+        result = pd.DataFrame(columns, index=df.index, copy=False)
+        self._log_copies(dataset_name, len(df.columns), copies)
+        return result
+
+    def _log_copies(self, dataset_name, n_columns, copies):
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+
+        staged = {
+            'standardize_column_names': n_columns,
+            'normalize_scales': copies['scale'] + RESCALE_COPIES * copies['rescaled'],
+            'standardize_categorical_values': copies['categorical'],
+            'apply_dtype_plan': copies['cast'],
+            'validate_ranges': VALIDATE_COPIES * copies['scale'],
+        }
+        # One float buffer per scale column, rescaled and clipped in place
+        fused = {
+            'standardize_column_names': 0,
+            'normalize_scales': copies['scale'],
+            'standardize_categorical_values': copies['categorical'],
+            'apply_dtype_plan': copies['cast'],
+            'validate_ranges': 0,
+        }
+
+        avoided = ', '.join(f"{stage} {staged[stage] - fused[stage]}" for stage in STAGES)
+        logger.debug("%s: column copies avoided per stage: %s (staged %d, fused %d; "
+                     "1 full-frame copy avoided)", dataset_name, avoided,
+                     sum(staged.values()), sum(fused.values()))
+
+@lru_cache(maxsize=256)
+def compile_transform_plan(headers, fuzzy_headers=False):
+    """
+    Cached TransformPlan for a tuple of raw headers
+    """
+
+    return TransformPlan(tuple(headers), fuzzy_headers)
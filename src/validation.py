@@ -0,0 +1,203 @@
+"""
+Schema Validation for Student Mental Health Analysis
+Checks raw answers against COLUMN_RULES and quarantines failing rows
+
+The transform plan coerces whatever it is given: unparseable numbers
+become NaN and are median-filled later, unknown genders become 'Other',
+out-of-range ages and CGPAs are clipped. Validation runs on the raw
+values first, so the amount of garbage per source is known.
+
+Every failed check is a bit in one uint64 mask per row, built from whole-
+column comparisons. Text columns are factorized first: their few distinct
+labels are parsed or looked up once and the result is broadcast back
+through the codes, as in categorical_kernels. Reason strings (e.g.
+'cgpa:out_of_range; gender:unknown_category') are only built once per
+distinct mask, and only for failing rows.
+
+With a quarantine path the failing rows leave the pipeline and are written
+to a JSON-lines file: their source, their 1-based data row number within
+that source, the reason codes and their raw values under the standardized
+column names.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from categorical_kernels import factorize_labels
+from schema import COLUMN_RULES
+
+DEFAULT_QUARANTINE = '../data/processed/quarantined_rows.jsonl'
+MAX_CHECKS = 64
+
+MISSING_LABELS = ['', 'nan', 'NaN', 'None', '<NA>']
+
+def _numeric_values(series, accepted=()):
+    """
+    Float values of a raw column plus the mask of present values that did
+    not parse and are not one of the accepted text labels
+    """
+
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype='float64', na_value=np.nan), None
+
+    codes, labels = factorize_labels(series)
+    parsed = pd.to_numeric(pd.Series(labels), errors='coerce').to_numpy(dtype='float64')
+    values = parsed[codes]
+    unparseable = np.isnan(parsed) & ~labels.isin(MISSING_LABELS) & ~labels.isin(accepted)
+    return values, (codes >= 0) & unparseable[codes]
+
+def column_failures(series, rule):
+    """
+    (reason, boolean mask) for each check of rule that some row fails;
+    missing values pass every check
+    """
+
+    failures = []
+
+    if rule['type'] == 'category':
+        codes, labels = factorize_labels(series)
+        unknown = ~labels.isin(rule['categories']) & ~labels.isin(MISSING_LABELS)
+        failures.append(('unknown_category', (codes >= 0) & unknown[codes]))
+    else:
+        values, unparseable = _numeric_values(series, rule.get('labels', ()))
+        if unparseable is not None:
+            failures.append(('unparseable', unparseable))
+
+        lower, upper = rule.get('range') or (None, None)
+        with np.errstate(invalid='ignore'):
+            if lower is not None or upper is not None:
+                outside = np.zeros(len(values), dtype=bool)
+                if lower is not None:
+                    outside |= values < lower
+                if upper is not None:
+                    outside |= values > upper
+                failures.append(('out_of_range', outside))
+            if rule['type'] == 'integer':
+                failures.append(('not_integer', np.isfinite(values) & (np.mod(values, 1) != 0)))
+
+    return [(reason, mask) for reason, mask in failures if mask.any()]
+
+def validate_frame(df, targets, rules=COLUMN_RULES):
+    """
+    Failure mask per row of a raw frame (0 = valid) and the
+    'column:reason' check named by each bit; targets pairs each raw
+    header with its standardized name (TransformPlan.targets)
+    """
+
+    bits = np.zeros(len(df), dtype=np.uint64)
+    checks = []
+
+    for raw, target in targets:
+        rule = rules.get(target)
+        if rule is None:
+            continue
+        for reason, mask in column_failures(df[raw], rule):
+            if len(checks) == MAX_CHECKS:
+                raise ValueError(f"More than {MAX_CHECKS} failing checks in one frame")
+            bits[mask] |= np.uint64(1) << np.uint64(len(checks))
+            checks.append(f"{target}:{reason}")
+
+    return bits, checks
+
+def failure_counts(bits, checks):
+    """
+    Rows failing each check
+    """
+
+    return {check: int(np.count_nonzero(bits & (np.uint64(1) << np.uint64(i))))
+            for i, check in enumerate(checks)}
+
+def describe_failures(bits, checks):
+    """
+    Reason string for every row of bits (failing rows only, in practice)
+    """
+
+    masks, inverse = np.unique(bits, return_inverse=True)
+    reasons = ['; '.join(check for i, check in enumerate(checks) if int(mask) >> i & 1)
+               for mask in masks]
+    return np.asarray(reasons, dtype=object)[inverse.ravel()]
+
+def quarantined_rows(df, targets, bits, checks, source, row_offset=0):
+    """
+    Failing rows of a raw frame, renamed to the standardized columns, with
+    their source, data row number and reasons in front
+    """
+
+    invalid = bits != 0
+    rows = df.loc[invalid, [raw for raw, _ in targets]]
+    rows.columns = [target for _, target in targets]
+    rows.insert(0, 'reasons', describe_failures(bits[invalid], checks))
+    rows.insert(0, 'source_row', row_offset + np.flatnonzero(invalid) + 1)
+    rows.insert(0, 'source', source)
+    return rows.reset_index(drop=True)
+
+def split_valid(df, targets, source, quarantine=False, row_offset=0):
+    """
+    Validate a raw frame: returns the frame to keep (without failing rows
+    when quarantining), its failure summary and the quarantined rows (or
+    None)
+    """
+
+    bits, checks = validate_frame(df, targets)
+    summary = {'rows': len(df), 'invalid_rows': int(np.count_nonzero(bits)),
+               'checks': failure_counts(bits, checks)}
+
+    if not quarantine or not summary['invalid_rows']:
+        return df, summary, None
+
+    rejected = quarantined_rows(df, targets, bits, checks, source, row_offset)
+    return df[bits == 0], summary, rejected
+
+class ValidationReport:
+    """
+    Failure counts per source across frames or chunks, with an optional
+    JSON-lines quarantine file (truncated when the report is created)
+    """
+
+    def __init__(self, quarantine_path=None):
+        self.quarantine_path = quarantine_path
+        self.sources = {}
+        self.quarantined = 0
+        if quarantine_path:
+            os.makedirs(os.path.dirname(os.path.abspath(quarantine_path)), exist_ok=True)
+            open(quarantine_path, 'w').close()
+
+    def add(self, source, summary, rejected=None):
+        if summary is not None:
+            totals = self.sources.setdefault(source, {'rows': 0, 'invalid_rows': 0, 'checks': {}})
+            totals['rows'] += summary['rows']
+            totals['invalid_rows'] += summary['invalid_rows']
+            for check, count in summary['checks'].items():
+                totals['checks'][check] = totals['checks'].get(check, 0) + count
+
+        if rejected is not None and len(rejected) and self.quarantine_path:
+            with open(self.quarantine_path, 'a', encoding='utf-8') as f:
+                rejected.to_json(f, orient='records', lines=True, default_handler=str)
+            self.quarantined += len(rejected)
+
+    def report(self):
+        """
+        Print the failure counts of every source
+        """
+
+        print(f"\n{'='*70}")
+        print("SCHEMA VALIDATION")
+        print("="*70)
+
+        for source, totals in self.sources.items():
+            share = totals['invalid_rows'] / totals['rows'] if totals['rows'] else 0
+            print(f"\n{source}: {totals['invalid_rows']} of {totals['rows']} rows invalid "
+                  f"({share:.1%})")
+            for check, count in sorted(totals['checks'].items(), key=lambda item: -item[1]):
+                print(f"  {check:<40} {count:>8}")
+
+        invalid = sum(totals['invalid_rows'] for totals in self.sources.values())
+        if self.quarantine_path:
+            print(f"\n✓ Quarantined {self.quarantined} row(s): {self.quarantine_path}")
+        elif invalid:
+            print(f"\n⚠ {invalid} invalid row(s) kept (coerced, filled and clipped); "
+                  f"use --quarantine to set them aside")
+        else:
+            print("\n✓ All rows passed validation")
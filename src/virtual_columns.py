@@ -0,0 +1,108 @@
+"""
+Virtual Default Columns for Student Mental Health Analysis
+Keeps constant defaults out of the combined frame until export
+
+When a source lacks a column, add_missing_columns used to write a full
+column of the default (3, 'No', 'Yes') for it, and pd.concat copied it
+again. Instead the default is recorded in df.attrs['defaults'] as
+{column: {'value': default, 'sources': [...]}} and the defaulted rows are
+left missing. The categorical 'source' column tells which rows came from
+which source, so the "was defaulted" mask of a column is one isin over
+the source codes. Because defaulted rows are missing in the frame,
+medians, modes and other statistics naturally leave them out;
+materialize_defaults writes the constants back in on export.
+"""
+
+import numpy as np
+import pandas as pd
+
+from schema import apply_dtype_plan, empty_column
+
+SOURCE_COLUMN = 'source'
+SOURCE_ROW_COLUMN = 'source_row'
+
+def get_defaults(df):
+    """
+    Registry of virtual default columns ({} for ordinary frames)
+    """
+
+    return df.attrs.get('defaults', {})
+
+def register_defaults(df, defaults, source=None):
+    """
+    Record constant defaults for df; source=None means every row of df
+    """
+
+    registry = dict(get_defaults(df))
+    for col, value in defaults.items():
+        registry[col] = {'value': value, 'sources': None if source is None else [source]}
+    df.attrs['defaults'] = registry
+    return df
+
+def merge_defaults(frames):
+    """
+    Combined registry of {name: frame} frames about to be concatenated;
+    per-frame defaults become defaults of that source
+    """
+
+    registry = {}
+    for name, frame in frames.items():
+        for col, entry in get_defaults(frame).items():
+            sources = [name] if entry['sources'] is None else entry['sources']
+            merged = registry.setdefault(col, {'value': entry['value'], 'sources': []})
+            merged['sources'].extend(source for source in sources if source not in merged['sources'])
+    return registry
+
+def has_column(df, col):
+    """
+    Whether col is a real or virtual column of df
+    """
+
+    return col in df.columns or col in get_defaults(df)
+
+def defaulted_mask(df, col):
+    """
+    Boolean array of the rows whose value of col is the virtual default
+    """
+
+    entry = get_defaults(df).get(col)
+    if entry is None:
+        return np.zeros(len(df), dtype=bool)
+    if entry['sources'] is None or SOURCE_COLUMN not in df.columns:
+        return np.ones(len(df), dtype=bool)
+    return df[SOURCE_COLUMN].isin(entry['sources']).to_numpy()
+
+def column_values(df, col):
+    """
+    Column with its virtual defaults filled in, built on demand
+    """
+
+    entry = get_defaults(df).get(col)
+    if entry is None:
+        return df[col]
+
+    mask = defaulted_mask(df, col)
+    if col not in df.columns and mask.all():
+        values = pd.Series(entry['value'], index=df.index, name=col)
+        return apply_dtype_plan(values.to_frame())[col]
+
+    base = df[col] if col in df.columns else empty_column(col, len(df), df.index)
+    return base.mask(mask, entry['value'])
+
+def materialize_defaults(df):
+    """
+    Ordinary frame for export: virtual columns filled in, in the logical
+    column order recorded in df.attrs['columns']
+    """
+
+    defaults = get_defaults(df)
+    if not defaults:
+        return df
+
+    order = df.attrs.get('columns', [])
+    columns = [col for col in order if has_column(df, col)]
+    columns += [col for col in df.columns if col not in columns]
+    columns += [col for col in defaults if col not in columns]
+
+    export = pd.DataFrame({col: column_values(df, col) for col in columns}, index=df.index)
+    return apply_dtype_plan(export)
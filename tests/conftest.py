@@ -0,0 +1,8 @@
+"""
+Test configuration: the pipeline modules live flat in src/
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
@@ -0,0 +1,87 @@
+"""
+Tests for stage checkpoints: a failed combiner run resumes after its last
+completed stage instead of starting over
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+import dataset_combiner
+import synthetic_data
+from checkpoints import STATE_NAME, CheckpointStore
+from columnar_io import read_table
+
+ROWS = 150
+
+@pytest.fixture
+def run(tmp_path):
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    for seed, schema in enumerate(['clinical', 'campus']):
+        synthetic_data.write_dataset(str(raw / f'{schema}.csv'), ROWS, seed=seed, schema=schema,
+                                     verbose=False)
+    work_dir = tmp_path / 'work'
+    output = tmp_path / 'combined.csv'
+    argv = ['--input-dir', str(raw), '--output', str(output), '--work-dir', str(work_dir),
+            '--quiet']
+    return argv, work_dir, output
+
+def fail(*args, **kwargs):
+    raise RuntimeError("stage failed")
+
+def test_resume_skips_completed_stages(run, monkeypatch):
+    argv, work_dir, output = run
+
+    with monkeypatch.context() as patch:
+        patch.setattr(dataset_combiner, 'save_combined_dataset', fail)
+        with pytest.raises(RuntimeError):
+            dataset_combiner.main(argv + ['--checkpoint'])
+    assert sorted(os.listdir(work_dir)) == ['checkpoints.json', 'cleaned.pkl', 'combined.pkl',
+                                            'files']
+    assert not output.exists()
+
+    # Neither combining nor cleaning runs again
+    monkeypatch.setattr(dataset_combiner, 'combine_datasets', fail)
+    monkeypatch.setattr(dataset_combiner, 'clean_and_validate', fail)
+    dataset_combiner.main(argv + ['--resume'])
+
+    df = read_table(str(output))
+    assert len(df) == 2 * ROWS
+    assert df['student_id'].tolist() == list(range(1, 2 * ROWS + 1))
+    assert not work_dir.exists()
+
+def test_resume_with_other_options_starts_over(run, monkeypatch):
+    argv, work_dir, output = run
+
+    with monkeypatch.context() as patch:
+        patch.setattr(dataset_combiner, 'save_combined_dataset', fail)
+        with pytest.raises(RuntimeError):
+            dataset_combiner.main(argv + ['--checkpoint'])
+
+    calls = []
+    combine = dataset_combiner.combine_datasets
+    monkeypatch.setattr(dataset_combiner, 'combine_datasets',
+                        lambda *args, **kwargs: calls.append(1) or combine(*args, **kwargs))
+    dataset_combiner.main(argv + ['--resume', '--fuzzy-headers'])
+    assert calls == [1]
+    assert len(read_table(str(output))) == 2 * ROWS
+
+def test_store_keeps_completed_stages_of_its_key(tmp_path):
+    df = pd.DataFrame({'x': [1, 2]})
+    df.attrs['defaults'] = {'y': {'value': 3, 'sources': None}}
+
+    store = CheckpointStore(str(tmp_path), 'key-1')
+    store.save('combined', df)
+    assert (tmp_path / STATE_NAME).exists()
+
+    resumed = CheckpointStore(str(tmp_path), 'key-1', resume=True)
+    assert resumed.last_completed(dataset_combiner.CHECKPOINT_STAGES) == 'combined'
+    loaded = resumed.load('combined')
+    pd.testing.assert_frame_equal(loaded, df)
+    assert loaded.attrs == df.attrs
+
+    other = CheckpointStore(str(tmp_path), 'key-2', resume=True)
+    assert other.last_completed(dataset_combiner.CHECKPOINT_STAGES) is None
+    assert not (tmp_path / 'combined.pkl').exists()
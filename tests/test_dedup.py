@@ -0,0 +1,68 @@
+"""
+Tests for duplicate detection: distinct respondents who give the same
+answers must never be merged
+"""
+
+import numpy as np
+import pandas as pd
+
+import dataset_combiner
+from dedup import DEFAULT_KEY_COLUMNS, RowDeduplicator
+from mental_health_analysis import clean_data
+
+def kaggle_like(n):
+    # A yes/no export: most key columns are absent and get defaults
+    return pd.DataFrame({
+        'Choose your gender': ['Female'] * n,
+        'Age': [20] * n,
+        'Your current year of Study': [2] * n,
+        'What is your CGPA?': [3.5] * n,
+        'Do you have Depression?': ['No'] * n,
+        'Do you have Anxiety?': ['Yes'] * n,
+    })
+
+def complete_rows(n):
+    values = {col: [3] * n for col in DEFAULT_KEY_COLUMNS}
+    values.update(age=[21] * n, gender=['Male'] * n, year_of_study=[1] * n, cgpa=[3.0] * n,
+                  seeks_counseling=['No'] * n, aware_of_services=['Yes'] * n)
+    return pd.DataFrame(values)
+
+def test_combine_keeps_identical_answers_by_default():
+    datasets = {'dataset1': kaggle_like(50), 'dataset2': complete_rows(20)}
+    combined = dataset_combiner.combine_datasets(datasets)
+    assert len(combined) == 70
+
+def test_defaulted_key_columns_never_match():
+    datasets = {'dataset1': kaggle_like(50), 'dataset2': kaggle_like(30)}
+    combined = dataset_combiner.combine_datasets(datasets, dedup_keys=DEFAULT_KEY_COLUMNS)
+    assert len(combined) == 80
+
+def test_missing_key_values_never_match():
+    df = complete_rows(10)
+    df['cgpa'] = np.nan
+    dedup = RowDeduplicator()
+    assert len(dedup.filter(df)) == 10
+    assert dedup.total_duplicates == 0
+    assert dedup.total_skipped == 10
+
+def test_fully_answered_repeats_are_dropped_when_enabled():
+    datasets = {'dataset1': complete_rows(5), 'dataset2': complete_rows(5)}
+    combined = dataset_combiner.combine_datasets(datasets, dedup_keys=DEFAULT_KEY_COLUMNS)
+    assert len(combined) == 1
+
+def test_streaming_combine_skips_defaulted_keys(tmp_path):
+    paths = []
+    for name in ('a', 'b'):
+        path = tmp_path / f'{name}.csv'
+        kaggle_like(40).to_csv(path, index=False)
+        paths.append(str(path))
+    output = tmp_path / 'combined.csv'
+    dataset_combiner.stream_combine_datasets(paths, str(output), chunksize=15,
+                                             dedup_keys=DEFAULT_KEY_COLUMNS)
+    assert len(pd.read_csv(output)) == 80
+
+def test_clean_data_keeps_identical_answers_by_default():
+    df = complete_rows(25)
+    df.insert(0, 'student_id', range(1, 26))
+    assert len(clean_data(df.copy())) == 25
+    assert len(clean_data(df.copy(), dedup_keys=DEFAULT_KEY_COLUMNS)) == 1
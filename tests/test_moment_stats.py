@@ -0,0 +1,81 @@
+"""
+Tests for the one-pass moments against numpy and scipy.stats
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from moment_stats import Moments, SufficientStats, f_oneway, ttest_ind
+
+COLUMNS = ['a', 'b', 'c']
+
+@pytest.fixture(scope='module')
+def values():
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(3000, 3)) @ np.array([[1.0, 0.5, 0.0], [0.0, 1.0, -0.4],
+                                                [0.0, 0.0, 1.0]])
+    # A large offset, where unshifted sums would cancel
+    return x + np.array([1e6, -3.0, 250.0])
+
+def test_merged_moments_with_different_shifts(values):
+    first, second = Moments(COLUMNS), Moments(COLUMNS)
+    first.update(values[:1000])
+    second.update(values[1000:])
+    assert not np.array_equal(first.shift, second.shift)
+    merged = first.merge(second)
+
+    expected = np.corrcoef(values, rowvar=False)
+    np.testing.assert_allclose(merged.corr_matrix().to_numpy(), expected, atol=1e-12)
+    for i, col in enumerate(COLUMNS):
+        assert merged.mean(col) == pytest.approx(values[:, i].mean(), rel=1e-12)
+        assert merged.var(col) == pytest.approx(values[:, i].var(ddof=1), rel=1e-9)
+
+def test_shifted_keeps_every_statistic(values):
+    moments = Moments(COLUMNS)
+    moments.update(values)
+    moved = moments.shifted(moments.shift + np.array([2.0, -1.0, 0.5]))
+    np.testing.assert_allclose(moved.corr_matrix().to_numpy(),
+                               moments.corr_matrix().to_numpy(), atol=1e-12)
+    for col in COLUMNS:
+        assert moved.mean(col) == pytest.approx(moments.mean(col), rel=1e-12)
+        assert moved.var(col) == pytest.approx(moments.var(col), rel=1e-9)
+
+def test_pairwise_missing_values_match_dataframe_corr(values):
+    df = pd.DataFrame(values[:500].copy(), columns=COLUMNS)
+    df.iloc[::7, 0] = np.nan
+    df.iloc[::5, 2] = np.nan
+    moments = Moments(COLUMNS)
+    for start in range(0, len(df), 128):
+        moments.update(df.iloc[start:start + 128].to_numpy())
+    np.testing.assert_allclose(moments.corr_matrix().to_numpy(), df.corr().to_numpy(),
+                               atol=1e-12)
+    assert moments.corr('a', 'c')[1] == df[['a', 'c']].dropna().shape[0]
+
+def test_pearsonr_and_linear_fit(values):
+    moments = Moments(COLUMNS)
+    moments.update(values)
+    r, p = moments.pearsonr('b', 'c')
+    expected = stats.pearsonr(values[:, 1], values[:, 2])
+    assert r == pytest.approx(expected.statistic, abs=1e-12)
+    assert p == pytest.approx(expected.pvalue, rel=1e-9)
+    np.testing.assert_allclose(moments.linear_fit('a', 'b'),
+                               np.polyfit(values[:, 0], values[:, 1], 1), rtol=1e-6)
+
+def test_ttest_and_anova_match_scipy():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({'score': rng.normal(3, 1, size=900).round(),
+                       'year': rng.integers(1, 5, size=900)})
+    df.loc[::11, 'score'] = np.nan
+    sufficient = SufficientStats.from_frame(df, ['score'], {'year': 'year'}, chunksize=200)
+    groups = [moments for _, moments in sufficient.ordered_groups('year')]
+    samples = [df.loc[df['year'] == year, 'score'].dropna() for year in range(1, 5)]
+
+    t, p = ttest_ind(groups[0], groups[1], 'score')
+    expected = stats.ttest_ind(samples[0], samples[1])
+    assert (t, p) == pytest.approx((expected.statistic, expected.pvalue), rel=1e-9)
+
+    f, p = f_oneway(groups, 'score')
+    expected = stats.f_oneway(*samples)
+    assert (f, p) == pytest.approx((expected.statistic, expected.pvalue), rel=1e-9)
@@ -0,0 +1,63 @@
+"""
+Tests for the mergeable quantile sketch against numpy's exact quantiles
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantile_sketch import DEFAULT_K, QuantileSketch, approximate_median
+
+# Documented worst-case rank error, as a fraction of n
+RANK_ERROR = 1.7 / DEFAULT_K
+
+def rank_error(values, estimate, q):
+    # Distance of q from the range of ranks the estimate occupies
+    values = np.sort(values)
+    low = np.searchsorted(values, estimate, side='left') / len(values)
+    high = np.searchsorted(values, estimate, side='right') / len(values)
+    return max(low - q, q - high, 0.0)
+
+def test_small_inputs_are_exact():
+    values = np.random.default_rng(0).normal(size=DEFAULT_K)
+    sketch = QuantileSketch().update(values)
+    assert sketch.median() == np.quantile(values, 0.5)
+    assert sketch.quantile(0.9) == np.quantile(values, 0.9)
+
+def test_missing_values_are_ignored():
+    sketch = QuantileSketch().update(pd.Series([1.0, np.nan, 3.0, None, 2.0]))
+    assert sketch.n == 3
+    assert sketch.median() == 2.0
+    assert np.isnan(QuantileSketch().median())
+
+@pytest.mark.parametrize('q', [0.1, 0.25, 0.5, 0.75, 0.9])
+def test_merged_quantiles_within_rank_error(q):
+    rng = np.random.default_rng(1)
+    # Files of different sizes and distributions, each sketched in chunks
+    parts = [rng.normal(size=40_000), rng.exponential(size=25_000),
+             rng.integers(1, 6, size=35_000).astype(float)]
+    merged = QuantileSketch(seed=1)
+    for part in parts:
+        sketch = QuantileSketch(seed=2)
+        for chunk in np.array_split(part, 7):
+            sketch.update(chunk)
+        merged.merge(sketch)
+
+    values = np.concatenate(parts)
+    assert merged.n == len(values)
+    assert rank_error(values, merged.quantile(q), q) <= RANK_ERROR
+    assert len(merged.levels) > 1
+    assert sum(len(level) for level in merged.levels) < 3 * DEFAULT_K
+
+def test_likert_median_is_exact_away_from_boundaries():
+    values = np.random.default_rng(3).choice([1, 2, 3, 4, 5], size=200_000,
+                                             p=[0.1, 0.2, 0.4, 0.2, 0.1])
+    assert approximate_median(pd.Series(values), chunksize=30_000) == 3.0
+
+def test_map_rescales_the_retained_items():
+    values = np.random.default_rng(4).uniform(0, 27, size=50_000)
+    sketch = QuantileSketch().update(values)
+    mapped = sketch.map(lambda x: 1 + 4 * x / 27)
+    assert mapped.n == sketch.n
+    assert mapped.median() == pytest.approx(1 + 4 * sketch.median() / 27)
+    assert rank_error(1 + 4 * values / 27, mapped.median(), 0.5) <= RANK_ERROR
@@ -0,0 +1,67 @@
+"""
+Tests for Spearman and Kendall tau-b rank correlations against scipy.stats
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from rank_correlation import MAX_TABLE_CELLS, RankCorrelation
+
+@pytest.fixture(scope='module')
+def likert():
+    # Tied 1-5 answers, two columns with gaps
+    rng = np.random.default_rng(0)
+    latent = rng.normal(size=(2000, 4)) @ np.array([[1.0, 0.6, -0.3, 0.2], [0, 1.0, 0.4, 0],
+                                                     [0, 0, 1.0, 0.5], [0, 0, 0, 1.0]])
+    df = pd.DataFrame(np.clip(np.round(latent + 3), 1, 5), columns=['a', 'b', 'c', 'd'])
+    df.loc[::13, 'c'] = np.nan
+    df.loc[::17, 'd'] = np.nan
+    return df
+
+def pair(df, a, b):
+    both = df[[a, b]].dropna()
+    return both[a].to_numpy(), both[b].to_numpy()
+
+@pytest.mark.parametrize('a, b', [('a', 'b'), ('a', 'c'), ('c', 'd')])
+def test_spearman_matches_scipy(likert, a, b):
+    rho, p = RankCorrelation(likert, likert.columns).spearmanr(a, b)
+    expected = stats.spearmanr(*pair(likert, a, b))
+    assert rho == pytest.approx(expected.statistic, abs=1e-12)
+    assert p == pytest.approx(expected.pvalue, rel=1e-8)
+
+@pytest.mark.parametrize('a, b', [('a', 'b'), ('a', 'c'), ('c', 'd')])
+def test_kendall_tau_b_matches_scipy(likert, a, b):
+    tau, p = RankCorrelation(likert, likert.columns).kendalltau(a, b)
+    expected = stats.kendalltau(*pair(likert, a, b), method='asymptotic')
+    assert tau == pytest.approx(expected.statistic, abs=1e-12)
+    assert p == pytest.approx(expected.pvalue, rel=1e-8)
+
+@pytest.mark.parametrize('method', ['spearman', 'kendall'])
+def test_corr_matrix_matches_dataframe_corr(likert, method):
+    matrix = RankCorrelation(likert, likert.columns).corr_matrix(method=method)
+    pd.testing.assert_frame_equal(matrix, likert.corr(method=method), atol=1e-12)
+
+def test_many_levels_fall_back_without_tables():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({'x': rng.normal(size=600).round(2), 'y': rng.normal(size=600).round(2)})
+    df['y'] += df['x']
+    df.loc[::10, 'x'] = np.nan
+    ranks = RankCorrelation(df, ['x', 'y'])
+    assert len(ranks.levels['x']) * len(ranks.levels['y']) > MAX_TABLE_CELLS
+
+    x, y = pair(df, 'x', 'y')
+    assert ranks.spearman('x', 'y')[0] == pytest.approx(stats.spearmanr(x, y).statistic,
+                                                        abs=1e-12)
+    assert ranks.kendalltau('x', 'y')[0] == pytest.approx(stats.kendalltau(x, y).statistic,
+                                                          abs=1e-12)
+
+def test_constant_or_missing_columns_have_no_correlation():
+    df = pd.DataFrame({'x': [1.0, 2.0, 3.0, 4.0], 'same': [2.0] * 4})
+    ranks = RankCorrelation(df, ['x', 'same', 'absent'])
+    assert np.isnan(ranks.corr('x', 'same'))
+    assert np.isnan(ranks.corr('x', 'same', method='kendall'))
+    assert np.isnan(ranks.corr('x', 'absent'))
+    with pytest.raises(ValueError):
+        ranks.corr('x', 'same', method='pearson')
@@ -0,0 +1,37 @@
+"""
+Tests for raw source sniffing and reading
+"""
+
+import zipfile
+
+from raw_sources import SNIFF_BYTES, read_source, sniff_file
+
+def write_late_cp1252(path):
+    # Valid UTF-8 well past the sniffed sample, then one cp1252 byte
+    rows = b'a,Z\xc3\xbcrich\n' * (2 * SNIFF_BYTES // 10)
+    data = b'name,city\n' + rows + b'b,Caf\xe9\n'
+    path.write_bytes(data)
+    return data
+
+def test_invalid_utf8_after_sample_falls_back_to_cp1252(tmp_path):
+    path = tmp_path / 'export.csv'
+    write_late_cp1252(path)
+    source = sniff_file(str(path))
+    assert source['encoding'] == 'utf-8'
+
+    df = read_source(source)
+    assert df['city'].iloc[0] == 'Zürich'
+    assert df['city'].iloc[-1] == 'Café'
+
+    chunks = list(read_source(source, chunksize=5000))
+    assert sum(len(chunk) for chunk in chunks) == len(df)
+    assert chunks[-1]['city'].iloc[-1] == 'Café'
+
+def test_zip_member_falls_back_to_cp1252(tmp_path):
+    data = write_late_cp1252(tmp_path / 'export.csv')
+    bundle = tmp_path / 'bundle.zip'
+    with zipfile.ZipFile(bundle, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('export.csv', data)
+
+    source = sniff_file(str(bundle), member='export.csv')
+    assert read_source(source)['city'].iloc[-1] == 'Café'
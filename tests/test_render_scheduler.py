@@ -0,0 +1,37 @@
+"""
+Tests for the render scheduler: figures drawn by pool workers count
+towards the CPU time of the span that waits for them
+"""
+
+import time
+
+from instrumentation import Instrumentation
+from render_scheduler import RenderScheduler
+
+def burn(seconds, path):
+    # Stands in for a render function: spends CPU, then writes its file
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+    with open(path, 'w') as f:
+        f.write('done')
+
+def test_worker_cpu_counts_in_the_waiting_span(tmp_path):
+    instrument = Instrumentation('test', quiet=True)
+    with RenderScheduler(2) as renderer:
+        for i in range(4):
+            renderer.submit(burn, 0.2, str(tmp_path / f'{i}.txt'))
+        with instrument.stage('render_figures') as span:
+            renderer.wait()
+            span['worker_cpu_s'] = renderer.cpu_seconds()
+
+    assert len(list(tmp_path.iterdir())) == 4
+    assert renderer.cpu_seconds() >= 0.8
+    # The parent only waits, so nearly all of the span's CPU is the workers'
+    assert instrument.spans[0]['cpu_s'] >= 0.8
+
+def test_inline_rendering_reports_no_worker_cpu(tmp_path):
+    with RenderScheduler(1) as renderer:
+        renderer.submit(burn, 0.0, str(tmp_path / 'figure.txt'))
+    assert renderer.cpu_seconds() == 0
+    assert (tmp_path / 'figure.txt').exists()
@@ -0,0 +1,77 @@
+"""
+Round trip of the synthetic generator through the combiner: every raw
+source schema it writes must be readable by the pipeline it exercises
+"""
+
+import pandas as pd
+import pytest
+
+import dataset_combiner
+import synthetic_data
+from columnar_io import read_table
+
+ROWS = 300
+
+@pytest.fixture(scope='module')
+def raw_dir(tmp_path_factory):
+    root = tmp_path_factory.mktemp('raw')
+    for seed, schema in enumerate(sorted(synthetic_data.SOURCE_SCHEMAS)):
+        synthetic_data.write_dataset(str(root / f'{schema}.csv'), ROWS, chunksize=120,
+                                     seed=seed, schema=schema, verbose=False)
+    return root
+
+def check_combined(df):
+    schemas = len(synthetic_data.SOURCE_SCHEMAS)
+    assert len(df) == schemas * ROWS
+    assert list(df['student_id']) == list(range(1, len(df) + 1))
+    assert df['source'].nunique() == schemas
+    assert df.groupby('source', observed=True)['source_row'].max().eq(ROWS).all()
+
+@pytest.mark.parametrize('schema', sorted(synthetic_data.SOURCE_SCHEMAS))
+def test_each_schema_combines(raw_dir, schema):
+    source = dataset_combiner.load_and_inspect_datasets(str(raw_dir))
+    datasets = {name: source for name, source in source.items()
+                if source['path'].endswith(f'{schema}.csv')}
+    combined = dataset_combiner.combine_datasets(datasets)
+    assert len(combined) == ROWS
+    assert list(combined['student_id']) == list(range(1, ROWS + 1))
+
+def test_all_schemas_combine_in_memory(raw_dir):
+    combined = dataset_combiner.combine_datasets(
+        dataset_combiner.load_and_inspect_datasets(str(raw_dir)))
+    check_combined(combined)
+
+@pytest.mark.parametrize('output', ['combined.csv', 'combined.parquet'])
+def test_all_schemas_combine_streaming(raw_dir, tmp_path, output):
+    sources = list(dataset_combiner.load_and_inspect_datasets(str(raw_dir)).values())
+    path = dataset_combiner.stream_combine_datasets(sources, str(tmp_path / output),
+                                                    chunksize=100)
+    check_combined(read_table(path))
+
+def test_streaming_sketch_imputation_fills_like_in_memory(raw_dir, tmp_path):
+    datasets = dataset_combiner.load_and_inspect_datasets(str(raw_dir))
+    in_memory = dataset_combiner.clean_and_validate(
+        dataset_combiner.create_composite_scores(dataset_combiner.combine_datasets(datasets)),
+        impute='sketch')
+    path = dataset_combiner.stream_combine_datasets(list(datasets.values()),
+                                                    str(tmp_path / 'combined.csv'),
+                                                    chunksize=100, impute='sketch')
+    streamed = read_table(path)
+    # financial_stress only comes from the clinical export
+    assert in_memory['financial_stress'].notna().all()
+    assert streamed['financial_stress'].notna().all()
+    assert streamed.isna().sum().sum() == 0
+
+def test_streamed_parquet_source_matches_in_memory(raw_dir, tmp_path):
+    import pyarrow.parquet as pq
+
+    datasets = dataset_combiner.load_and_inspect_datasets(str(raw_dir))
+    dataset_combiner.save_combined_dataset(dataset_combiner.combine_datasets(datasets),
+                                           str(tmp_path / 'in_memory.parquet'))
+    path = dataset_combiner.stream_combine_datasets(list(datasets.values()),
+                                                    str(tmp_path / 'streamed.parquet'),
+                                                    chunksize=100)
+    expected = pq.read_schema(tmp_path / 'in_memory.parquet').field('source')
+    assert pq.read_schema(path).field('source').type == expected.type
+    pd.testing.assert_series_equal(read_table(path)['source'],
+                                   read_table(str(tmp_path / 'in_memory.parquet'))['source'])
@@ -0,0 +1,105 @@
+"""
+Tests for schema validation and the quarantine of failing rows
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+import dataset_combiner
+import synthetic_data
+from columnar_io import read_table
+from raw_sources import read_source
+from transform_plan import compile_transform_plan
+from validation import (ValidationReport, describe_failures, failure_counts, split_valid,
+                        validate_frame)
+
+ROWS = 200
+
+@pytest.fixture(scope='module')
+def kaggle_path(tmp_path_factory):
+    # Depression, anxiety and panic attacks answered Yes/No
+    path = tmp_path_factory.mktemp('raw') / 'kaggle.csv'
+    synthetic_data.write_dataset(str(path), ROWS, seed=3, schema='kaggle', verbose=False)
+    return str(path)
+
+def test_yes_no_answers_pass_validation(kaggle_path):
+    df = read_source(kaggle_path)
+    plan = compile_transform_plan(tuple(df.columns))
+    kept, summary, rejected = split_valid(df, plan.targets, 'kaggle', quarantine=True)
+    assert summary == {'rows': ROWS, 'invalid_rows': 0, 'checks': {}}
+    assert len(kept) == ROWS and rejected is None
+
+@pytest.mark.parametrize('quarantine', [False, True])
+def test_yes_no_scored_source_combines(kaggle_path, tmp_path, quarantine):
+    path = str(tmp_path / 'quarantined.jsonl') if quarantine else None
+    combined = dataset_combiner.combine_datasets({'dataset1': kaggle_path}, quarantine=path)
+    assert len(combined) == ROWS
+    assert combined['depression_score'].isin([1, 5]).all()
+
+@pytest.mark.parametrize('quarantine', [False, True])
+def test_yes_no_scored_source_streams(kaggle_path, tmp_path, quarantine):
+    path = str(tmp_path / 'quarantined.jsonl') if quarantine else None
+    output = dataset_combiner.stream_combine_datasets([kaggle_path], str(tmp_path / 'out.csv'),
+                                                      chunksize=70, quarantine=path)
+    df = read_table(output)
+    assert len(df) == ROWS
+    assert df['exam_anxiety'].isin([1, 5]).all()
+    if quarantine:
+        assert open(path).read() == ''
+
+def messy_frame():
+    return pd.DataFrame({
+        'Gender': ['M', 'robot', 'F', 'f'],
+        'CGPA': [3.1, 5.0, 'x', 2.0],
+        'Year of Study': [1, 2, 1.5, 3],
+        'PHQ-9': ['4', 'abc', -1, None],
+    })
+
+def test_failure_bits_name_each_check():
+    df = messy_frame()
+    bits, checks = validate_frame(df, compile_transform_plan(tuple(df.columns)).targets)
+    assert checks == ['gender:unknown_category', 'cgpa:unparseable', 'cgpa:out_of_range',
+                      'year_of_study:not_integer', 'depression_score:unparseable',
+                      'depression_score:out_of_range']
+    assert bits.tolist() == [0, 0b010101, 0b101010, 0]
+    assert describe_failures(bits[1:3], checks).tolist() == [
+        'gender:unknown_category; cgpa:out_of_range; depression_score:unparseable',
+        'cgpa:unparseable; year_of_study:not_integer; depression_score:out_of_range',
+    ]
+    assert failure_counts(bits, checks) == {check: 1 for check in checks}
+
+def test_missing_values_pass_every_check():
+    df = pd.DataFrame({'CGPA': [None, 'nan', ''], 'Gender': [None, 'NaN', 'None']})
+    bits, checks = validate_frame(df, compile_transform_plan(tuple(df.columns)).targets)
+    assert not bits.any() and checks == []
+
+def test_quarantine_file_holds_failing_rows(tmp_path):
+    df = messy_frame()
+    targets = compile_transform_plan(tuple(df.columns)).targets
+    path = tmp_path / 'quarantine' / 'rows.jsonl'
+    report = ValidationReport(str(path))
+    kept, summary, rejected = split_valid(df, targets, 'survey.csv', quarantine=True,
+                                          row_offset=100)
+    report.add('survey.csv', summary, rejected)
+
+    assert kept.index.tolist() == [0, 3]
+    assert report.quarantined == 2
+    assert report.sources['survey.csv']['invalid_rows'] == 2
+
+    rows = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [row['source'] for row in rows] == ['survey.csv', 'survey.csv']
+    assert [row['source_row'] for row in rows] == [102, 103]
+    assert rows[0]['reasons'].split('; ') == ['gender:unknown_category', 'cgpa:out_of_range',
+                                              'depression_score:unparseable']
+    assert list(rows[0])[3:] == ['gender', 'cgpa', 'year_of_study', 'depression_score']
+    assert (rows[0]['gender'], rows[0]['depression_score']) == ('robot', 'abc')
+    assert (rows[1]['cgpa'], rows[1]['year_of_study']) == ('x', 1.5)
+
+def test_quarantined_rows_leave_the_combined_frame(tmp_path):
+    path = tmp_path / 'rows.jsonl'
+    combined = dataset_combiner.combine_datasets({'dataset1': messy_frame()},
+                                                 quarantine=str(path))
+    assert combined['source_row'].tolist() == [1, 4]
+    assert len(path.read_text(encoding='utf-8').splitlines()) == 2
@@ -0,0 +1,43 @@
+"""
+Tests for virtual default columns: defaults stay out of the frame and
+its statistics, and come back exactly where they were on export
+"""
+
+import pandas as pd
+import pytest
+
+import dataset_combiner
+from virtual_columns import (column_values, defaulted_mask, get_defaults, has_column,
+                             materialize_defaults)
+
+@pytest.fixture
+def combined():
+    with_safety = pd.DataFrame({'age': [20, 21, 22, 23], 'campus_safety': [2, None, 4, 4],
+                                'gender': ['M', 'F', 'M', 'F']})
+    without_safety = pd.DataFrame({'age': [30, 31], 'gender': ['F', 'F']})
+    return dataset_combiner.combine_datasets({'a': with_safety, 'b': without_safety})
+
+def test_defaults_are_recorded_per_source(combined):
+    assert get_defaults(combined)['campus_safety'] == {'value': 3, 'sources': ['b']}
+    assert get_defaults(combined)['stress_level'] == {'value': 3, 'sources': ['a', 'b']}
+    assert 'stress_level' not in combined.columns and has_column(combined, 'stress_level')
+    assert defaulted_mask(combined, 'campus_safety').tolist() == [False] * 4 + [True] * 2
+    assert defaulted_mask(combined, 'age').tolist() == [False] * 6
+
+def test_materialize_fills_only_defaulted_rows(combined):
+    assert combined['campus_safety'].isna().tolist() == [False, True, False, False, True, True]
+    assert column_values(combined, 'campus_safety').tolist() == [2, pd.NA, 4, 4, 3, 3]
+
+    export = materialize_defaults(combined)
+    assert list(export.columns) == combined.attrs['columns']
+    assert export['campus_safety'].tolist() == [2, pd.NA, 4, 4, 3, 3]
+    assert export['stress_level'].tolist() == [3] * 6
+    assert export['stress_level'].dtype == 'int8'
+    assert export['seeks_counseling'].tolist() == ['No'] * 6
+
+def test_cleaning_leaves_defaulted_rows_to_export(combined):
+    cleaned = dataset_combiner.clean_and_validate(combined)
+    # The observed median fills the real gap, not the defaulted rows
+    assert cleaned['campus_safety'].tolist() == [2, 4, 4, 4, pd.NA, pd.NA]
+    assert get_defaults(cleaned) == get_defaults(combined)
+    assert materialize_defaults(cleaned)['campus_safety'].tolist() == [2, 4, 4, 4, 3, 3]